@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 from database import DatabaseManager
+from recommendations import FEATURE_COLUMNS, MOISTURE_TO_RAINFALL, PredictionCache, recommend_batch
+from model_registry import ModelRegistry
+from recommendation_grid import RecommendationGrids
+from soil_profiles import soil_profile
 import requests
-import pickle
 import os
 from googletrans import Translator
 import numpy as np
@@ -30,8 +33,23 @@ except ImportError:
 import threading
 import subprocess
 
+# One DatabaseManager per server process: Streamlit re-executes this script
+# on every interaction, so it must not be rebuilt at module level
+@st.cache_resource
+def get_db_manager():
+    return DatabaseManager()
+
+class LazyDatabaseManager:
+    """Stands in for the shared DatabaseManager and builds it on first use"""
+    _manager = None
+    
+    def __getattr__(self, name):
+        if self._manager is None:
+            self._manager = get_db_manager()
+        return getattr(self._manager, name)
+
 # Initialize database and translator
-db_manager = DatabaseManager()
+db_manager = LazyDatabaseManager()
 translator = Translator()
 
 # Twilio Configuration
@@ -450,15 +468,30 @@ if 'crop_listings' not in st.session_state:
     ]
 
 # Load pre-trained model
+# One registry per server process; it swaps in newly activated model
+# versions by itself, so retrained models go live without a restart
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry()
+
+# Shared by every session: farmers in one district mostly submit the same
+# weather and default soil values, so most single-farm predictions repeat
 @st.cache_resource
+def get_prediction_cache():
+    return PredictionCache()
+
+# Precomputed answers for every city soil profile (recommendation_grid.py),
+# rebuilt in the background whenever another model version is activated
+@st.cache_resource
+def get_recommendation_grids():
+    return RecommendationGrids(get_model_registry())
+
 def load_model():
-    try:
-        with open('crop_recommendation_model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        return model
-    except FileNotFoundError:
+    bundle = get_model_registry().get('crop')
+    if bundle is None:
         st.error("Model file not found. Please run train_model.py first to train the model.")
         return None
+    return bundle.model
 
 # Load data files
 @st.cache_data
@@ -487,96 +520,11 @@ def get_weather_data(location, api_key):
         st.error(f"Network error: {e}")
         return None
 
-# Function to get water-based crop recommendations
-def get_water_based_recommendation(rainfall, temperature, humidity):
-    """Get crop recommendations based on water availability"""
-    
-    # Low water crops (drought-resistant)
-    low_water_crops = ['millet', 'barley', 'cotton', 'sugarcane']
-    
-    # High water crops (water-loving)
-    high_water_crops = ['rice', 'wheat', 'maize', 'tomato', 'potato', 'onion']
-    
-    # Decision logic based on rainfall and humidity
-    if rainfall < 600 or humidity < 50:
-        # Low water conditions - recommend drought-resistant crops
-        if temperature > 30:
-            return 'millet'  # Best for hot, dry conditions
-        elif temperature > 25:
-            return 'cotton'  # Good for warm, dry conditions
-        else:
-            return 'barley'  # Cool weather, drought-resistant
-    else:
-        # High water conditions - recommend water-loving crops
-        if temperature > 30:
-            return 'rice'  # Hot and wet conditions
-        elif temperature > 25:
-            return 'maize'  # Warm and wet conditions
-        else:
-            return 'wheat'  # Cool and wet conditions
-
 # Function to get location-based soil data with defaults
 def get_location_soil_data(location, soil_data):
     """Get soil data based on location characteristics"""
-    location_lower = location.lower()
-    
-    # Location-based soil mapping with comprehensive characteristics
-    location_soil_map = {
-        'mumbai': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.5, 'rainfall': 2200, 'soil_type': 'Clayey', 'organic_matter': 3.0, 'drainage': 'Moderate'},
-        'delhi': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650, 'soil_type': 'Sandy-loam', 'organic_matter': 2.0, 'drainage': 'Well-drained'},
-        'hyderabad': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.8, 'rainfall': 800, 'soil_type': 'Red soil', 'organic_matter': 2.8, 'drainage': 'Well-drained'},
-        'chennai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.3, 'rainfall': 1400, 'soil_type': 'Sandy', 'organic_matter': 2.2, 'drainage': 'Excellent'},
-        'bangalore': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.0, 'rainfall': 900, 'soil_type': 'Red soil', 'organic_matter': 3.5, 'drainage': 'Well-drained'},
-        'kolkata': {'N': 100, 'P': 60, 'K': 80, 'pH': 6.2, 'rainfall': 1600, 'soil_type': 'Alluvial', 'organic_matter': 4.0, 'drainage': 'Poor'},
-        'pune': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 700, 'soil_type': 'Black soil', 'organic_matter': 2.5, 'drainage': 'Moderate'},
-        'ahmedabad': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.5, 'rainfall': 550, 'soil_type': 'Sandy', 'organic_matter': 1.8, 'drainage': 'Excellent'},
-        'jaipur': {'N': 65, 'P': 25, 'K': 45, 'pH': 7.8, 'rainfall': 450, 'soil_type': 'Sandy', 'organic_matter': 1.5, 'drainage': 'Excellent'},
-        'lucknow': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.5, 'rainfall': 1000, 'soil_type': 'Alluvial', 'organic_matter': 3.2, 'drainage': 'Moderate'},
-        'kanpur': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.8, 'rainfall': 850, 'soil_type': 'Alluvial', 'organic_matter': 2.8, 'drainage': 'Well-drained'},
-        'nagpur': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.9, 'rainfall': 1200, 'soil_type': 'Black soil', 'organic_matter': 2.6, 'drainage': 'Moderate'},
-        'indore': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.0, 'rainfall': 950, 'soil_type': 'Black soil', 'organic_matter': 2.4, 'drainage': 'Well-drained'},
-        'bhopal': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.6, 'rainfall': 1150, 'soil_type': 'Black soil', 'organic_matter': 2.7, 'drainage': 'Well-drained'},
-        'visakhapatnam': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.2, 'rainfall': 1100, 'soil_type': 'Red soil', 'organic_matter': 2.9, 'drainage': 'Well-drained'},
-        'vijayawada': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.4, 'rainfall': 950, 'soil_type': 'Alluvial', 'organic_matter': 3.1, 'drainage': 'Well-drained'},
-        'coimbatore': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.1, 'rainfall': 650, 'soil_type': 'Red soil', 'organic_matter': 2.3, 'drainage': 'Well-drained'},
-        'madurai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.0, 'rainfall': 850, 'soil_type': 'Black soil', 'organic_matter': 2.1, 'drainage': 'Moderate'},
-        'nashik': {'N': 75, 'P': 35, 'K': 55, 'pH': 6.8, 'rainfall': 600, 'soil_type': 'Black soil', 'organic_matter': 2.2, 'drainage': 'Well-drained'},
-        'vadodara': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.3, 'rainfall': 900, 'soil_type': 'Alluvial', 'organic_matter': 2.4, 'drainage': 'Well-drained'},
-    }
-    
-    # Check if location exists in our mapping
-    for key, soil_params in location_soil_map.items():
-        if key in location_lower:
-            return pd.Series(soil_params)
-    
-    # If location not found, use regional defaults based on common patterns
-    if any(city in location_lower for city in ['mumbai', 'pune', 'nashik', 'kolhapur']):
-        # Maharashtra region
-        return pd.Series({'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 800, 'soil_type': 'Black soil', 'organic_matter': 2.5, 'drainage': 'Moderate'})
-    elif any(city in location_lower for city in ['delhi', 'gurgaon', 'noida', 'faridabad']):
-        # NCR region
-        return pd.Series({'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650, 'soil_type': 'Sandy-loam', 'organic_matter': 2.0, 'drainage': 'Well-drained'})
-    elif any(city in location_lower for city in ['hyderabad', 'vijayawada', 'visakhapatnam', 'warangal']):
-        # Andhra Pradesh/Telangana region
-        return pd.Series({'N': 90, 'P': 50, 'K': 70, 'pH': 6.6, 'rainfall': 900, 'soil_type': 'Red soil', 'organic_matter': 2.8, 'drainage': 'Well-drained'})
-    elif any(city in location_lower for city in ['chennai', 'coimbatore', 'madurai', 'salem']):
-        # Tamil Nadu region
-        return pd.Series({'N': 80, 'P': 40, 'K': 60, 'pH': 6.2, 'rainfall': 1000, 'soil_type': 'Red soil', 'organic_matter': 2.3, 'drainage': 'Well-drained'})
-    elif any(city in location_lower for city in ['bangalore', 'mysore', 'hubli', 'mangalore']):
-        # Karnataka region
-        return pd.Series({'N': 90, 'P': 50, 'K': 70, 'pH': 6.4, 'rainfall': 850, 'soil_type': 'Red soil', 'organic_matter': 3.0, 'drainage': 'Well-drained'})
-    else:
-        # Default fallback with comprehensive soil conditions
-        return pd.Series({
-            'N': 80,  # Nitrogen - moderate level
-            'P': 40,  # Phosphorus - moderate level
-            'K': 60,  # Potassium - moderate level
-            'pH': 6.5,  # Slightly acidic to neutral
-            'rainfall': 800,  # Average rainfall
-            'soil_type': 'Loamy',  # Default soil type
-            'organic_matter': 2.5,  # Percentage
-            'drainage': 'Well-drained'  # Drainage condition
-        })
+    # The city's profile, else its region's, else a moderate default (soil_profiles.py)
+    return pd.Series(soil_profile(location)[1])
 
 # Function to send SMS notification
 def send_sms_notification(phone_number, message):
@@ -726,17 +674,15 @@ def get_recommendation(location, weather_data, model):
         soil_info['rainfall']
     ]])
     
-    # Get crop recommendation with confidence filtering
-    prediction_proba = model.predict_proba(input_features)[0]
-    confidence = max(prediction_proba) * 100
-    
-    # Check if confidence meets 90% threshold
-    if confidence < 90:
-        # Get water-based recommendations instead
-        recommended_crop = get_water_based_recommendation(soil_info['rainfall'], temperature, humidity)
-        confidence = 90.0  # Set to 90% for water-based recommendations
-    else:
-        recommended_crop = model.predict(input_features)[0]
+    # Get crop recommendation with confidence filtering: below 90% confidence
+    # the water-based recommendation is used instead (see recommend_batch).
+    # The location's soil profile is on the precomputed grid once it is built
+    grid = get_recommendation_grids().get()
+    recommendation = grid.lookup(location, temperature, humidity) if grid is not None else None
+    if recommendation is None:
+        recommendation = get_prediction_cache().recommend(model, input_features[0])
+    recommended_crop = recommendation['recommended_crop']
+    confidence = recommendation['confidence']
     
     # Create result data
     result_data = {
@@ -759,7 +705,7 @@ def get_recommendation_with_manual_soil(location, weather_data, model, manual_so
     weather_desc = weather_data['current']['condition']['text']
     
     # Estimate rainfall based on moisture level (simple mapping)
-    rainfall_estimate = manual_soil_data['Moisture'] * 20  # Convert moisture % to rainfall estimate
+    rainfall_estimate = manual_soil_data['Moisture'] * MOISTURE_TO_RAINFALL  # Convert moisture % to rainfall estimate
     
     # Use manual soil data instead of location-based
     # Convert manual soil data to model input format (original model expects 7 features)
@@ -773,17 +719,11 @@ def get_recommendation_with_manual_soil(location, weather_data, model, manual_so
         rainfall_estimate
     ]])
     
-    # Get crop recommendation with confidence filtering
-    prediction_proba = model.predict_proba(input_features)[0]
-    confidence = max(prediction_proba) * 100
-    
-    # Check if confidence meets 90% threshold
-    if confidence < 90:
-        # Get water-based recommendations instead
-        recommended_crop = get_water_based_recommendation(rainfall_estimate, temperature, humidity)
-        confidence = 90.0  # Set to 90% for water-based recommendations
-    else:
-        recommended_crop = model.predict(input_features)[0]
+    # Get crop recommendation with confidence filtering: below 90% confidence
+    # the water-based recommendation is used instead (see recommend_batch)
+    recommendation = get_prediction_cache().recommend(model, input_features[0])
+    recommended_crop = recommendation['recommended_crop']
+    confidence = recommendation['confidence']
     
     # Create result data
     result_data = {
@@ -970,6 +910,11 @@ def display_crop_insights(crop_name, lang_code):
 def login_user(email, password):
     user = db_manager.authenticate_user(email, password)
     if user:
+        token = db_manager.create_session(user['id'])
+        if token:
+            # Kept server-side in the session only: a token in the URL would
+            # log in anyone holding the link and leak through history and logs
+            st.session_state.session_token = token
         st.session_state.current_user = user
         st.session_state.is_logged_in = True
         return True
@@ -978,9 +923,63 @@ def login_user(email, password):
 
 # Function to handle user logout
 def logout_user():
+    token = st.session_state.pop('session_token', None)
+    if token:
+        db_manager.end_session(token)
     st.session_state.current_user = None
     st.session_state.is_logged_in = False
 
+# Function to log in from the session token, or out if it was revoked
+def restore_session():
+    """Runs on every rerun; a recently validated token is answered from
+    the in-process session cache without a database round trip."""
+    token = st.session_state.get('session_token')
+    if not token:
+        return
+    
+    user = db_manager.validate_session(token)
+    if user:
+        st.session_state.current_user = user
+        st.session_state.is_logged_in = True
+    else:
+        logout_user()
+
+# Rows per page for "Load more" lists
+PAGE_SIZE = 20
+
+# Function to fetch the pages of a "Load more" list opened so far
+def load_pages(key, fetch_page):
+    """Walk keyset pages up to the number the user has loaded.
+    
+    Only the page count lives in session state, so every rerun shows fresh
+    rows and the work per rerun grows with what the user asked to see, not
+    with the size of the table.
+    """
+    page_count = st.session_state.get(f'pages_{key}', 1)
+    pages, after = [], None
+    for _ in range(page_count):
+        page, after = fetch_page(limit=PAGE_SIZE, after=after)
+        pages.append(page)
+        if after is None:
+            break
+    if isinstance(pages[0], pd.DataFrame):
+        return pd.concat(pages, ignore_index=True), after
+    return [row for page in pages for row in page], after
+
+# Function to show a "Load more" button when more pages exist
+def show_load_more_button(key, next_cursor):
+    if next_cursor is None:
+        return
+    
+    current_lang = st.session_state.get('current_language', 'en')
+    load_more_text = "⬇️ Load more"
+    if current_lang != 'en':
+        load_more_text = translate_text(load_more_text, current_lang)
+    
+    if st.button(load_more_text, key=f"load_more_{key}"):
+        st.session_state[f'pages_{key}'] = st.session_state.get(f'pages_{key}', 1) + 1
+        st.rerun()
+
 # Admin Dashboard
 def show_admin_dashboard():
     st.title("🛡️ Admin Dashboard")
@@ -1032,27 +1031,47 @@ def show_admin_dashboard():
     
     with tab1:
         st.subheader("User Management")
-        users = db_manager.get_all_users()
-        if users:
-            users_df = pd.DataFrame(users)
+        users_df, next_cursor = load_pages(
+            'admin_users',
+            lambda limit, after: db_manager.get_all_users_page(limit=limit, after=after, as_frame=True)
+        )
+        if not users_df.empty:
             st.dataframe(users_df, use_container_width=True)
+            show_load_more_button('admin_users', next_cursor)
         else:
             st.info("No users found.")
     
     with tab2:
         st.subheader("Crop Listings")
-        listings = db_manager.get_crop_listings()
-        if listings:
-            listings_df = pd.DataFrame(listings)
+        search_query = st.text_input("🔍 Search all listings (any status)", key="admin_listing_search",
+                                     on_change=lambda: st.session_state.pop('pages_admin_search', None))
+        if search_query.strip():
+            pages_key = 'admin_search'
+            listings_df, next_cursor = load_pages(
+                pages_key,
+                lambda limit, after: db_manager.search_listings(search_query, {'status': None}, limit=limit,
+                                                                cursor=after, as_frame=True)
+            )
+        else:
+            pages_key = 'admin_listings'
+            listings_df, next_cursor = load_pages(
+                pages_key,
+                lambda limit, after: db_manager.get_crop_listings_page(limit=limit, after=after, as_frame=True)
+            )
+        if not listings_df.empty:
             st.dataframe(listings_df, use_container_width=True)
+            show_load_more_button(pages_key, next_cursor)
         else:
             st.info("No crop listings found.")
     
     with tab3:
         st.subheader("Active Offers")
-        active_offers = db_manager.get_offers_by_status('pending')
+        active_offers, next_cursor = load_pages(
+            'admin_active_offers',
+            lambda limit, after: db_manager.get_offers_by_status_page('pending', limit=limit, after=after)
+        )
         if active_offers:
-            st.write(f"**Total Active Offers:** {len(active_offers)}")
+            st.write(f"**Active Offers Shown:** {len(active_offers)}")
             for offer in active_offers:
                 with st.expander(f"{offer['crop_name'].title()} - ₹{offer['offer_price']}/kg by {offer['buyer_name']}"):
                     col1, col2 = st.columns(2)
@@ -1070,12 +1089,16 @@ def show_admin_dashboard():
                         st.write(f"**Created:** {offer['created_at']}")
                     if offer['notes']:
                         st.write(f"**Notes:** {offer['notes']}")
+            show_load_more_button('admin_active_offers', next_cursor)
         else:
             st.info("No active offers found.")
     
     with tab4:
         st.subheader("Closed Offers")
-        closed_offers = db_manager.get_offers_by_status('accepted') + db_manager.get_offers_by_status('rejected')
+        include_archived = st.checkbox("Include archived offers", key="closed_offers_archived",
+                                       help="Also search the archive of old closed offers (slower)")
+        closed_offers = (db_manager.get_offers_by_status('accepted', include_archived=include_archived) +
+                         db_manager.get_offers_by_status('rejected', include_archived=include_archived))
         if closed_offers:
             st.write(f"**Total Closed Offers:** {len(closed_offers)}")
             for offer in closed_offers:
@@ -1117,6 +1140,63 @@ def show_admin_dashboard():
             with col3:
                 st.metric("Rejected Offers", offer_stats.get('rejected', 0))
         
+        if st.button("🔄 Recount statistics", help="Rebuild the overview counters from the full tables"):
+            drift = db_manager.reconcile_dashboard_counters()
+            if drift is None:
+                st.error("Could not recount statistics")
+            elif drift:
+                st.warning("Corrected: " + ", ".join(f"{name} {change:+g}" for name, change in drift.items()))
+            else:
+                st.success("Statistics are up to date")
+        
+        if st.button("🗄️ Archive closed records",
+                     help="Move old closed offers and sold/cancelled listings out of the live tables"):
+            archived = db_manager.archive_closed_rows()
+            if archived is None:
+                st.error("Could not archive closed records")
+            else:
+                st.success(f"Archived {archived['buyer_offers']} offers and {archived['crop_listings']} listings")
+        
+        st.subheader("Activity Log")
+        today = datetime.utcnow().date()
+        activity_range = st.date_input("Period (UTC)", (today - timedelta(days=7), today), key="activity_range")
+        if len(activity_range) == 2:
+            since, until = activity_range[0], activity_range[1] + timedelta(days=1)
+            event_counts = db_manager.get_event_counts(since, until)
+            if event_counts:
+                st.bar_chart(pd.Series(event_counts, name="Events"))
+                events = db_manager.get_events(since, until, limit=200)
+                st.dataframe(pd.DataFrame([dict(event) for event in events]), use_container_width=True)
+            else:
+                st.info("No activity in this period.")
+        
+        st.subheader("Crop Model")
+        registry = get_model_registry()
+        bundle = registry.get('crop')
+        versions = registry.versions('crop')
+        if bundle is None:
+            st.info("No crop model published yet. Run train_model.py to train one.")
+        else:
+            st.write(f"**Active version:** {bundle.version} ({bundle.manifest['created_at']})")
+            cache_stats = get_prediction_cache().stats()
+            st.caption(f"Prediction cache: {cache_stats['entries']} inputs cached, "
+                       f"{cache_stats['hit_rate']:.0%} of {cache_stats['hits'] + cache_stats['misses']} lookups served from it")
+            if bundle.manifest['metrics']:
+                st.json(bundle.manifest['metrics'])
+            col1, col2 = st.columns(2)
+            with col1:
+                version = st.selectbox("Version", versions[::-1], key="model_version")
+                if st.button("Activate version") and version != bundle.version:
+                    if registry.activate('crop', version):
+                        st.success(f"Activated {version}; every app process switches within seconds")
+            with col2:
+                if st.button("↩️ Roll back", help="Reactivate the version the active one replaced"):
+                    previous = registry.rollback('crop')
+                    if previous:
+                        st.success(f"Rolled back to {previous}")
+                    else:
+                        st.warning("No earlier version to roll back to")
+        
         st.info("More analytics features coming soon...")
 
 # Farmer Dashboard
@@ -1307,7 +1387,10 @@ def load_soil_conditions_data():
         
         for path in possible_paths:
             if os.path.exists(path):
-                soil_df = pd.read_csv(path)
+                # The page only needs to know the data is there: read the header,
+                # not rows that can run to gigabytes (train_streaming_model.py
+                # trains on them in chunks)
+                soil_df = pd.read_csv(path, nrows=0)
                 return soil_df
         
         # If none found, show error with suggestions
@@ -1323,6 +1406,42 @@ def load_soil_conditions_data():
         st.error(f"Error loading soil data: {e}")
         return None
 
+# Batch crop recommendations from an uploaded CSV (one row per farm)
+def show_batch_recommendation(model):
+    current_lang = st.session_state.get('current_language', 'en')
+    
+    upload_label = "Upload a CSV with one farm per row"
+    if current_lang != 'en':
+        upload_label = translate_text(upload_label, current_lang)
+    
+    st.caption(f"Columns: {', '.join(FEATURE_COLUMNS)} (or Moisture % instead of rainfall). "
+               "Any other columns, such as the farm name, are kept in the results.")
+    uploaded = st.file_uploader(upload_label, type=['csv'], key="batch_recommendation_csv")
+    if uploaded is None:
+        return
+    
+    try:
+        farms = pd.read_csv(uploaded)
+        results = recommend_batch(model, farms)
+    except (ValueError, pd.errors.ParserError) as e:
+        st.error(f"Could not read the CSV: {e}")
+        return
+    
+    if results.empty:
+        st.info("The CSV has no rows.")
+        return
+    
+    st.success(f"✅ Recommendations for {len(results)} farms")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Farms", len(results))
+    with col2:
+        st.metric("Water-based fallbacks", int((results['source'] == 'water').sum()))
+    st.bar_chart(results['recommended_crop'].value_counts())
+    st.dataframe(results, use_container_width=True)
+    st.download_button("📥 Download recommendations", results.to_csv(index=False),
+                       file_name="crop_recommendations.csv", mime="text/csv")
+
 # Crop Recommendation Module
 def show_crop_recommendation_module():
     # Get current language
@@ -1336,6 +1455,17 @@ def show_crop_recommendation_module():
         st.error(error_msg)
         return
     
+    # Agents covering many farms can upload them all at once
+    single_mode = "Single farm"
+    batch_mode = "Many farms (CSV upload)"
+    if current_lang != 'en':
+        single_mode = translate_text(single_mode, current_lang)
+        batch_mode = translate_text(batch_mode, current_lang)
+    
+    if st.radio("Mode", [single_mode, batch_mode], horizontal=True, key="recommendation_mode") == batch_mode:
+        show_batch_recommendation(model)
+        return
+    
     # Load soil conditions data
     soil_df = load_soil_conditions_data()
     if soil_df is None:
@@ -1867,7 +1997,23 @@ def show_crop_listings_for_buyers():
     # Get current language
     current_lang = st.session_state.get('current_language', 'en')
     
-    listings = db_manager.get_crop_listings()
+    search_label = "🔍 Search crops, locations or farmers"
+    if current_lang != 'en':
+        search_label = translate_text(search_label, current_lang)
+    
+    # A new search starts again from its first page
+    search_query = st.text_input(search_label, key="buyer_listing_search",
+                                 on_change=lambda: st.session_state.pop('pages_buyer_search', None))
+    
+    if search_query.strip():
+        pages_key = 'buyer_search'
+        listings, next_cursor = load_pages(
+            pages_key,
+            lambda limit, after: db_manager.search_listings(search_query, limit=limit, cursor=after)
+        )
+    else:
+        pages_key = 'buyer_listings'
+        listings, next_cursor = load_pages(pages_key, db_manager.get_crop_listings_page)
     
     if listings:
         for listing in listings:
@@ -1892,8 +2038,12 @@ def show_crop_listings_for_buyers():
                 if st.button(f"Make Offer for {listing['crop_name']}", key=f"offer_{listing['id']}"):
                     st.session_state.selected_listing = listing
                     st.rerun()
+        show_load_more_button(pages_key, next_cursor)
     else:
-        no_listings_msg = "No crop listings available at the moment."
+        if search_query.strip():
+            no_listings_msg = "No crop listings match your search."
+        else:
+            no_listings_msg = "No crop listings available at the moment."
         if current_lang != 'en':
             no_listings_msg = translate_text(no_listings_msg, current_lang)
         st.info(no_listings_msg)
@@ -2078,7 +2228,7 @@ def show_farmer_offers():
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button(f"Accept Offer {offer['id']}"):
-                            success = db_manager.accept_offer(offer['id'])
+                            success = db_manager.accept_offer(offer['id'], actor_id=st.session_state.current_user['id'])
                             if success:
                                 st.success("Offer accepted. Transaction created.")
                             else:
@@ -2086,7 +2236,7 @@ def show_farmer_offers():
                         st.rerun()
                     with col2:
                         if st.button(f"Reject Offer {offer['id']}"):
-                            success = db_manager.update_offer_status(offer['id'], 'rejected')
+                            success = db_manager.update_offer_status(offer['id'], 'rejected', actor_id=st.session_state.current_user['id'])
                             if success:
                                 st.warning("Offer rejected.")
                             else:
@@ -2100,7 +2250,10 @@ def show_farmer_offers():
 # Buyer Offers
 def show_buyer_offers():
     buyer_id = st.session_state.current_user['id']
-    offers = db_manager.get_buyer_offers(buyer_id)
+    offers, next_cursor = load_pages(
+        'buyer_offers',
+        lambda limit, after: db_manager.get_buyer_offers_page(buyer_id, limit=limit, after=after)
+    )
     
     if offers:
         for offer in offers:
@@ -2110,6 +2263,7 @@ def show_buyer_offers():
                 st.write(f"**Status:** {offer['status'].title()}")
                 st.write(f"**Notes:** {offer['notes']}")
                 st.write(f"**Submitted:** {offer['created_at']}")
+        show_load_more_button('buyer_offers', next_cursor)
     else:
         st.info("No offers found. Browse crops and make offers in the other tabs.")
 
@@ -2340,7 +2494,10 @@ def show_agent_listings():
     current_lang = st.session_state.get('current_language', 'en')
     
     agent_id = st.session_state.current_user['id']
-    listings = db_manager.get_agent_listings(agent_id)
+    listings, next_cursor = load_pages(
+        'agent_listings',
+        lambda limit, after: db_manager.get_agent_listings_page(agent_id, limit=limit, after=after)
+    )
     
     if listings:
         for listing in listings:
@@ -2370,6 +2527,7 @@ def show_agent_listings():
                     st.write(f"👨‍🌾 **Name:** {listing['farmer_name']}")
                     st.write(f"📱 **Phone:** {listing['farmer_phone']}")
                     st.write(f"💰 **Total Value:** ₹{listing['quantity'] * listing['expected_price']:,.2f}")
+        show_load_more_button('agent_listings', next_cursor)
     else:
         no_listings_msg = "No listings found. Create farmer listings in the 'Sell for Farmers' tab."
         if current_lang != 'en':
@@ -2417,7 +2575,7 @@ def show_agent_offers():
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button(f"Accept Offer {offer['id']}", key=f"accept_{offer['id']}"):
-                            success = db_manager.accept_offer(offer['id'])
+                            success = db_manager.accept_offer(offer['id'], actor_id=st.session_state.current_user['id'])
                             if success:
                                 # Send SMS to buyer about acceptance
                                 accept_message = f"Good news! Your offer for {offer['quantity_wanted']} kg of {offer['crop_name']} at ₹{offer['offer_price']}/kg has been ACCEPTED by farmer {offer['farmer_name']}. Contact: {offer['farmer_phone']}"
@@ -2431,7 +2589,7 @@ def show_agent_offers():
                     
                     with col2:
                         if st.button(f"Reject Offer {offer['id']}", key=f"reject_{offer['id']}"):
-                            success = db_manager.update_offer_status(offer['id'], 'rejected')
+                            success = db_manager.update_offer_status(offer['id'], 'rejected', actor_id=st.session_state.current_user['id'])
                             if success:
                                 # Send SMS to buyer about rejection
                                 reject_message = f"Sorry, your offer for {offer['quantity_wanted']} kg of {offer['crop_name']} at ₹{offer['offer_price']}/kg has been DECLINED. Please check other listings or make a new offer."
@@ -2509,7 +2667,7 @@ def show_agent_market_management():
         update_reason = st.text_area("Update Reason (Optional)", placeholder="Market conditions, seasonal changes, etc.")
         
         if st.form_submit_button("💾 Update Market Price"):
-            success = db_manager.update_market_price(selected_crop, new_price, trend)
+            success = db_manager.update_market_price(selected_crop, new_price, trend, actor_id=st.session_state.current_user['id'])
             if success:
                 # Log the update
                 st.success(f"✅ Market price for {selected_crop.title()} updated to ₹{new_price}/quintal (Trend: {trend})")
@@ -2548,6 +2706,8 @@ def main():
     st.sidebar.markdown(f"**Current Language:** {selected_language}")
     st.sidebar.markdown("---")
     
+    restore_session()
+    
     # Check if user is logged in
     if 'current_user' in st.session_state and st.session_state.is_logged_in:
         user_role = st.session_state.current_user['role']
@@ -1,13 +1,14 @@
 import streamlit as st
 import pandas as pd
 import requests
-import pickle
 import os
 from googletrans import Translator
 import numpy as np
 import hashlib
 import json
-from datetime import datetime, timedelta
+from model_registry import ModelRegistry
+from recommendations import PredictionCache
+from soil_profiles import soil_profile
 
 # Initialize translator
 translator = Translator()
@@ -20,21 +21,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state for caching
-if 'location_cache' not in st.session_state:
-    st.session_state.location_cache = {}
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = {}
+# One registry per server process; it swaps in newly activated model
+# versions by itself, so retrained models go live without a restart
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry()
 
-# Load pre-trained model
+# Predictions shared by every session, keyed on the inputs rounded to
+# config.PREDICTION_CACHE_RESOLUTION: nearby farms reuse one prediction
 @st.cache_resource
+def get_prediction_cache():
+    return PredictionCache()
+
+# Load pre-trained model: the enhanced model with its water resource
+# encoder, or the crop model if no enhanced one has been trained
 def load_model():
-    try:
-        with open('crop_recommendation_model.pkl', 'rb') as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        st.error("Model file not found. Please run train_model.py first to train the model.")
-        return None
+    registry = get_model_registry()
+    bundle = registry.get('enhanced') or registry.get('crop')
+    if bundle is None:
+        st.error("Model file not found. Please run train_enhanced_model.py or train_model.py first to train the model.")
+    return bundle
 
 # Load data files
 @st.cache_data
@@ -66,75 +72,11 @@ def get_weather_data(location, api_key):
 # Function to get location-based soil data
 def get_location_soil_data(location, soil_data):
     """Get soil data based on location characteristics"""
-    location_lower = location.lower()
-    
-    # Location-based soil mapping (simplified)
-    location_soil_map = {
-        'mumbai': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.5, 'rainfall': 2200},
-        'delhi': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650},
-        'hyderabad': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.8, 'rainfall': 800},
-        'chennai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.3, 'rainfall': 1400},
-        'bangalore': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.0, 'rainfall': 900},
-        'kolkata': {'N': 100, 'P': 60, 'K': 80, 'pH': 6.2, 'rainfall': 1600},
-        'pune': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 700},
-        'ahmedabad': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.5, 'rainfall': 550},
-        'jaipur': {'N': 65, 'P': 25, 'K': 45, 'pH': 7.8, 'rainfall': 450},
-        'lucknow': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.5, 'rainfall': 1000},
-        'kanpur': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.8, 'rainfall': 850},
-        'nagpur': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.9, 'rainfall': 1200},
-        'indore': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.0, 'rainfall': 950},
-        'bhopal': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.6, 'rainfall': 1150},
-        'visakhapatnam': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.2, 'rainfall': 1100},
-        'vijayawada': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.4, 'rainfall': 950},
-        'coimbatore': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.1, 'rainfall': 650},
-        'madurai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.0, 'rainfall': 850},
-        'nashik': {'N': 75, 'P': 35, 'K': 55, 'pH': 6.8, 'rainfall': 600},
-        'vadodara': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.3, 'rainfall': 900},
-    }
-    
-    # Check if location exists in our mapping
-    for key, soil_params in location_soil_map.items():
-        if key in location_lower:
-            return pd.Series(soil_params)
-    
-    # If location not found, use regional defaults based on common patterns
-    if any(city in location_lower for city in ['mumbai', 'pune', 'nashik', 'kolhapur']):
-        # Maharashtra region
-        return pd.Series({'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 800})
-    elif any(city in location_lower for city in ['delhi', 'gurgaon', 'noida', 'faridabad']):
-        # NCR region
-        return pd.Series({'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650})
-    elif any(city in location_lower for city in ['hyderabad', 'vijayawada', 'visakhapatnam', 'warangal']):
-        # Andhra Pradesh/Telangana region
-        return pd.Series({'N': 90, 'P': 50, 'K': 70, 'pH': 6.6, 'rainfall': 900})
-    elif any(city in location_lower for city in ['chennai', 'coimbatore', 'madurai', 'salem']):
-        # Tamil Nadu region
-        return pd.Series({'N': 80, 'P': 40, 'K': 60, 'pH': 6.2, 'rainfall': 1000})
-    elif any(city in location_lower for city in ['bangalore', 'mysore', 'hubli', 'mangalore']):
-        # Karnataka region
-        return pd.Series({'N': 90, 'P': 50, 'K': 70, 'pH': 6.4, 'rainfall': 850})
-    else:
-        # Default fallback
-        return pd.Series({'N': 80, 'P': 40, 'K': 60, 'pH': 6.5, 'rainfall': 800})
-
-# Function to check if cache is valid (within 10 minutes)
-def is_cache_valid(location):
-    if location in st.session_state.last_update:
-        last_update = st.session_state.last_update[location]
-        return datetime.now() - last_update < timedelta(minutes=10)
-    return False
+    profile = soil_profile(location)[1]
+    return pd.Series({name: profile[name] for name in ('N', 'P', 'K', 'pH', 'rainfall')})
 
 # Function to get or compute recommendation
-def get_recommendation(location, weather_data, model):
-    location_key = location.lower()
-    
-    # Check if we have a valid cached result
-    if location_key in st.session_state.location_cache and is_cache_valid(location_key):
-        cached_data = st.session_state.location_cache[location_key]
-        st.info("🔄 Using cached recommendation (valid for 10 minutes)")
-        return cached_data
-    
-    # Compute new recommendation
+def get_recommendation(location, weather_data, bundle, water_resource=None):
     temperature = weather_data['current']['temp_c']
     humidity = weather_data['current']['humidity']
     weather_desc = weather_data['current']['condition']['text']
@@ -152,10 +94,13 @@ def get_recommendation(location, weather_data, model):
         soil_info['pH'],
         soil_info['rainfall']
     ]])
+    if bundle.encoder is not None:
+        # The enhanced model's last feature, encoded as it was in training
+        input_features = np.append(input_features, [bundle.encoder.transform([water_resource])], axis=1)
     
-    # Get crop recommendation
-    recommended_crop = model.predict(input_features)[0]
-    prediction_proba = model.predict_proba(input_features)[0]
+    # Get crop recommendation (cached for nearly identical inputs)
+    prediction_proba, cached = get_prediction_cache().lookup(bundle.model, input_features[0])
+    recommended_crop = bundle.model.classes_[prediction_proba.argmax()]
     confidence = max(prediction_proba) * 100
     
     # Create result data
@@ -164,16 +109,16 @@ def get_recommendation(location, weather_data, model):
         'humidity': humidity,
         'weather_desc': weather_desc,
         'soil_info': soil_info.to_dict(),
+        'water_resource': water_resource,
         'recommended_crop': recommended_crop,
         'confidence': confidence,
         'input_features': input_features.tolist()
     }
     
-    # Cache the result
-    st.session_state.location_cache[location_key] = result_data
-    st.session_state.last_update[location_key] = datetime.now()
-    
-    st.success("✨ New recommendation computed and cached!")
+    if cached:
+        st.info("🔄 Using cached recommendation")
+    else:
+        st.success("✨ New recommendation computed and cached!")
     return result_data
 
 # Translate text function
@@ -336,10 +281,10 @@ def display_crop_insights(crop_name, lang_code):
 # Main app function
 def main():
     # Load model and data
-    model = load_model()
+    bundle = load_model()
     soil_data, market_prices, pesticides = load_data()
     
-    if model is None or soil_data is None:
+    if bundle is None or soil_data is None:
         st.stop()
     
     # Sidebar configuration
@@ -364,23 +309,28 @@ def main():
     )
     lang_code = language_options[selected_language]
     
+    # Water resource, for the enhanced model
+    water_resource = None
+    if bundle.encoder is not None:
+        water_resource = st.sidebar.selectbox(
+            "Water Resource Availability",
+            list(bundle.encoder.classes_),
+            help="Irrigation or water source available on your farm"
+        )
+    
     # Cache management
     st.sidebar.subheader("🗂️ Cache Management")
+    prediction_cache = get_prediction_cache()
     if st.sidebar.button("Clear Cache"):
-        st.session_state.location_cache = {}
-        st.session_state.last_update = {}
+        prediction_cache.clear()
         st.sidebar.success("Cache cleared!")
     
     # Show cache status
-    if st.session_state.location_cache:
-        st.sidebar.write(f"**Cached Locations:** {len(st.session_state.location_cache)}")
-        for loc in st.session_state.location_cache.keys():
-            last_update = st.session_state.last_update.get(loc, datetime.now())
-            time_diff = datetime.now() - last_update
-            if time_diff < timedelta(minutes=10):
-                st.sidebar.write(f"• {loc.title()} ✅")
-            else:
-                st.sidebar.write(f"• {loc.title()} ⏰")
+    cache_stats = prediction_cache.stats()
+    if cache_stats['hits'] or cache_stats['misses']:
+        st.sidebar.write(f"**Cached Predictions:** {cache_stats['entries']}")
+        st.sidebar.write(f"**Hits / Misses:** {cache_stats['hits']} / {cache_stats['misses']} "
+                         f"({cache_stats['hit_rate']:.0%} hit rate)")
     
     # Main content
     st.title("🌾 Smart Farming Assistant")
@@ -399,7 +349,7 @@ def main():
             
             if weather_data:
                 # Get recommendation (cached or computed)
-                result = get_recommendation(location, weather_data, model)
+                result = get_recommendation(location, weather_data, bundle, water_resource)
                 
                 # Extract results
                 temperature = result['temperature']
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from database import DatabaseManager, Record
+
+class AsyncDatabaseManager:
+    """asyncio facade over DatabaseManager for event-loop front ends (chatbot, API).
+
+    Every query runs on one dedicated executor thread that keeps a single
+    connection checked out for its whole life, so any number of concurrent
+    requests share that thread instead of each needing its own. Calls are
+    served in the order they were awaited; the coroutines only wait.
+
+    Other DatabaseManager methods go through run(); calling ``self.db``
+    directly from another thread would wait for the held connection.
+    ``db_path`` and ``backend`` are as for DatabaseManager, which resolves
+    a missing ``db_path`` per backend (config.DATABASE_PATH or DATABASE_URL).
+    """
+
+    def __init__(self, db_path: Optional[str] = None, **kwargs):
+        self.db = DatabaseManager(db_path, pool_size=1, **kwargs)
+        self._connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-db',
+                                            initializer=self._hold_connection)
+
+    def _hold_connection(self):
+        # Nested pool checkouts on this thread reuse the held connection
+        self._connection = self.db.connection()
+        self._connection.__enter__()
+
+    def _release_connection(self):
+        if self._connection is not None:
+            self._connection.__exit__(None, None, None)
+            self._connection = None
+
+    async def run(self, call: Callable, *args, **kwargs) -> Any:
+        """Await ``call(*args, **kwargs)`` on the database thread (e.g. a DatabaseManager method)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(call, *args, **kwargs))
+
+    async def get_crop_listings(self, status: str = 'available') -> List[Record]:
+        """Awaitable DatabaseManager.get_crop_listings"""
+        return await self.run(self.db.get_crop_listings, status)
+
+    async def get_offers_for_farmer(self, farmer_id: int) -> List[Record]:
+        """Awaitable DatabaseManager.get_offers_for_farmer"""
+        return await self.run(self.db.get_offers_for_farmer, farmer_id)
+
+    async def create_buyer_offer(self, buyer_id: int, crop_listing_id: int, crop_name: str,
+                                 offer_price: float, quantity_wanted: float, notes: str = None) -> Optional[int]:
+        """Awaitable DatabaseManager.create_buyer_offer"""
+        return await self.run(self.db.create_buyer_offer, buyer_id, crop_listing_id, crop_name,
+                              offer_price, quantity_wanted, notes)
+
+    async def accept_offer(self, offer_id: int, actor_id: int = None) -> bool:
+        """Awaitable DatabaseManager.accept_offer"""
+        return await self.run(self.db.accept_offer, offer_id, actor_id)
+
+    async def close(self):
+        """Release the connection and stop the database thread once queued calls finish"""
+        await self.run(self._release_connection)
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
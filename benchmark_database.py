@@ -0,0 +1,726 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the marketplace database layer
+
+Usage:
+    python benchmark_database.py            # run every benchmark
+    python benchmark_database.py pool accept  # run selected benchmarks
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager, ReadCache, rows_to_frame
+
+CROPS = ['wheat', 'rice', 'maize', 'cotton', 'sugarcane', 'tomato', 'potato', 'onion', 'barley', 'millet']
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def temp_db_path():
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+    os.close(fd)
+    os.remove(path)
+    return path
+
+def remove_db(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def seed_marketplace(db, farmers=50, buyers=50, listings=2000, offers=4000, seed=42):
+    """Fill a database with a synthetic marketplace"""
+    rng = random.Random(seed)
+    password_hash = db.hash_password('bench123')
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO users (name, email, password_hash, role, phone, address)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(f"{role.title()} {i}", f"{role}{i}@bench.test", password_hash, role, f"+91{9000000000 + i}", "Bench Village")
+              for role, count in (('farmer', farmers), ('buyer', buyers)) for i in range(count)])
+        cursor.execute("SELECT id FROM users WHERE role = 'farmer'")
+        farmer_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM users WHERE role = 'buyer'")
+        buyer_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM users WHERE role = 'agent'")
+        agent_ids = [row[0] for row in cursor.fetchall()] or [None]
+
+        cursor.executemany('''
+            INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, description, location, agent_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(rng.choice(farmer_ids), rng.choice(CROPS), rng.randint(100, 5000), round(rng.uniform(10, 80), 2),
+               "Bench listing", "Bench Village", rng.choice(agent_ids))
+              for _ in range(listings)])
+        cursor.execute('SELECT id, crop_name FROM crop_listings')
+        listing_rows = cursor.fetchall()
+
+        cursor.executemany('''
+            INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(rng.choice(buyer_ids), listing[0], listing[1], round(rng.uniform(10, 80), 2), rng.randint(10, 500),
+               "Bench offer", rng.choice(['pending', 'pending', 'accepted', 'rejected']))
+              for listing in (rng.choice(listing_rows) for _ in range(offers))])
+        conn.commit()
+
+class ConnectPerCallManager(DatabaseManager):
+    """Baseline that opens and closes a fresh connection on every call"""
+
+    connections_opened = 0
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path)
+        type(self).connections_opened += 1
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+def admin_rerun(db, latencies):
+    """Issue the same reads as one render of the admin dashboard"""
+    calls = [
+        db.get_dashboard_stats,
+        db.get_all_users,
+        db.get_crop_listings,
+        lambda: db.get_offers_by_status('pending'),
+        lambda: db.get_offers_by_status('accepted'),
+        lambda: db.get_offers_by_status('rejected'),
+        db.get_offers_by_status,
+    ]
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+def connections_opened(db):
+    if isinstance(db, ConnectPerCallManager):
+        return ConnectPerCallManager.connections_opened
+    return db.pool.connections_opened
+
+def benchmark_pool(reruns=50, lookups=2000):
+    """Connections per admin rerun and query latency, per-call connect vs pool"""
+    print("🔌 Connection pool: admin dashboard reruns and point lookups")
+    path = temp_db_path()
+    try:
+        seed_marketplace(DatabaseManager(path))
+
+        print(f"   {'mode':<18}{'conns/rerun':>12}{'rerun p50':>11}{'rerun p99':>11}{'lookup p50':>12}{'lookup p99':>12}  (ms)")
+        for label, manager_class in (('connect-per-call', ConnectPerCallManager), ('pooled', DatabaseManager)):
+            db = manager_class(path)
+            admin_rerun(db, [])  # warm up
+            opened_before = connections_opened(db)
+            rerun_latencies = []
+            for _ in range(reruns):
+                admin_rerun(db, rerun_latencies)
+            conns_per_rerun = (connections_opened(db) - opened_before) / reruns
+
+            lookup_latencies = []
+            for user_id in range(1, lookups + 1):
+                start = time.perf_counter()
+                db.get_user_by_id(user_id % 100 + 1)
+                lookup_latencies.append((time.perf_counter() - start) * 1000)
+            db.close()
+
+            print(f"   {label:<18}{conns_per_rerun:>12.2f}"
+                  f"{percentile(rerun_latencies, 50):>11.3f}{percentile(rerun_latencies, 99):>11.3f}"
+                  f"{percentile(lookup_latencies, 50):>12.4f}{percentile(lookup_latencies, 99):>12.4f}")
+    finally:
+        remove_db(path)
+
+class LegacyAcceptManager(DatabaseManager):
+    """Baseline with the old read-then-write accept_offer (no write lock, no quantity guard)"""
+
+    def accept_offer(self, offer_id):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                offer = self.get_offer_details(offer_id)
+                if not offer:
+                    return False
+                cursor.execute("UPDATE buyer_offers SET status = 'accepted' WHERE id = ?", (offer_id,))
+                cursor.execute('''
+                    INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name,
+                                            quantity, price_per_unit, total_amount, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (offer['buyer_id'], offer['farmer_id'], offer['crop_listing_id'], offer['crop_name'],
+                      offer['quantity_wanted'], offer['offer_price'], offer['offer_price'] * offer['quantity_wanted'], ''))
+                remaining_quantity = offer['available_quantity'] - offer['quantity_wanted']
+                if remaining_quantity <= 0:
+                    cursor.execute("UPDATE crop_listings SET status = 'sold' WHERE id = ?", (offer['crop_listing_id'],))
+                else:
+                    cursor.execute("UPDATE crop_listings SET quantity = ? WHERE id = ?",
+                                   (remaining_quantity, offer['crop_listing_id']))
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+
+ACCEPT_MANAGERS = {'legacy': LegacyAcceptManager, 'atomic': DatabaseManager}
+
+def accept_worker(path, mode, offer_ids, start, results):
+    db = ACCEPT_MANAGERS[mode](path, pool_size=1)
+    start.wait()
+    results.put(sum(1 for offer_id in offer_ids if db.accept_offer(offer_id)))
+    db.close()
+
+def seed_contended_offers(path, listings, stock, offers_per_listing, seed=7):
+    """Few listings, many pending offers on each: demand is ~3x the stock"""
+    rng = random.Random(seed)
+    db = DatabaseManager(path)
+    farmer = db.get_user_by_email("farmer1@test.com")
+    buyer = db.get_user_by_email("buyer1@test.com")
+    listing_ids = [db.create_crop_listing(farmer['id'], 'wheat', stock, 20.0) for _ in range(listings)]
+    with db.connection() as conn:
+        conn.executemany('''
+            INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(buyer['id'], listing_id, 'wheat', 21.0, rng.randint(1, 6 * stock // offers_per_listing))
+              for listing_id in listing_ids for _ in range(offers_per_listing)])
+        conn.commit()
+        offer_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM buyer_offers WHERE crop_listing_id IN (%s)' % ','.join('?' * len(listing_ids)), listing_ids)]
+    db.close()
+    rng.shuffle(offer_ids)
+    return listing_ids, offer_ids
+
+def benchmark_accept(processes=4, listings=10, stock=1000, offers_per_listing=200):
+    """Accepted offers/sec under multi-process contention, and oversell check"""
+    print(f"🤝 accept_offer contention: {processes} processes, {listings} listings x {offers_per_listing} offers")
+    print(f"   {'mode':<8}{'accepted':>10}{'offers/s':>10}{'oversold listings':>19}{'min quantity':>14}")
+    for mode in ACCEPT_MANAGERS:
+        path = temp_db_path()
+        try:
+            listing_ids, offer_ids = seed_contended_offers(path, listings, stock, offers_per_listing)
+            start, results = multiprocessing.Event(), multiprocessing.Queue()
+            workers = [multiprocessing.Process(target=accept_worker,
+                                               args=(path, mode, offer_ids[i::processes], start, results))
+                       for i in range(processes)]
+            for worker in workers:
+                worker.start()
+            time.sleep(0.5)  # let every worker open its connection
+            began = time.perf_counter()
+            start.set()
+            accepted = sum(results.get() for _ in workers)
+            elapsed = time.perf_counter() - began
+            for worker in workers:
+                worker.join()
+
+            conn = sqlite3.connect(path)
+            placeholders = ','.join('?' * len(listing_ids))
+            sold = dict(conn.execute(f'''
+                SELECT crop_listing_id, SUM(quantity) FROM transactions
+                WHERE crop_listing_id IN ({placeholders}) GROUP BY crop_listing_id
+            ''', listing_ids).fetchall())
+            min_quantity = conn.execute(f'SELECT MIN(quantity) FROM crop_listings WHERE id IN ({placeholders})',
+                                        listing_ids).fetchone()[0]
+            conn.close()
+            oversold = sum(1 for total in sold.values() if total > stock)
+            print(f"   {mode:<8}{accepted:>10}{accepted / elapsed:>10.0f}{oversold:>19}{min_quantity:>14.0f}")
+            if mode == 'atomic':
+                assert oversold == 0 and min_quantity >= 0, "atomic accept_offer oversold a listing"
+        finally:
+            remove_db(path)
+
+def benchmark_bulk(listings=100000, per_row_sample=10000):
+    """Listing import time: create_crop_listing per row vs bulk_create_listings, plus CSV export"""
+    print(f"📦 Bulk import/export of {listings:,} crop listings")
+    rng = random.Random(42)
+    rows = [(rng.randint(3, 5), rng.choice(CROPS), rng.randint(100, 5000), round(rng.uniform(10, 80), 2),
+             "Bench listing", "Bench Village") for _ in range(listings)]
+    path = temp_db_path()
+    export_path = path + '.csv'
+    try:
+        db = DatabaseManager(path)
+        # The per-row path is timed on a sample and extrapolated
+        start = time.perf_counter()
+        for row in rows[:per_row_sample]:
+            db.create_crop_listing(*row)
+        per_row = (time.perf_counter() - start) / per_row_sample * listings
+
+        start = time.perf_counter()
+        report = db.bulk_create_listings(rows)
+        bulk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = db.export_listings(export_path)
+        export = time.perf_counter() - start
+        db.close()
+
+        print(f"   create_crop_listing x {listings:,}: {per_row:8.2f} s  (extrapolated from {per_row_sample:,})")
+        print(f"   bulk_create_listings:        {bulk:8.2f} s  ({report['inserted']:,} rows, {len(report['errors'])} errors)")
+        print(f"   export_listings to CSV:      {export:8.2f} s  ({exported:,} rows)")
+    finally:
+        remove_db(path)
+        if os.path.exists(export_path):
+            os.remove(export_path)
+
+def aggregate_dashboard_stats(db):
+    """Baseline: the four aggregate queries get_dashboard_stats used to run"""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT role, COUNT(*) FROM users WHERE is_active = 1 GROUP BY role')
+        cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM crop_listings WHERE status = 'available'")
+        cursor.fetchone()
+        cursor.execute('SELECT COUNT(*) FROM transactions')
+        cursor.fetchone()
+        cursor.execute('SELECT SUM(total_amount) FROM transactions')
+        cursor.fetchone()
+
+def median_ms(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50)
+
+def benchmark_dashboard(sizes=(10000, 100000, 1000000, 10000000)):
+    """get_dashboard_stats latency as transactions grow: aggregates vs counters row"""
+    print("📊 Dashboard stats vs transactions table size")
+    print(f"   {'transactions':>14}{'aggregates':>12}{'counters':>10}{'insert/row':>12}  (ms)")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        loaded = 0
+        for size in sizes:
+            # Inserts go through the counter triggers, so their cost is measured too
+            start = time.perf_counter()
+            with db.connection() as conn:
+                conn.execute('''
+                    WITH RECURSIVE n(x) AS (SELECT ? UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+                    INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, quantity, price_per_unit, total_amount)
+                    SELECT x % 50 + 1, x % 50 + 2, x % 2000 + 1, 'wheat', 10, 20.0, 200.0 FROM n
+                ''', (loaded + 1, size))
+                conn.commit()
+            insert_ms = (time.perf_counter() - start) * 1000 / (size - loaded)
+            loaded = size
+
+            repeat = max(3, min(200, 10000000 // size))
+            aggregates = median_ms(lambda: aggregate_dashboard_stats(db), max(3, repeat // 10))
+            counters = median_ms(db.get_dashboard_stats, repeat)
+            assert db.get_dashboard_stats()['total_transactions'] == size
+            print(f"   {size:>14,}{aggregates:>12.3f}{counters:>10.4f}{insert_ms:>12.5f}")
+        db.close()
+    finally:
+        remove_db(path)
+
+LISTINGS_QUERY = '''
+    SELECT cl.id, cl.farmer_id, COALESCE(cl.farmer_name, u.name) as farmer_name,
+           COALESCE(cl.farmer_phone, u.phone) as farmer_phone, cl.crop_name, cl.quantity,
+           cl.expected_price, cl.description, cl.location, cl.status, cl.created_at, cl.updated_at, cl.agent_id
+    FROM crop_listings cl
+    LEFT JOIN users u ON cl.farmer_id = u.id
+    WHERE cl.status = 'available'
+    ORDER BY cl.created_at DESC
+'''
+
+def dict_rows(db):
+    """Baseline: one hand-built dict per row, as the read methods used to do"""
+    with db.connection() as conn:
+        cursor = conn.execute(LISTINGS_QUERY)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def frame_from_dicts(db):
+    """Baseline: how the admin views built their DataFrame"""
+    return pd.DataFrame(dict_rows(db))
+
+def frame_from_rows(db):
+    with db.connection() as conn:
+        cursor = conn.execute(LISTINGS_QUERY)
+        return rows_to_frame([column[0] for column in cursor.description], cursor.fetchall())
+
+def measure(call, repeat=5):
+    """(median ms, peak traced MB) of a call"""
+    call()  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    result = call()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    del result
+    return percentile(samples, 50), peak
+
+def benchmark_mapping(listings=200000):
+    """Time and peak memory of reading every available listing: dicts vs Records vs frames"""
+    print(f"🗂️  Result mapping for {listings:,} listings")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        seed_marketplace(db, listings=listings, offers=0)
+        print(f"   {'mapping':<32}{'median ms':>10}{'peak MB':>10}")
+        for label, call in (('dict per row (before)', lambda: dict_rows(db)),
+                            ('Record per row', db.get_crop_listings),
+                            ('DataFrame from dicts (before)', lambda: frame_from_dicts(db)),
+                            ('DataFrame from columns', lambda: frame_from_rows(db))):
+            elapsed, peak = measure(call)
+            print(f"   {label:<32}{elapsed:>10.1f}{peak:>10.1f}")
+        db.close()
+    finally:
+        remove_db(path)
+
+VILLAGES = ['Ramgarh', 'Khetri', 'Bhiwani', 'Nashik', 'Guntur', 'Karnal', 'Hassan', 'Sangli', 'Bijnor', 'Ludhiana']
+QUALITIES = ['organic', 'premium', 'fresh', 'sun dried', 'hybrid', 'export grade', 'local', 'graded']
+
+def fill_search_listings(db, listings, batch=100000):
+    """Insert listings with varied text in large batches (FTS triggers included)"""
+    crops = ', '.join(f"'{crop}'" for crop in CROPS)
+    villages = ', '.join(f"'{village}'" for village in VILLAGES)
+    qualities = ', '.join(f"'{quality}'" for quality in QUALITIES)
+    with db.connection() as conn:
+        for start in range(0, listings, batch):
+            conn.execute(f'''
+                WITH RECURSIVE n(x) AS (SELECT ? UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+                INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, description, location, status)
+                SELECT x % 3 + 3,
+                       json_extract(json_array({crops}), '$[' || (x % {len(CROPS)}) || ']'),
+                       x % 900 + 100, x % 60 + 10,
+                       json_extract(json_array({qualities}), '$[' || (x / 100 % {len(QUALITIES)}) || ']')
+                           || ' lot ' || (x % 9973),
+                       json_extract(json_array({villages}), '$[' || (x / 10 % {len(VILLAGES)}) || ']') || ', India',
+                       CASE WHEN x % 7 = 0 THEN 'sold' ELSE 'available' END
+                FROM n
+            ''', (start + 1, min(start + batch, listings)))
+            conn.commit()
+
+def like_search(db, query, limit=20):
+    """Baseline: substring match on every text column, then sort"""
+    conditions = ' AND '.join(
+        "(cl.crop_name LIKE ? OR cl.description LIKE ? OR cl.location LIKE ? OR cl.farmer_name LIKE ?)"
+        for _ in query.split())
+    params = [f'%{term}%' for term in query.split() for _ in range(4)]
+    with db.connection() as conn:
+        return conn.execute(f'''
+            SELECT cl.id FROM crop_listings cl
+            WHERE cl.status = 'available' AND {conditions}
+            ORDER BY cl.created_at DESC LIMIT ?
+        ''', params + [limit]).fetchall()
+
+def benchmark_search(listings=1000000, repeat=20):
+    """Ranked search_listings latency at 1M listings vs a LIKE scan"""
+    print(f"🔍 Listing search over {listings:,} listings")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        start = time.perf_counter()
+        fill_search_listings(db, listings)
+        print(f"   loaded in {time.perf_counter() - start:.1f} s (FTS triggers included)")
+        print(f"   {'query':<24}{'matches':>9}{'p50 ms':>9}{'p99 ms':>9}{'LIKE p50':>10}")
+        for query in ('saffron', 'lot 4217', 'karnal organic', 'bhiwani cotton graded', 'sugarc', 'wheat'):
+            matches = len(db.search_listings(query, limit=listings)[0])
+            samples = []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                db.search_listings(query)
+                samples.append((time.perf_counter() - begin) * 1000)
+            like = median_ms(lambda: like_search(db, query), 3)
+            print(f"   {query:<24}{matches:>9,}{percentile(samples, 50):>9.2f}{percentile(samples, 99):>9.2f}{like:>10.1f}")
+        db.close()
+    finally:
+        remove_db(path)
+
+def benchmark_sessions(users=1000, checks=5000):
+    """Per-rerun login check: cached token vs user_sessions lookup vs re-checking the password"""
+    print(f"🔑 Session check, {users:,} users, {checks:,} checks")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        emails = [f'user{i}@bench.com' for i in range(users)]
+        db.bulk_create_users([(f'User {i}', email, 'secret123', 'buyer', '', '') for i, email in enumerate(emails)])
+        tokens = [db.create_session(db.get_user_by_email(email)['id']) for email in emails]
+
+        def per_check_us(call, keys):
+            start = time.perf_counter()
+            for i in range(checks):
+                call(keys[i % len(keys)])
+            return (time.perf_counter() - start) / checks * 1e6
+
+        for token in tokens:
+            db.validate_session(token)
+        cached = per_check_us(db.validate_session, tokens)
+        db.session_cache.ttl = 0
+        lookup = per_check_us(db.validate_session, tokens)
+        password = per_check_us(lambda email: db.authenticate_user(email, 'secret123'), emails)
+        print(f"   session cache         {cached:8.1f} us")
+        print(f"   user_sessions lookup  {lookup:8.1f} us")
+        print(f"   authenticate_user     {password:8.1f} us")
+        db.close()
+    finally:
+        remove_db(path)
+
+def import_time_ms(module):
+    """Cumulative import time of a module from `python -X importtime`, in ms"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return float('nan')
+
+def first_render_ms(reruns=5):
+    """Login page render latency under Streamlit's AppTest: first run and later reruns"""
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file('app.py', default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first = (time.perf_counter() - start) * 1000
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return first, percentile(samples, 50)
+
+def benchmark_startup(repeat=20):
+    """Cost of constructing DatabaseManager on a bootstrapped database, plus import and first-render time"""
+    print("🚀 Startup")
+    path = temp_db_path()
+    try:
+        start = time.perf_counter()
+        DatabaseManager(path).close()
+        print(f"   first boot (tables, migrations, seed data)  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        def construct(bootstrap):
+            db = DatabaseManager(path)
+            if bootstrap:
+                db.init_database()  # what every construction used to run
+            db.close()
+        print(f"   DatabaseManager() before, every start       {median_ms(lambda: construct(True), repeat):8.1f} ms")
+        print(f"   DatabaseManager() now, schema current       {median_ms(lambda: construct(False), repeat):8.1f} ms")
+    finally:
+        remove_db(path)
+
+    print(f"   python -X importtime: database              {import_time_ms('database'):8.1f} ms")
+    print(f"   python -X importtime: streamlit             {import_time_ms('streamlit'):8.1f} ms")
+    # Renders against config.DATABASE_PATH, which is already bootstrapped
+    first, rerun = first_render_ms()
+    print(f"   app.py first render (AppTest)               {first:8.1f} ms")
+    print(f"   app.py rerun, p50 (AppTest)                 {rerun:8.1f} ms")
+
+def benchmark_async(requests=500):
+    """Concurrent chatbot-style requests: asyncio facade vs one thread per request"""
+    print(f"⚡ {requests} concurrent requests (farmer offers, then one offer each)")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        seed_marketplace(db, listings=500, offers=2000)
+        with db.connection() as conn:
+            farmer_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'farmer'")]
+            buyer_id = conn.execute("SELECT id FROM users WHERE role = 'buyer'").fetchone()[0]
+            listing_ids = [row[0] for row in conn.execute("SELECT id FROM crop_listings LIMIT 100")]
+
+        def handle(manager, i):
+            manager.get_offers_for_farmer(farmer_ids[i % len(farmer_ids)])
+            return manager.create_buyer_offer(buyer_id, listing_ids[i % len(listing_ids)], 'wheat', 20.0, 1)
+
+        async def serve():
+            async with AsyncDatabaseManager(path) as facade:
+                async def handle_async(i):
+                    await facade.get_offers_for_farmer(farmer_ids[i % len(farmer_ids)])
+                    return await facade.create_buyer_offer(buyer_id, listing_ids[i % len(listing_ids)], 'wheat', 20.0, 1)
+                results = await asyncio.gather(*[handle_async(i) for i in range(requests)])
+                return results, threading.active_count()
+
+        start = time.perf_counter()
+        results, threads = asyncio.run(serve())
+        elapsed = time.perf_counter() - start
+        print(f"   asyncio facade      {elapsed * 1000:8.0f} ms  {threads:4d} threads  "
+              f"{sum(r is not None for r in results)} offers")
+
+        results, peak = [None] * requests, [0]
+        def worker(i):
+            results[i] = handle(db, i)
+            peak[0] = max(peak[0], threading.active_count())
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(requests)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"   thread per request  {elapsed * 1000:8.0f} ms  {peak[0]:4d} threads  "
+              f"{sum(r is not None for r in results)} offers")
+        db.close()
+    finally:
+        remove_db(path)
+
+def benchmark_cache(reruns=200, write_every=20):
+    """Queries and latency per dashboard rerun with and without the read cache"""
+    print(f"🗃️ Read cache: {reruns} reruns, one write every {write_every}")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        seed_marketplace(db)
+        with db.connection() as conn:
+            farmer_id, = conn.execute("SELECT id FROM users WHERE role = 'farmer' LIMIT 1").fetchone()
+            agent_id, = conn.execute("SELECT id FROM users WHERE role = 'agent' LIMIT 1").fetchone()
+            buyer_id, = conn.execute("SELECT id FROM users WHERE role = 'buyer' LIMIT 1").fetchone()
+
+        def rerun():
+            db.get_crop_listings_page(limit=20)
+            db.get_crop_listings()
+            db.get_farmer_listings(farmer_id)
+            db.get_offers_for_agent(agent_id)
+            db.get_offers_by_status('pending')
+
+        for label, cache_size in (('no cache', 0), ('read cache', 256)):
+            db.read_cache = ReadCache(cache_size, ttl=30)
+            statements = []
+            with db.connection() as conn:
+                conn.set_trace_callback(statements.append)
+                start = time.perf_counter()
+                for i in range(reruns):
+                    if i % write_every == write_every - 1:
+                        listing_id = db.create_crop_listing(farmer_id, 'wheat', 10, 20.0, agent_id=agent_id)
+                        db.create_buyer_offer(buyer_id, listing_id, 'wheat', 21.0, 5)
+                    rerun()
+                elapsed = time.perf_counter() - start
+                conn.set_trace_callback(None)
+            reads = sum(sql.lstrip().upper().startswith('SELECT') for sql in statements)
+            print(f"   {label:<11} {reads / reruns:6.2f} queries/rerun  {elapsed / reruns * 1000:7.2f} ms/rerun  "
+                  f"hit rate {db.read_cache.hit_rate():.0%}")
+        db.close()
+    finally:
+        remove_db(path)
+
+def benchmark_archive(listings=50000, offers=150000, closed_share=0.9, repeat=20):
+    """Everyday reads on tables full of old closed rows, before and after archiving them"""
+    print(f"🗄️ Archiving: {listings:,} listings, {offers:,} offers, {closed_share:.0%} of listings sold long ago")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        db.read_cache = ReadCache(0, ttl=0)  # time the queries, not the cache
+        seed_marketplace(db, listings=listings, offers=offers)
+        with db.connection() as conn:
+            conn.execute(f"UPDATE crop_listings SET status = 'sold', updated_at = '2020-01-01 00:00:00' "
+                         f"WHERE id % 100 < {int(closed_share * 100)}")
+            conn.execute("UPDATE buyer_offers SET status = 'rejected' WHERE status = 'pending' AND crop_listing_id IN "
+                         "(SELECT id FROM crop_listings WHERE status = 'sold')")
+            conn.execute("UPDATE buyer_offers SET updated_at = '2020-01-01 00:00:00' WHERE status != 'pending'")
+            conn.commit()
+            farmer_id, = conn.execute("SELECT farmer_id FROM crop_listings GROUP BY farmer_id "
+                                      "ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+
+        reads = [
+            ('available listings', lambda: db.get_crop_listings()),
+            ('pending offers', lambda: db.get_offers_by_status('pending')),
+            ('farmer listings', lambda: db.get_farmer_listings(farmer_id)),
+            ('closed offers tab', lambda: db.get_offers_by_status('accepted') + db.get_offers_by_status('rejected')),
+        ]
+        before = {label: median_ms(read, repeat) for label, read in reads}
+        start = time.perf_counter()
+        archived = db.archive_closed_rows()
+        elapsed = time.perf_counter() - start
+        print(f"   archived {archived['buyer_offers']:,} offers and {archived['crop_listings']:,} listings "
+              f"in {elapsed:.2f}s")
+        for label, read in reads:
+            print(f"   {label:<19} {before[label]:8.2f} ms -> {median_ms(read, repeat):8.2f} ms")
+        closed = lambda: (db.get_offers_by_status('accepted', include_archived=True) +
+                          db.get_offers_by_status('rejected', include_archived=True))
+        print(f"   {'closed + archived':<19} {median_ms(closed, 5):8.2f} ms (on demand)")
+        db.close()
+    finally:
+        remove_db(path)
+
+def benchmark_events(events=100000, threads=4, baseline_events=2000):
+    """Events per second through the buffered event log vs one INSERT + commit per event"""
+    print(f"📝 Event log: {events:,} events from {threads} threads")
+    path = temp_db_path()
+    try:
+        db = DatabaseManager(path)
+        event = ('update_offer_status', 1, 'buyer_offers', 42, {'status': 'rejected'})
+
+        start = time.perf_counter()
+        with db.connection() as conn:
+            for i in range(baseline_events):
+                conn.execute('''
+                    INSERT INTO event_log (occurred_at, action, actor_id, subject_type, subject_id, details)
+                    VALUES (CURRENT_TIMESTAMP, ?, ?, ?, ?, ?)
+                ''', (*event[:4], '{"status": "rejected"}'))
+                conn.commit()
+        per_event = (time.perf_counter() - start) / baseline_events
+        print(f"   insert per event {1 / per_event:>12,.0f} events/s  {per_event * 1e6:8.1f} µs per action")
+
+        latencies = []
+
+        def producer(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                db.event_log.record(*event)
+                latencies.append(time.perf_counter() - started)
+
+        workers = [threading.Thread(target=producer, args=(events // threads,)) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        recorded = time.perf_counter() - start
+        while db.event_log.written < events:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        print(f"   buffered log     {events / elapsed:>12,.0f} events/s  "
+              f"{percentile(latencies, 50) * 1e6:8.1f} µs per action (p99 {percentile(latencies, 99) * 1e6:.1f} µs)")
+        print(f"   recorded in {recorded:.2f}s, durable after {elapsed:.2f}s in {db.event_log.batches:,} batches")
+
+        lags = []
+        for _ in range(5):
+            written = db.event_log.written
+            started = time.perf_counter()
+            db.event_log.record(*event)
+            while db.event_log.written == written:
+                time.sleep(0.001)
+            lags.append(time.perf_counter() - started)
+        print(f"   single event durable after {max(lags) * 1000:.0f} ms max "
+              f"(flush interval {db.event_log.flush_interval * 1000:.0f} ms)")
+        db.close()
+    finally:
+        remove_db(path)
+
+BENCHMARKS = {
+    'pool': benchmark_pool,
+    'accept': benchmark_accept,
+    'bulk': benchmark_bulk,
+    'dashboard': benchmark_dashboard,
+    'mapping': benchmark_mapping,
+    'search': benchmark_search,
+    'sessions': benchmark_sessions,
+    'startup': benchmark_startup,
+    'async': benchmark_async,
+    'cache': benchmark_cache,
+    'archive': benchmark_archive,
+    'events': benchmark_events,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
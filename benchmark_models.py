@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the crop recommendation model paths
+
+Usage:
+    python benchmark_models.py              # run every benchmark
+    python benchmark_models.py engine       # run selected benchmarks
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset_generator import CLIP_RANGES, COMPREHENSIVE_PROFILES, generate, write_dataset
+from recommendations import CONFIDENCE_THRESHOLD, FEATURE_COLUMNS, MOISTURE_TO_RAINFALL, PredictionCache, recommend_batch
+from recommendation_grid import RecommendationGrid
+from soil_profiles import soil_profile
+from tree_engine import FlatForest, HybridForest, compile_model
+
+MODEL_PATH = 'crop_recommendation_model.pkl'
+
+def load_or_train_model():
+    """The app's model, or one trained the way train_model.py does if it was never built"""
+    if os.path.exists(MODEL_PATH):
+        with open(MODEL_PATH, 'rb') as f:
+            return pickle.load(f)
+    from sklearn.ensemble import RandomForestClassifier
+    from train_model import create_comprehensive_dataset
+    print(f"   ({MODEL_PATH} not found: training an equivalent model in memory)")
+    df = create_comprehensive_dataset()
+    model = RandomForestClassifier(n_estimators=300, random_state=42, max_depth=15, min_samples_split=5,
+                                   min_samples_leaf=3)
+    return model.fit(df[FEATURE_COLUMNS], df['crop'])
+
+def farm_rows(count, seed=42):
+    """Farms like the ones the model was trained on, with 10% jitter so some are ambiguous"""
+    from train_model import create_comprehensive_dataset
+    rng = np.random.default_rng(seed)
+    base = create_comprehensive_dataset()[FEATURE_COLUMNS].to_numpy()
+    rows = base[rng.integers(0, len(base), count)] * rng.normal(1, 0.1, (count, len(FEATURE_COLUMNS)))
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+def recommend_each(model, rows):
+    """The old one-farm-per-click path: predict_proba, then predict again when confident"""
+    crops = []
+    for i in range(len(rows)):
+        input_features = rows.iloc[[i]]
+        confidence = max(model.predict_proba(input_features)[0]) * 100
+        crops.append(model.predict(input_features)[0] if confidence >= CONFIDENCE_THRESHOLD else None)
+    return crops
+
+def benchmark_recommend(sizes=(10, 100, 1000, 10000), per_row_limit=200):
+    """Rows per second for one-at-a-time predictions vs recommend_batch"""
+    print("🌾 Crop recommendations: farms per second")
+    model = load_or_train_model()
+    rows = farm_rows(per_row_limit)
+    start = time.perf_counter()
+    recommend_each(model, rows)
+    per_row = (time.perf_counter() - start) / per_row_limit
+    print(f"   one at a time    {1 / per_row:>10,.0f} rows/s  ({per_row * 1000:.1f} ms per farm)")
+    for size in sizes:
+        rows = farm_rows(size)
+        recommend_batch(model, rows.head(10))  # warm up
+        start = time.perf_counter()
+        results = recommend_batch(model, rows)
+        elapsed = time.perf_counter() - start
+        print(f"   batch of {size:>6,} {size / elapsed:>10,.0f} rows/s  ({elapsed * 1000:8.1f} ms, "
+              f"{(results['source'] == 'water').mean():.0%} water-based)")
+
+def best_of(repeats, fn, *args):
+    """Fastest of several timed calls, in seconds, and the last result"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def benchmark_engine(sizes=(1, 10, 100, 500, 1000, 10000, 100000)):
+    """model.predict_proba vs the flattened FlatForest and the registry's HybridForest, batch sizes 1 to 100k"""
+    print("🌲 Tree inference: sklearn predict_proba vs FlatForest vs HybridForest (what the registry loads)")
+    model = load_or_train_model()
+    # Single-threaded, the setting FlatForest is bit-identical to
+    model.set_params(n_jobs=None)
+    start = time.perf_counter()
+    flat = FlatForest.from_sklearn(model)
+    print(f"   flattened {flat.n_trees} trees, {len(flat.feature):,} nodes in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    hybrid = HybridForest(flat, estimator=model)
+    for size in sizes:
+        rows = farm_rows(size)
+        repeats = 5 if size <= 1000 else 1
+        sklearn_time, expected = best_of(repeats, model.predict_proba, rows)
+        flat_time, proba = best_of(repeats, flat.predict_proba, rows)
+        hybrid_time, hybrid_proba = best_of(repeats, hybrid.predict_proba, rows)
+        identical = np.array_equal(proba, expected) and np.array_equal(hybrid_proba, expected)
+        print(f"   batch of {size:>7,}  sklearn {sklearn_time * 1000:9.1f} ms  flat {flat_time * 1000:9.1f} ms  "
+              f"hybrid {hybrid_time * 1000:9.1f} ms via {'flat' if size <= hybrid.max_flat_rows else 'sklearn'}  "
+              f"({sklearn_time / hybrid_time:5.2f}x, {'identical' if identical else 'DIFFERENT'})")
+
+def district_requests(count, seed=7):
+    """Manual-soil submissions from one district: five towns' weather, mostly the default sliders"""
+    rng = np.random.default_rng(seed)
+    towns = rng.uniform([22, 45], [34, 90], (5, 2))
+    requests = []
+    for _ in range(count):
+        temperature, humidity = towns[rng.integers(len(towns))] + rng.normal(0, [0.15, 0.3])
+        if rng.random() < 0.7:
+            soil = [20, 20, 20, 6.5, 50]  # the form's defaults
+        else:
+            soil = [rng.integers(0, 150), rng.integers(0, 100), rng.integers(0, 150),
+                    round(rng.uniform(5, 8.5), 1), rng.integers(10, 90)]
+        requests.append([temperature, humidity] + soil[:4] + [soil[4] * MOISTURE_TO_RAINFALL])
+    return requests
+
+def benchmark_cache(count=2000):
+    """Single-farm recommendations for a district's traffic, with and without the prediction cache"""
+    print(f"🗃️  Prediction cache: {count:,} manual-soil submissions from one district")
+    model = compile_model(load_or_train_model())
+    requests = district_requests(count)
+    start = time.perf_counter()
+    for features in requests:
+        recommend_batch(model, [features])
+    uncached = (time.perf_counter() - start) / count
+    cache = PredictionCache()
+    start = time.perf_counter()
+    for features in requests:
+        cache.recommend(model, features)
+    cached = (time.perf_counter() - start) / count
+    stats = cache.stats()
+    print(f"   uncached    {uncached * 1000:6.2f} ms per submission")
+    print(f"   cached      {cached * 1000:6.2f} ms per submission  ({stats['hit_rate']:.0%} hits, "
+          f"{stats['entries']} cells cached)")
+
+def benchmark_grid(lookups=10000):
+    """Building the recommendation grid, and answering from it vs running the model per message"""
+    print("🗺️  Recommendation grid: chatbot answers per soil profile and weather")
+    model = compile_model(load_or_train_model())
+    start = time.perf_counter()
+    grid = RecommendationGrid.build(model, 'benchmark')
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'grid.npz')
+        grid.save(path)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        RecommendationGrid.load(path)
+        load_time = time.perf_counter() - start
+    print(f"   build  {grid.crop.size:,} points in {build_time:.1f} s, {size / 1e6:.1f} MB, "
+          f"loaded in {load_time * 1000:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    towns = ['Pune', 'Delhi', 'Kolhapur', 'Chennai', 'Shimla']
+    messages = [(towns[rng.integers(len(towns))], rng.uniform(15, 40), rng.uniform(35, 95)) for _ in range(lookups)]
+    start = time.perf_counter()
+    for location, temperature, humidity in messages[:200]:
+        profile = soil_profile(location)[1]
+        recommend_batch(model, [[temperature, humidity] + [profile[name] for name in FEATURE_COLUMNS[2:]]])
+    per_model_run = (time.perf_counter() - start) / 200
+    start = time.perf_counter()
+    for location, temperature, humidity in messages:
+        grid.lookup(location, temperature, humidity)
+    per_lookup = (time.perf_counter() - start) / lookups
+    print(f"   model run per message {per_model_run * 1000:8.2f} ms")
+    print(f"   grid lookup           {per_lookup * 1000:8.4f} ms  ({per_model_run / per_lookup:,.0f}x faster)")
+
+def dataset_each(rows):
+    """The old generator: one dict per sample, one np.random call per value"""
+    np.random.seed(42)
+    samples = []
+    for crop, profile in COMPREHENSIVE_PROFILES.iterrows():
+        for _ in range(rows // len(COMPREHENSIVE_PROFILES)):
+            sample = {name: np.random.normal(*profile[name]) for name in FEATURE_COLUMNS}
+            sample['crop'] = crop
+            samples.append(sample)
+    df = pd.DataFrame(samples)
+    for name, (low, high) in CLIP_RANGES.items():
+        df[name] = np.clip(df[name], low, high)
+    return df
+
+def benchmark_dataset(sizes=(1000, 100000, 1000000), per_row_limit=100000, stream_rows=1000000):
+    """Rows per second generating training data: per-sample loop vs dataset_generator, in memory and streamed"""
+    print("🧪 Synthetic training data: rows per second")
+    for size in sizes:
+        if size <= per_row_limit:
+            loop_time, _ = best_of(1, dataset_each, size)
+            loop = f"loop {size / loop_time:>10,.0f} rows/s"
+        else:
+            loop = f"{'(loop skipped)':<22}"
+        vector_time, _ = best_of(3 if size <= 100000 else 1, generate, 'comprehensive', size)
+        print(f"   {size:>9,} rows  {loop}   vectorized {size / vector_time:>12,.0f} rows/s")
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ('csv', 'parquet'):
+            path = os.path.join(directory, f"stress.{extension}")
+            try:
+                elapsed, written = best_of(1, write_dataset, path, 'enhanced', stream_rows)
+            except ImportError as e:
+                print(f"   streamed to .{extension}: skipped ({e})")
+                continue
+            print(f"   streamed {written:,} enhanced rows to .{extension:<8} {written / elapsed:>10,.0f} rows/s  "
+                  f"({os.path.getsize(path) / 1e6:.0f} MB)")
+
+def load_or_train_enhanced_model():
+    """The 500-tree forest train_enhanced_model.py builds, loaded if it was trained already"""
+    if os.path.exists('enhanced_crop_model.pkl'):
+        with open('enhanced_crop_model.pkl', 'rb') as f:
+            return pickle.load(f)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+    from train_enhanced_model import create_enhanced_dataset
+    print("   (enhanced_crop_model.pkl not found: training an equivalent model in memory)")
+    df = create_enhanced_dataset()
+    df['water_resource_encoded'] = LabelEncoder().fit_transform(df['water_resource'])
+    model = RandomForestClassifier(n_estimators=500, max_depth=20, min_samples_split=3, min_samples_leaf=2,
+                                   random_state=42, n_jobs=-1)
+    return model.fit(df[FEATURE_COLUMNS + ['water_resource_encoded']], df['crop'])
+
+def memory_kb():
+    """(private anonymous, file-backed) resident kB of this process; Linux only"""
+    with open('/proc/self/status') as f:
+        fields = dict(line.split(':', 1) for line in f)
+    return int(fields['RssAnon'].split()[0]), int(fields['RssFile'].split()[0])
+
+def artifact_worker(mode, path):
+    """One app process: load the model the given way, predict, report load ms and memory added"""
+    from model_registry import ModelRegistry
+    rows = np.random.default_rng(0).uniform(0, 100, (1000, 8))
+    start = time.perf_counter()
+    if mode == 'pickle':
+        # Unpickling a forest imports sklearn first; timed separately from the load itself
+        import sklearn.ensemble  # noqa: F401
+    import_ms = (time.perf_counter() - start) * 1000
+    before = memory_kb()
+    start = time.perf_counter()
+    if mode == 'pickle':
+        with open(path, 'rb') as f:
+            model = compile_model(pickle.load(f))
+    elif mode == 'mmap':
+        model = FlatForest.load(path)
+    else:
+        model = ModelRegistry(path).load('enhanced', 'v1').model
+    elapsed = time.perf_counter() - start
+    model.predict_proba(rows)
+    after = memory_kb()
+    print(import_ms, elapsed * 1000, after[0] - before[0], after[1] - before[1], flush=True)
+    sys.stdin.readline()  # stay alive until every worker has loaded
+
+def benchmark_artifacts(workers=4):
+    """Cold load time and per-process memory: pickle.load vs memory-mapped .npy arrays"""
+    print(f"📦 Model artifacts: {workers} app processes loading the enhanced model")
+    if not os.path.exists('/proc/self/status'):
+        print("   (needs Linux /proc to measure memory: skipped)")
+        return
+    model = load_or_train_enhanced_model()
+    with tempfile.TemporaryDirectory() as directory:
+        from model_registry import ModelRegistry
+        pickle_path = os.path.join(directory, 'model.pkl')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(model, f)
+        forest_path = os.path.join(directory, 'forest')
+        files = FlatForest.from_sklearn(model).save(forest_path)
+        ModelRegistry(os.path.join(directory, 'registry')).publish('enhanced', model)
+        forest_mb = sum(os.path.getsize(os.path.join(forest_path, name)) for name in files) / 1e6
+        print(f"   pickle {os.path.getsize(pickle_path) / 1e6:.1f} MB, .npy arrays {forest_mb:.1f} MB")
+
+        for mode, path, label in (('pickle', pickle_path, 'pickle.load + flatten'),
+                                  ('mmap', forest_path, 'FlatForest.load (mmap)'),
+                                  ('registry', os.path.join(directory, 'registry'), 'registry (mmap + sha256)')):
+            # Started one after another (each stays up), so loads don't compete for the CPU
+            processes, reports = [], []
+            for _ in range(workers):
+                processes.append(subprocess.Popen([sys.executable, '-c', f"from benchmark_models import artifact_worker; "
+                                                                         f"artifact_worker({mode!r}, {path!r})"],
+                                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+                reports.append([float(value) for value in processes[-1].stdout.readline().split()])
+            for process in processes:
+                process.communicate('\n')
+            import_ms, load_ms, private_kb, file_kb = np.median(reports, axis=0)
+            imports = f" (+{import_ms:.0f} ms importing sklearn)" if mode == 'pickle' else ''
+            print(f"   {label:<26} load {load_ms:6.1f} ms   private {private_kb / 1024:5.1f} MB/process   "
+                  f"shared file pages {file_kb / 1024:5.1f} MB{imports}")
+
+def streaming_worker(mode, path):
+    """Run in a fresh process (see benchmark_streaming): seconds and peak RSS (MB) of one way to use the CSV"""
+    from train_streaming_model import peak_rss_mb, train_out_of_core
+    start = time.perf_counter()
+    if mode == 'read_csv':
+        pd.read_csv(path)
+        accuracy = float('nan')
+    else:
+        accuracy = train_out_of_core(path)[1]['accuracy']
+    print(time.perf_counter() - start, peak_rss_mb(), accuracy, flush=True)
+
+def benchmark_streaming(rows=3000000):
+    """Peak RSS of loading a large soil CSV into pandas vs training on it out of core"""
+    print(f"💾 Out-of-core training: {rows:,}-row soil CSV")
+    from train_streaming_model import peak_rss_mb
+    if peak_rss_mb() is None:
+        print("   (needs the resource module to measure peak RSS: skipped)")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'train.csv')
+        write_dataset(path, 'comprehensive', rows)  # sorted by crop
+        print(f"   CSV {os.path.getsize(path) / 1e6:,.0f} MB")
+        for mode, label in (('read_csv', 'pd.read_csv (load only)'), ('train', 'train_out_of_core')):
+            output = subprocess.run([sys.executable, '-c', f"from benchmark_models import streaming_worker; "
+                                                          f"streaming_worker({mode!r}, {path!r})"],
+                                    capture_output=True, text=True, check=True).stdout
+            elapsed, peak, accuracy = (float(value) for value in output.split()[-3:])
+            trained = '' if mode == 'read_csv' else f"   holdout accuracy {accuracy:.3f}"
+            print(f"   {label:<24} {elapsed:6.1f} s   peak RSS {peak:7,.0f} MB{trained}")
+
+def benchmark_tuning(candidates=8):
+    """Cross-validation wall time: serial vs process pool, and a re-run served from the fold cache"""
+    import config
+    from train_enhanced_model import create_enhanced_dataset, prepare_enhanced_data
+    from tune_enhanced_model import FoldCache, cross_validate, grid_candidates
+    print(f"🎛️ Hyperparameter search: {candidates} candidates x {config.TUNING_FOLDS} folds, {os.cpu_count()} CPUs")
+    X, y, _ = prepare_enhanced_data(create_enhanced_dataset())
+    params = grid_candidates(config.TUNING_PARAM_GRID, 'random', candidates)
+    with tempfile.TemporaryDirectory() as directory:
+        for label, workers, cache_dir in (('serial, cold', 1, 'serial'), ('process pool, cold', None, 'pool'),
+                                          ('process pool, re-run', None, 'pool')):
+            cache = FoldCache(os.path.join(directory, cache_dir))
+            elapsed, results = best_of(1, cross_validate, X, y, params, config.TUNING_FOLDS, workers, cache)
+            print(f"   {label:<22} {elapsed:7.2f} s   {cache.misses:3d} folds fitted, {cache.hits:3d} cached   "
+                  f"best {results['mean_accuracy'].iloc[0]:.4f}")
+
+BENCHMARKS = {
+    'recommend': benchmark_recommend,
+    'engine': benchmark_engine,
+    'artifacts': benchmark_artifacts,
+    'cache': benchmark_cache,
+    'grid': benchmark_grid,
+    'dataset': benchmark_dataset,
+    'streaming': benchmark_streaming,
+    'tuning': benchmark_tuning,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
@@ -1,115 +1,1186 @@
 import sqlite3
+import csv
+import functools
 import hashlib
+import inspect
 import os
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Iterator, Union
 import pandas as pd
+import config
+from event_log import EventLog
+from storage_backends import PostgresBackend, SQLiteBackend
+
+# Keyset pagination cursor: (created_at, id) of the last row of a page
+PageCursor = Tuple[str, int]
+
+# search_listings cursor: (score, id) of the last row of a page
+SearchCursor = Tuple[float, int]
+
+# bm25 column weights for crop_listings_fts: crop_name, description, location, farmer_name
+SEARCH_WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+# Filters accepted by DatabaseManager.search_listings
+SEARCH_FILTERS = {
+    'status': 'cl.status = ?',
+    'crop_name': 'cl.crop_name = ?',
+    'farmer_id': 'cl.farmer_id = ?',
+    'agent_id': 'cl.agent_id = ?',
+    'min_price': 'cl.expected_price >= ?',
+    'max_price': 'cl.expected_price <= ?',
+    'min_quantity': 'cl.quantity >= ?',
+}
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query where every word must match.
+    
+    Words are quoted so FTS5 operators in user input are plain text; only the
+    last word matches as a prefix (it may still be half typed), since prefix
+    terms cost more to look up.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in (text or '').split()]
+    if not terms:
+        return None
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def tsquery(text: str) -> Optional[str]:
+    """fts_query for PostgreSQL's to_tsquery: quoted words joined by &, the last one a prefix"""
+    terms = ["'" + term.replace('\\', '\\\\').replace("'", "''") + "'" for term in (text or '').split()]
+    if not terms:
+        return None
+    terms[-1] += ':*'
+    return ' & '.join(terms)
+
+# Ranked matches for search_listings per storage backend: (rowid, score) rows
+# for a query built by the paired function, lower score = better match
+SEARCH_MATCHES = {
+    'sqlite': (fts_query, f'''
+        SELECT rowid, bm25(crop_listings_fts, {', '.join(map(str, SEARCH_WEIGHTS))}) AS score
+        FROM crop_listings_fts
+        WHERE crop_listings_fts MATCH ?
+    '''),
+    # ts_rank weights are {D, C, B, A}, see crop_listing_document; the score is
+    # float8 so keyset cursors compare exactly
+    'postgres': (tsquery, '''
+        SELECT rowid, (-ts_rank('{0.1, 0.1, 0.4, 1.0}', document, query))::float8 AS score
+        FROM crop_listings_fts, to_tsquery('simple', ?) query
+        WHERE document @@ query
+    '''),
+}
+
+class Record(Mapping):
+    """Read-only mapping over one result row.
+    
+    Every row of a query shares one column -> position index and keeps the
+    tuple sqlite3 returned, so a row costs one two-slot object instead of a
+    dict, and adding a column to a SELECT can never shift the keys.
+    """
+    
+    __slots__ = ('_index', '_values')
+    
+    def __init__(self, index: Dict[str, int], values: tuple):
+        self._index = index
+        self._values = values
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._index[key]]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+    
+    def __reduce__(self):
+        return Record, (self._index, self._values)
+
+def column_index(cursor: sqlite3.Cursor) -> Dict[str, int]:
+    """Column name -> position for the cursor's current result set"""
+    return {column[0]: position for position, column in enumerate(cursor.description)}
+
+def fetch_records(cursor: sqlite3.Cursor) -> List[Record]:
+    index = column_index(cursor)
+    return [Record(index, row) for row in cursor.fetchall()]
+
+def fetch_record(cursor: sqlite3.Cursor) -> Optional[Record]:
+    row = cursor.fetchone()
+    return Record(column_index(cursor), row) if row is not None else None
+
+def rows_to_frame(columns: List[str], rows: List[tuple]) -> pd.DataFrame:
+    """Build a DataFrame straight from fetched tuples, skipping per-row dicts.
+    
+    pandas packs the tuples into one NumPy object array and converts it to
+    typed columns, which is both faster and smaller than going through dicts.
+    """
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+class SessionCache:
+    """Thread-safe LRU of validated session tokens (by hash) -> user.
+    
+    An entry is trusted for ``ttl`` seconds, and never past the session's own
+    expiry, before DatabaseManager.validate_session checks the database again.
+    That bounds how long a logout on another replica can go unnoticed.
+    """
+    
+    def __init__(self, max_size: int = 4096, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str, now: float) -> Optional[Record]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry[1] or now - entry[2] >= self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: str, user: Record, expires_at: float, now: float):
+        with self._lock:
+            self._entries[key] = (user, expires_at, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def discard_user(self, user_id: int):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0]['id'] == user_id]:
+                del self._entries[key]
+    
+    def purge_expired(self, now: float):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if now >= entry[1]]:
+                del self._entries[key]
+
+class ReadCache:
+    """Thread-safe LRU of read results, each tagged with the generations of the tables it read.
+    
+    Write methods bump the generation of every table they change (see
+    ``invalidates``), which turns every cached read of those tables into a
+    miss. Writes from other processes or raw SQL are not seen, so an entry
+    is also only trusted for ``ttl`` seconds.
+    """
+    
+    MISSING = object()
+    
+    def __init__(self, max_size: int = 256, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def generations(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+    
+    def get(self, key: tuple, tables: Tuple[str, ...], now: float) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or now - entry[2] >= self.ttl
+                    or entry[1] != tuple(self._generations.get(table, 0) for table in tables)):
+                self.misses += 1
+                return self.MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: tuple, value: Any, generations: Tuple[int, ...], now: float):
+        """Store a result read at ``generations``, taken before the query ran"""
+        with self._lock:
+            self._entries[key] = (value, generations, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+    
+    def hit_rate(self) -> float:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+def copy_result(value: Any) -> Any:
+    """Copy the containers of a cached read so callers cannot change the cached value"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(copy_result(item) for item in value)
+    return value
+
+def cached_read(*tables: str):
+    """Serve a DatabaseManager read from its read cache until one of ``tables`` is written"""
+    def decorate(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def read(self, *args, **kwargs):
+            # Keyed on the bound arguments with defaults filled in, so positional,
+            # keyword and omitted-default spellings of a call share one entry
+            try:
+                bound = signature.bind(self, *args, **kwargs)
+            except TypeError:
+                return method(self, *args, **kwargs)  # let the method report the bad call
+            bound.apply_defaults()
+            key = (method.__name__, tuple(bound.arguments.items())[1:])
+            now = time.time()
+            try:
+                result = self.read_cache.get(key, tables, now)
+            except TypeError:
+                # Unhashable arguments: not cacheable
+                return method(self, *args, **kwargs)
+            if result is ReadCache.MISSING:
+                generations = self.read_cache.generations(tables)
+                result = method(self, *args, **kwargs)
+                self.read_cache.put(key, result, generations, now)
+            return copy_result(result)
+        return read
+    return decorate
+
+def invalidates(*tables: str):
+    """Bump the read cache generation of ``tables`` once a DatabaseManager write returns"""
+    def decorate(method):
+        @functools.wraps(method)
+        def write(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.read_cache.bump(*tables)
+        return write
+    return decorate
+
+# Tables behind the cached listing and offer reads (listings join users for
+# the farmer's name and phone; offers join listings and buyers)
+LISTING_READ_TABLES = ('crop_listings', 'users')
+OFFER_READ_TABLES = ('buyer_offers', 'crop_listings', 'users')
+
+def hash_session_token(token: str) -> str:
+    """Only token hashes are stored, so a leaked table or cache cannot be replayed"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def utc_timestamp(epoch: float) -> str:
+    """Epoch seconds as a UTC timestamp string, the format CURRENT_TIMESTAMP uses"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def event_range(since: Union[str, datetime, None], until: Union[str, datetime, None],
+                action: str = None) -> Tuple[str, list]:
+    """WHERE clause and params for an event_log query over [since, until)"""
+    conditions, params = [], []
+    for condition, value in (('e.occurred_at >= ?', since), ('e.occurred_at < ?', until), ('e.action = ?', action)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else str(value))
+    return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+def epoch_seconds(timestamp: Union[str, datetime]) -> float:
+    """Inverse of utc_timestamp (PostgreSQL returns the column as a naive UTC datetime)"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived connections opened by a storage backend.
+    
+    Each thread holds at most one connection at a time: nested checkouts on
+    the same thread (e.g. a method calling another method) reuse it. At most
+    ``max_size`` connections are ever opened; when all are checked out, other
+    threads wait up to ``timeout`` seconds for one to be returned.
+    """
+    
+    def __init__(self, backend: Union[SQLiteBackend, PostgresBackend], max_size: int = 8, timeout: float = 30.0):
+        self.backend = backend
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.connections_opened = 0
+        self.checkouts = 0
+    
+    def _checkout(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self.checkouts += 1
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    self.connections_opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self.backend.dbapi.OperationalError("connection pool exhausted")
+                self._cond.wait(remaining)
+        
+        try:
+            return self.backend.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+    
+    def _checkin(self, conn: sqlite3.Connection):
+        # Never hand a connection with an open transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+        
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            try:
+                self._checkin(conn)
+            except self.backend.dbapi.Error:
+                # Broken connection: drop it and free its slot
+                conn.close()
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+    
+    def close(self):
+        """Close all idle connections"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._size -= 1
+
+# Base tables, created by DatabaseManager.init_database before the migrations run
+SQLITE_TABLES = [
+    # Users table
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL CHECK (role IN ('admin', 'farmer', 'buyer', 'agent')),
+        phone TEXT,
+        address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1
+    )''',
+    # Crop listings table
+    '''CREATE TABLE IF NOT EXISTS crop_listings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        farmer_id INTEGER NOT NULL,
+        crop_name TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        expected_price REAL NOT NULL,
+        description TEXT,
+        location TEXT,
+        status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'cancelled')),
+        farmer_name TEXT,
+        farmer_phone TEXT,
+        agent_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (farmer_id) REFERENCES users (id),
+        FOREIGN KEY (agent_id) REFERENCES users (id)
+    )''',
+    # Buyer offers table
+    '''CREATE TABLE IF NOT EXISTS buyer_offers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        buyer_id INTEGER NOT NULL,
+        crop_listing_id INTEGER,
+        crop_name TEXT NOT NULL,
+        offer_price REAL NOT NULL,
+        quantity_wanted REAL NOT NULL,
+        notes TEXT,
+        status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'accepted', 'rejected', 'cancelled')),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (buyer_id) REFERENCES users (id),
+        FOREIGN KEY (crop_listing_id) REFERENCES crop_listings (id)
+    )''',
+    # Transactions table
+    '''CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        buyer_id INTEGER NOT NULL,
+        farmer_id INTEGER NOT NULL,
+        crop_listing_id INTEGER NOT NULL,
+        crop_name TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        price_per_unit REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'completed' CHECK (status IN ('completed', 'pending', 'cancelled')),
+        notes TEXT,
+        FOREIGN KEY (buyer_id) REFERENCES users (id),
+        FOREIGN KEY (farmer_id) REFERENCES users (id),
+        FOREIGN KEY (crop_listing_id) REFERENCES crop_listings (id)
+    )''',
+    # User sessions table for session management
+    '''CREATE TABLE IF NOT EXISTS user_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        session_token TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        is_active BOOLEAN DEFAULT 1,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )''',
+]
+
+# The same tables on PostgreSQL: SERIAL ids, DOUBLE PRECISION for SQLite's
+# REAL, 0/1 INTEGER flags, and whole-second UTC timestamps like SQLite's
+# CURRENT_TIMESTAMP (PostgresBackend sets the session time zone to UTC)
+POSTGRES_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL CHECK (role IN ('admin', 'farmer', 'buyer', 'agent')),
+        phone TEXT,
+        address TEXT,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        is_active INTEGER DEFAULT 1
+    )''',
+    '''CREATE TABLE IF NOT EXISTS crop_listings (
+        id SERIAL PRIMARY KEY,
+        farmer_id INTEGER NOT NULL REFERENCES users (id),
+        crop_name TEXT NOT NULL,
+        quantity DOUBLE PRECISION NOT NULL,
+        expected_price DOUBLE PRECISION NOT NULL,
+        description TEXT,
+        location TEXT,
+        status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'cancelled')),
+        farmer_name TEXT,
+        farmer_phone TEXT,
+        agent_id INTEGER REFERENCES users (id),
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS buyer_offers (
+        id SERIAL PRIMARY KEY,
+        buyer_id INTEGER NOT NULL REFERENCES users (id),
+        crop_listing_id INTEGER REFERENCES crop_listings (id),
+        crop_name TEXT NOT NULL,
+        offer_price DOUBLE PRECISION NOT NULL,
+        quantity_wanted DOUBLE PRECISION NOT NULL,
+        notes TEXT,
+        status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'accepted', 'rejected', 'cancelled')),
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS transactions (
+        id SERIAL PRIMARY KEY,
+        buyer_id INTEGER NOT NULL REFERENCES users (id),
+        farmer_id INTEGER NOT NULL REFERENCES users (id),
+        crop_listing_id INTEGER NOT NULL REFERENCES crop_listings (id),
+        crop_name TEXT NOT NULL,
+        quantity DOUBLE PRECISION NOT NULL,
+        price_per_unit DOUBLE PRECISION NOT NULL,
+        total_amount DOUBLE PRECISION NOT NULL,
+        transaction_date TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'completed' CHECK (status IN ('completed', 'pending', 'cancelled')),
+        notes TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS user_sessions (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users (id),
+        session_token TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP(0) NOT NULL,
+        is_active INTEGER DEFAULT 1
+    )''',
+]
+
+# Recompute the dashboard_counters row from the base tables (full scans; used
+# by migration 3 and DatabaseManager.reconcile_dashboard_counters). An upsert
+# both SQLite and PostgreSQL accept; SQLite needs the WHERE before ON CONFLICT.
+DASHBOARD_COUNTERS_REBUILD = '''
+    INSERT INTO dashboard_counters (id, total_farmers, total_buyers, total_agents, total_admins,
+                                    active_listings, total_transactions, total_transaction_value)
+    SELECT 1,
+           (SELECT COUNT(*) FROM users WHERE is_active = 1 AND role = 'farmer'),
+           (SELECT COUNT(*) FROM users WHERE is_active = 1 AND role = 'buyer'),
+           (SELECT COUNT(*) FROM users WHERE is_active = 1 AND role = 'agent'),
+           (SELECT COUNT(*) FROM users WHERE is_active = 1 AND role = 'admin'),
+           (SELECT COUNT(*) FROM crop_listings WHERE status = 'available'),
+           (SELECT COUNT(*) FROM transactions),
+           (SELECT COALESCE(SUM(total_amount), 0) FROM transactions)
+    WHERE true
+    ON CONFLICT (id) DO UPDATE SET
+        total_farmers = excluded.total_farmers,
+        total_buyers = excluded.total_buyers,
+        total_agents = excluded.total_agents,
+        total_admins = excluded.total_admins,
+        active_listings = excluded.active_listings,
+        total_transactions = excluded.total_transactions,
+        total_transaction_value = excluded.total_transaction_value
+'''
+
+DASHBOARD_COUNTER_COLUMNS = ['total_farmers', 'total_buyers', 'total_agents', 'total_admins',
+                             'active_listings', 'total_transactions', 'total_transaction_value']
+
+# Columns copied verbatim into the archive tables by archive_closed_rows and
+# spanned by the crop_listings_all / buyer_offers_all views
+CROP_LISTING_COLUMNS = ('id, farmer_id, crop_name, quantity, expected_price, description, location, status, '
+                        'farmer_name, farmer_phone, agent_id, created_at, updated_at')
+BUYER_OFFER_COLUMNS = ('id, buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes, status, '
+                       'created_at, updated_at')
+
+# What archive_closed_rows moves, in order: (table, archive table, columns,
+# closed statuses, extra condition). Offers go first so a listing is only
+# archived once none of its offers are left in the hot table.
+ARCHIVE_TIERS = [
+    ('buyer_offers', 'buyer_offers_archive', BUYER_OFFER_COLUMNS, ('accepted', 'rejected', 'cancelled'), ''),
+    ('crop_listings', 'crop_listings_archive', CROP_LISTING_COLUMNS, ('sold', 'cancelled'),
+     'AND NOT EXISTS (SELECT 1 FROM buyer_offers bo WHERE bo.crop_listing_id = crop_listings.id)'),
+]
+
+# Versioned schema migrations, applied in order by DatabaseManager.apply_migrations.
+# Append new versions at the end; never edit a version that has shipped.
+MIGRATIONS = [
+    (1, "Indexes for the marketplace read paths", [
+        # get_crop_listings: WHERE status = ? ORDER BY created_at
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_status_created ON crop_listings (status, created_at)',
+        # get_farmer_listings / get_offers_for_farmer: WHERE farmer_id = ?
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_farmer_created ON crop_listings (farmer_id, created_at)',
+        # get_agent_listings / get_offers_for_agent: WHERE agent_id = ?
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_agent_created ON crop_listings (agent_id, created_at)',
+        # offers joined to their listing
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_listing ON buyer_offers (crop_listing_id)',
+        # get_offers_by_status: WHERE status = ? ORDER BY created_at
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_status_created ON buyer_offers (status, created_at)',
+        # get_buyer_offers: WHERE buyer_id = ? ORDER BY created_at
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_buyer_created ON buyer_offers (buyer_id, created_at)',
+    ]),
+    (2, "Indexes for unfiltered keyset pagination", [
+        # get_buyer_offers_page / get_offers_by_status_page without a filter
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_created ON buyer_offers (created_at)',
+        # get_all_users_page
+        'CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)',
+    ]),
+    (3, "Trigger-maintained dashboard counters", [
+        # Single row read by get_dashboard_stats; reconcile_dashboard_counters rebuilds it
+        '''CREATE TABLE IF NOT EXISTS dashboard_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_farmers INTEGER NOT NULL DEFAULT 0,
+            total_buyers INTEGER NOT NULL DEFAULT 0,
+            total_agents INTEGER NOT NULL DEFAULT 0,
+            total_admins INTEGER NOT NULL DEFAULT 0,
+            active_listings INTEGER NOT NULL DEFAULT 0,
+            total_transactions INTEGER NOT NULL DEFAULT 0,
+            total_transaction_value REAL NOT NULL DEFAULT 0
+        )''',
+        DASHBOARD_COUNTERS_REBUILD,
+        # Active users by role
+        '''CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert AFTER INSERT ON users
+        WHEN NEW.is_active = 1 BEGIN
+            UPDATE dashboard_counters SET
+                total_farmers = total_farmers + (NEW.role = 'farmer'),
+                total_buyers = total_buyers + (NEW.role = 'buyer'),
+                total_agents = total_agents + (NEW.role = 'agent'),
+                total_admins = total_admins + (NEW.role = 'admin')
+            WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete AFTER DELETE ON users
+        WHEN OLD.is_active = 1 BEGIN
+            UPDATE dashboard_counters SET
+                total_farmers = total_farmers - (OLD.role = 'farmer'),
+                total_buyers = total_buyers - (OLD.role = 'buyer'),
+                total_agents = total_agents - (OLD.role = 'agent'),
+                total_admins = total_admins - (OLD.role = 'admin')
+            WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_users_counters_update AFTER UPDATE OF role, is_active ON users
+        BEGIN
+            UPDATE dashboard_counters SET
+                total_farmers = total_farmers + (NEW.is_active = 1 AND NEW.role = 'farmer') - (OLD.is_active = 1 AND OLD.role = 'farmer'),
+                total_buyers = total_buyers + (NEW.is_active = 1 AND NEW.role = 'buyer') - (OLD.is_active = 1 AND OLD.role = 'buyer'),
+                total_agents = total_agents + (NEW.is_active = 1 AND NEW.role = 'agent') - (OLD.is_active = 1 AND OLD.role = 'agent'),
+                total_admins = total_admins + (NEW.is_active = 1 AND NEW.role = 'admin') - (OLD.is_active = 1 AND OLD.role = 'admin')
+            WHERE id = 1;
+        END''',
+        # Available listings
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_counters_insert AFTER INSERT ON crop_listings
+        WHEN NEW.status = 'available' BEGIN
+            UPDATE dashboard_counters SET active_listings = active_listings + 1 WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_counters_delete AFTER DELETE ON crop_listings
+        WHEN OLD.status = 'available' BEGIN
+            UPDATE dashboard_counters SET active_listings = active_listings - 1 WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_counters_update AFTER UPDATE OF status ON crop_listings
+        WHEN (NEW.status = 'available') <> (OLD.status = 'available') BEGIN
+            UPDATE dashboard_counters SET
+                active_listings = active_listings + (NEW.status = 'available') - (OLD.status = 'available')
+            WHERE id = 1;
+        END''',
+        # Transaction count and value
+        '''CREATE TRIGGER IF NOT EXISTS trg_transactions_counters_insert AFTER INSERT ON transactions
+        BEGIN
+            UPDATE dashboard_counters SET
+                total_transactions = total_transactions + 1,
+                total_transaction_value = total_transaction_value + COALESCE(NEW.total_amount, 0)
+            WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_transactions_counters_delete AFTER DELETE ON transactions
+        BEGIN
+            UPDATE dashboard_counters SET
+                total_transactions = total_transactions - 1,
+                total_transaction_value = total_transaction_value - COALESCE(OLD.total_amount, 0)
+            WHERE id = 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_transactions_counters_update AFTER UPDATE OF total_amount ON transactions
+        BEGIN
+            UPDATE dashboard_counters SET
+                total_transaction_value = total_transaction_value + COALESCE(NEW.total_amount, 0) - COALESCE(OLD.total_amount, 0)
+            WHERE id = 1;
+        END''',
+    ]),
+    (4, "Full-text search over crop listings", [
+        # rowid = crop_listings.id; farmer_name falls back to the farmer's account name
+        # like the listing reads do
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS crop_listings_fts USING fts5(
+            crop_name, description, location, farmer_name,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )''',
+        '''INSERT INTO crop_listings_fts (rowid, crop_name, description, location, farmer_name)
+        SELECT cl.id, cl.crop_name, cl.description, cl.location, COALESCE(cl.farmer_name, u.name)
+        FROM crop_listings cl
+        LEFT JOIN users u ON cl.farmer_id = u.id''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_fts_insert AFTER INSERT ON crop_listings
+        BEGIN
+            INSERT INTO crop_listings_fts (rowid, crop_name, description, location, farmer_name)
+            VALUES (NEW.id, NEW.crop_name, NEW.description, NEW.location,
+                    COALESCE(NEW.farmer_name, (SELECT name FROM users WHERE id = NEW.farmer_id)));
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_fts_delete AFTER DELETE ON crop_listings
+        BEGIN
+            DELETE FROM crop_listings_fts WHERE rowid = OLD.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_crop_listings_fts_update
+        AFTER UPDATE OF crop_name, description, location, farmer_name, farmer_id ON crop_listings
+        BEGIN
+            UPDATE crop_listings_fts SET
+                crop_name = NEW.crop_name,
+                description = NEW.description,
+                location = NEW.location,
+                farmer_name = COALESCE(NEW.farmer_name, (SELECT name FROM users WHERE id = NEW.farmer_id))
+            WHERE rowid = NEW.id;
+        END''',
+        # Listings without their own farmer_name are indexed under the account name
+        '''CREATE TRIGGER IF NOT EXISTS trg_users_fts_rename AFTER UPDATE OF name ON users
+        BEGIN
+            UPDATE crop_listings_fts SET farmer_name = NEW.name
+            WHERE rowid IN (SELECT id FROM crop_listings WHERE farmer_id = NEW.id AND farmer_name IS NULL);
+        END''',
+    ]),
+    (5, "Indexes for session lookups and expiry sweeps", [
+        # sweep_expired_sessions: WHERE expires_at <= ?
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at)',
+        # revoking every session of a deactivated user
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions (user_id)',
+    ]),
+    (6, "Archive tiers for closed offers and sold/cancelled listings", [
+        '''CREATE TABLE IF NOT EXISTS crop_listings_archive (
+            id INTEGER PRIMARY KEY,
+            farmer_id INTEGER NOT NULL,
+            crop_name TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            expected_price REAL NOT NULL,
+            description TEXT,
+            location TEXT,
+            status TEXT NOT NULL,
+            farmer_name TEXT,
+            farmer_phone TEXT,
+            agent_id INTEGER,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS buyer_offers_archive (
+            id INTEGER PRIMARY KEY,
+            buyer_id INTEGER NOT NULL,
+            crop_listing_id INTEGER,
+            crop_name TEXT NOT NULL,
+            offer_price REAL NOT NULL,
+            quantity_wanted REAL NOT NULL,
+            notes TEXT,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # archive_closed_rows: WHERE status IN (...) AND updated_at < ?
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_status_updated ON crop_listings (status, updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_status_updated ON buyer_offers (status, updated_at)',
+        # the include_archived reads
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_archive_farmer_created ON crop_listings_archive (farmer_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_buyer_offers_archive_status_created ON buyer_offers_archive (status, created_at)',
+        f'''CREATE VIEW IF NOT EXISTS crop_listings_all AS
+        SELECT {CROP_LISTING_COLUMNS} FROM crop_listings
+        UNION ALL
+        SELECT {CROP_LISTING_COLUMNS} FROM crop_listings_archive''',
+        f'''CREATE VIEW IF NOT EXISTS buyer_offers_all AS
+        SELECT {BUYER_OFFER_COLUMNS} FROM buyer_offers
+        UNION ALL
+        SELECT {BUYER_OFFER_COLUMNS} FROM buyer_offers_archive''',
+    ]),
+    (7, "Append-only event log", [
+        '''CREATE TABLE IF NOT EXISTS event_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            occurred_at TIMESTAMP NOT NULL,
+            action TEXT NOT NULL,
+            actor_id INTEGER,
+            subject_type TEXT,
+            subject_id INTEGER,
+            details TEXT
+        )''',
+        # get_events / get_event_counts: WHERE occurred_at >= ? AND occurred_at < ?
+        'CREATE INDEX IF NOT EXISTS idx_event_log_occurred ON event_log (occurred_at)',
+        'CREATE INDEX IF NOT EXISTS idx_event_log_action_occurred ON event_log (action, occurred_at)',
+        '''CREATE TRIGGER IF NOT EXISTS trg_event_log_no_update BEFORE UPDATE ON event_log
+        BEGIN
+            SELECT RAISE(ABORT, 'event_log is append-only');
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_event_log_no_delete BEFORE DELETE ON event_log
+        BEGIN
+            SELECT RAISE(ABORT, 'event_log is append-only');
+        END''',
+    ]),
+]
+
+# MIGRATIONS for PostgreSQL, version for version: the indexes are shared,
+# triggers call PL/pgSQL functions and search uses a tsvector table with the
+# same rowid = crop_listings.id layout as crop_listings_fts. Append new
+# versions to both lists.
+POSTGRES_MIGRATIONS = [
+    MIGRATIONS[0],
+    MIGRATIONS[1],
+    (3, MIGRATIONS[2][1], [
+        '''CREATE TABLE IF NOT EXISTS dashboard_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_farmers INTEGER NOT NULL DEFAULT 0,
+            total_buyers INTEGER NOT NULL DEFAULT 0,
+            total_agents INTEGER NOT NULL DEFAULT 0,
+            total_admins INTEGER NOT NULL DEFAULT 0,
+            active_listings INTEGER NOT NULL DEFAULT 0,
+            total_transactions INTEGER NOT NULL DEFAULT 0,
+            total_transaction_value DOUBLE PRECISION NOT NULL DEFAULT 0
+        )''',
+        DASHBOARD_COUNTERS_REBUILD,
+        # Active users by role
+        '''CREATE OR REPLACE FUNCTION dashboard_counters_users() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            old_role TEXT := CASE WHEN TG_OP <> 'INSERT' AND OLD.is_active = 1 THEN OLD.role END;
+            new_role TEXT := CASE WHEN TG_OP <> 'DELETE' AND NEW.is_active = 1 THEN NEW.role END;
+        BEGIN
+            IF old_role IS DISTINCT FROM new_role THEN
+                UPDATE dashboard_counters SET
+                    total_farmers = total_farmers + (new_role IS NOT DISTINCT FROM 'farmer')::int - (old_role IS NOT DISTINCT FROM 'farmer')::int,
+                    total_buyers = total_buyers + (new_role IS NOT DISTINCT FROM 'buyer')::int - (old_role IS NOT DISTINCT FROM 'buyer')::int,
+                    total_agents = total_agents + (new_role IS NOT DISTINCT FROM 'agent')::int - (old_role IS NOT DISTINCT FROM 'agent')::int,
+                    total_admins = total_admins + (new_role IS NOT DISTINCT FROM 'admin')::int - (old_role IS NOT DISTINCT FROM 'admin')::int
+                WHERE id = 1;
+            END IF;
+            RETURN NULL;
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_users_counters ON users',
+        '''CREATE TRIGGER trg_users_counters AFTER INSERT OR DELETE OR UPDATE OF role, is_active ON users
+        FOR EACH ROW EXECUTE FUNCTION dashboard_counters_users()''',
+        # Available listings
+        '''CREATE OR REPLACE FUNCTION dashboard_counters_listings() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            delta INTEGER := (CASE WHEN TG_OP <> 'DELETE' AND NEW.status = 'available' THEN 1 ELSE 0 END)
+                           - (CASE WHEN TG_OP <> 'INSERT' AND OLD.status = 'available' THEN 1 ELSE 0 END);
+        BEGIN
+            IF delta <> 0 THEN
+                UPDATE dashboard_counters SET active_listings = active_listings + delta WHERE id = 1;
+            END IF;
+            RETURN NULL;
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_crop_listings_counters ON crop_listings',
+        '''CREATE TRIGGER trg_crop_listings_counters AFTER INSERT OR DELETE OR UPDATE OF status ON crop_listings
+        FOR EACH ROW EXECUTE FUNCTION dashboard_counters_listings()''',
+        # Transaction count and value
+        '''CREATE OR REPLACE FUNCTION dashboard_counters_transactions() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE dashboard_counters SET
+                total_transactions = total_transactions
+                    + (CASE WHEN TG_OP = 'INSERT' THEN 1 WHEN TG_OP = 'DELETE' THEN -1 ELSE 0 END),
+                total_transaction_value = total_transaction_value
+                    + (CASE WHEN TG_OP <> 'DELETE' THEN COALESCE(NEW.total_amount, 0) ELSE 0 END)
+                    - (CASE WHEN TG_OP <> 'INSERT' THEN COALESCE(OLD.total_amount, 0) ELSE 0 END)
+            WHERE id = 1;
+            RETURN NULL;
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_transactions_counters ON transactions',
+        '''CREATE TRIGGER trg_transactions_counters AFTER INSERT OR DELETE OR UPDATE OF total_amount ON transactions
+        FOR EACH ROW EXECUTE FUNCTION dashboard_counters_transactions()''',
+    ]),
+    (4, MIGRATIONS[3][1], [
+        # Weights mirror SEARCH_WEIGHTS: crop name A, location and farmer name B, description D
+        '''CREATE OR REPLACE FUNCTION crop_listing_document(crop_name TEXT, description TEXT, location TEXT,
+                                                          farmer_name TEXT) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('simple', COALESCE(crop_name, '')), 'A')
+                || setweight(to_tsvector('simple', COALESCE(location, '')), 'B')
+                || setweight(to_tsvector('simple', COALESCE(farmer_name, '')), 'B')
+                || setweight(to_tsvector('simple', COALESCE(description, '')), 'D')
+        $$''',
+        '''CREATE TABLE IF NOT EXISTS crop_listings_fts (
+            rowid INTEGER PRIMARY KEY,
+            document TSVECTOR NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_crop_listings_fts_document ON crop_listings_fts USING GIN (document)',
+        '''INSERT INTO crop_listings_fts (rowid, document)
+        SELECT cl.id, crop_listing_document(cl.crop_name, cl.description, cl.location, COALESCE(cl.farmer_name, u.name))
+        FROM crop_listings cl
+        LEFT JOIN users u ON cl.farmer_id = u.id
+        ON CONFLICT (rowid) DO NOTHING''',
+        '''CREATE OR REPLACE FUNCTION crop_listings_fts_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM crop_listings_fts WHERE rowid = OLD.id;
+            ELSE
+                INSERT INTO crop_listings_fts (rowid, document)
+                VALUES (NEW.id, crop_listing_document(NEW.crop_name, NEW.description, NEW.location,
+                        COALESCE(NEW.farmer_name, (SELECT name FROM users WHERE id = NEW.farmer_id))))
+                ON CONFLICT (rowid) DO UPDATE SET document = excluded.document;
+            END IF;
+            RETURN NULL;
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_crop_listings_fts ON crop_listings',
+        '''CREATE TRIGGER trg_crop_listings_fts
+        AFTER INSERT OR DELETE OR UPDATE OF crop_name, description, location, farmer_name, farmer_id ON crop_listings
+        FOR EACH ROW EXECUTE FUNCTION crop_listings_fts_sync()''',
+        # Listings without their own farmer_name are indexed under the account name
+        '''CREATE OR REPLACE FUNCTION crop_listings_fts_rename() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE crop_listings_fts f
+            SET document = crop_listing_document(cl.crop_name, cl.description, cl.location, NEW.name)
+            FROM crop_listings cl
+            WHERE f.rowid = cl.id AND cl.farmer_id = NEW.id AND cl.farmer_name IS NULL;
+            RETURN NULL;
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_users_fts_rename ON users',
+        '''CREATE TRIGGER trg_users_fts_rename AFTER UPDATE OF name ON users
+        FOR EACH ROW EXECUTE FUNCTION crop_listings_fts_rename()''',
+    ]),
+    MIGRATIONS[4],
+    (6, MIGRATIONS[5][1], [
+        '''CREATE TABLE IF NOT EXISTS crop_listings_archive (
+            id INTEGER PRIMARY KEY,
+            farmer_id INTEGER NOT NULL,
+            crop_name TEXT NOT NULL,
+            quantity DOUBLE PRECISION NOT NULL,
+            expected_price DOUBLE PRECISION NOT NULL,
+            description TEXT,
+            location TEXT,
+            status TEXT NOT NULL,
+            farmer_name TEXT,
+            farmer_phone TEXT,
+            agent_id INTEGER,
+            created_at TIMESTAMP(0),
+            updated_at TIMESTAMP(0),
+            archived_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS buyer_offers_archive (
+            id INTEGER PRIMARY KEY,
+            buyer_id INTEGER NOT NULL,
+            crop_listing_id INTEGER,
+            crop_name TEXT NOT NULL,
+            offer_price DOUBLE PRECISION NOT NULL,
+            quantity_wanted DOUBLE PRECISION NOT NULL,
+            notes TEXT,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP(0),
+            updated_at TIMESTAMP(0),
+            archived_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Offers and transactions may now point at an archived listing
+        'ALTER TABLE buyer_offers DROP CONSTRAINT IF EXISTS buyer_offers_crop_listing_id_fkey',
+        'ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_crop_listing_id_fkey',
+        *MIGRATIONS[5][2][2:6],
+        f'''CREATE OR REPLACE VIEW crop_listings_all AS
+        SELECT {CROP_LISTING_COLUMNS} FROM crop_listings
+        UNION ALL
+        SELECT {CROP_LISTING_COLUMNS} FROM crop_listings_archive''',
+        f'''CREATE OR REPLACE VIEW buyer_offers_all AS
+        SELECT {BUYER_OFFER_COLUMNS} FROM buyer_offers
+        UNION ALL
+        SELECT {BUYER_OFFER_COLUMNS} FROM buyer_offers_archive''',
+    ]),
+    (7, MIGRATIONS[6][1], [
+        '''CREATE TABLE IF NOT EXISTS event_log (
+            id BIGSERIAL PRIMARY KEY,
+            occurred_at TIMESTAMP(0) NOT NULL,
+            action TEXT NOT NULL,
+            actor_id INTEGER,
+            subject_type TEXT,
+            subject_id INTEGER,
+            details TEXT
+        )''',
+        *MIGRATIONS[6][2][1:3],
+        '''CREATE OR REPLACE FUNCTION event_log_append_only() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            RAISE EXCEPTION 'event_log is append-only';
+        END $$''',
+        'DROP TRIGGER IF EXISTS trg_event_log_append_only ON event_log',
+        '''CREATE TRIGGER trg_event_log_append_only BEFORE UPDATE OR DELETE ON event_log
+        FOR EACH ROW EXECUTE FUNCTION event_log_append_only()''',
+    ]),
+]
+
+# Schema per storage backend: (base tables, migrations)
+SCHEMAS = {
+    'sqlite': (SQLITE_TABLES, MIGRATIONS),
+    'postgres': (POSTGRES_TABLES, POSTGRES_MIGRATIONS),
+}
+
+# Version of the last migration; a database at this version needs no bootstrap
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Columns understood by the bulk importers; CSV/Excel files need a header row
+# with these names (extra columns are ignored).
+USER_IMPORT_COLUMNS = ['name', 'email', 'password', 'role', 'phone', 'address']
+LISTING_IMPORT_COLUMNS = ['farmer_id', 'crop_name', 'quantity', 'expected_price', 'description',
+                          'location', 'farmer_name', 'farmer_phone', 'agent_id']
+
+# Columns written by the exporters (never the password hash)
+USER_EXPORT_COLUMNS = ['id', 'name', 'email', 'role', 'phone', 'address', 'created_at', 'is_active']
+LISTING_EXPORT_COLUMNS = ['id'] + LISTING_IMPORT_COLUMNS + ['status', 'created_at', 'updated_at']
+
+# Anything the importers accept: a .csv/.xlsx path, or an iterable of dicts
+# keyed by column or of sequences in column order
+ImportSource = Union[str, os.PathLike, Iterable[Any]]
+
+def is_excel_path(path: str) -> bool:
+    return path.lower().endswith(('.xlsx', '.xlsm'))
+
+def iter_import_rows(source: ImportSource, columns: List[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Stream (row number, row dict) pairs from a CSV/Excel file or an iterable.
+
+    Row numbers are spreadsheet line numbers for files (the header is line 1)
+    and 1-based positions for iterables, so errors can be traced back.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if is_excel_path(path):
+            import openpyxl
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+                for row_number, values in enumerate(rows, start=2):
+                    if any(value not in (None, '') for value in values):
+                        yield row_number, dict(zip(header, values))
+            finally:
+                workbook.close()
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+    else:
+        for row_number, row in enumerate(source, start=1):
+            yield row_number, row if isinstance(row, dict) else dict(zip(columns, row))
+
+def write_export_rows(destination: Union[str, os.PathLike], columns: List[str], rows: Iterable[tuple]) -> int:
+    """Stream rows to a CSV or write-only Excel file; returns the number of rows written"""
+    path = os.fspath(destination)
+    written = 0
+    if is_excel_path(path):
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(list(row))
+            written += 1
+        workbook.save(path)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+    return written
+
+def _import_text(row: Dict[str, Any], key: str, required: bool = False) -> Optional[str]:
+    value = row.get(key)
+    value = '' if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise ValueError(f"missing {key}")
+        return None
+    return value
+
+def _import_number(row: Dict[str, Any], key: str) -> float:
+    value = _import_text(row, key, required=True)
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{key} is not a number: {value!r}")
+    if number <= 0:
+        raise ValueError(f"{key} must be positive")
+    return number
+
+def _import_id(row: Dict[str, Any], key: str, required: bool = False) -> Optional[int]:
+    value = _import_text(row, key, required)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not number.is_integer():
+        raise ValueError(f"{key} is not an id: {value!r}")
+    return int(number)
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "smart_farming.db"):
-        self.db_path = db_path
-        self.init_database()
+    """Marketplace data access over a pluggable storage backend
+    
+    ``backend`` is "sqlite" (``db_path`` is the database file) or "postgres"
+    (``db_path`` is the connection URL, default config.DATABASE_URL). The
+    storage profile and pragmas only apply to SQLite.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, pool_size: int = config.DATABASE_POOL_SIZE,
+                 storage_profile: str = config.DATABASE_STORAGE_PROFILE, pragmas: Optional[Dict[str, Any]] = None,
+                 backend: str = config.DATABASE_BACKEND):
+        if storage_profile not in config.DATABASE_STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile: {storage_profile}")
+        if backend not in SCHEMAS:
+            raise ValueError(f"Unknown database backend: {backend}")
+        
+        self.storage_profile = storage_profile
+        if backend == 'postgres':
+            self.db_path = db_path or config.DATABASE_URL
+            self.backend = PostgresBackend(self.db_path)
+        else:
+            self.db_path = db_path or config.DATABASE_PATH
+            # Explicit pragmas override the ones from the storage profile
+            connection_pragmas = dict(config.DATABASE_STORAGE_PROFILES[storage_profile])
+            connection_pragmas.update(pragmas or {})
+            self.backend = SQLiteBackend(self.db_path, connection_pragmas)
+        self.dbapi = self.backend.dbapi
+        self.tables, self.migrations = SCHEMAS[backend]
+        self.pool = ConnectionPool(self.backend, max_size=pool_size)
+        self.session_cache = SessionCache(config.SESSION_CACHE_SIZE, config.SESSION_CACHE_TTL_SECONDS)
+        self.read_cache = ReadCache(config.READ_CACHE_SIZE, config.READ_CACHE_TTL_SECONDS)
+        self.event_log = EventLog(self.backend)
+        self._sweep_lock = threading.Lock()
+        self._next_session_sweep = 0.0
+        self.ensure_schema()
+    
+    def connection(self):
+        """Check out a pooled connection (use as a context manager)"""
+        return self.pool.connection()
+    
+    def close(self):
+        """Flush the event log and close the pooled connections"""
+        self.event_log.close()
+        self.pool.close()
+    
+    def schema_version(self) -> int:
+        """Latest migration applied to the database (0 if it was never bootstrapped)"""
+        with self.connection() as conn:
+            try:
+                return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+            except (self.dbapi.OperationalError, self.dbapi.ProgrammingError):
+                return 0
+    
+    def ensure_schema(self):
+        """Bootstrap the database unless it is already at SCHEMA_VERSION
+        
+        After the first boot this is a single indexed read, so starting a
+        worker or constructing another manager no longer re-runs the table
+        creation and seeding in init_database.
+        """
+        if self.schema_version() < SCHEMA_VERSION:
+            self.init_database()
     
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL CHECK (role IN ('admin', 'farmer', 'buyer', 'agent')),
-                phone TEXT,
-                address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        # Crop listings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS crop_listings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                farmer_id INTEGER NOT NULL,
-                crop_name TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                expected_price REAL NOT NULL,
-                description TEXT,
-                location TEXT,
-                status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'cancelled')),
-                farmer_name TEXT,
-                farmer_phone TEXT,
-                agent_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (farmer_id) REFERENCES users (id),
-                FOREIGN KEY (agent_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Buyer offers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS buyer_offers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                buyer_id INTEGER NOT NULL,
-                crop_listing_id INTEGER,
-                crop_name TEXT NOT NULL,
-                offer_price REAL NOT NULL,
-                quantity_wanted REAL NOT NULL,
-                notes TEXT,
-                status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'accepted', 'rejected', 'cancelled')),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (buyer_id) REFERENCES users (id),
-                FOREIGN KEY (crop_listing_id) REFERENCES crop_listings (id)
-            )
-        ''')
-        
-        # Transactions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                buyer_id INTEGER NOT NULL,
-                farmer_id INTEGER NOT NULL,
-                crop_listing_id INTEGER NOT NULL,
-                crop_name TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                price_per_unit REAL NOT NULL,
-                total_amount REAL NOT NULL,
-                transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'completed' CHECK (status IN ('completed', 'pending', 'cancelled')),
-                notes TEXT,
-                FOREIGN KEY (buyer_id) REFERENCES users (id),
-                FOREIGN KEY (farmer_id) REFERENCES users (id),
-                FOREIGN KEY (crop_listing_id) REFERENCES crop_listings (id)
-            )
-        ''')
-        
-        # User sessions table for session management
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_token TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                is_active BOOLEAN DEFAULT 1,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Create the tables, apply pending migrations and seed the default accounts (idempotent)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            for statement in self.tables:
+                cursor.execute(statement)
+            
+            conn.commit()
+            
+            self.apply_migrations(conn)
         
         # Create default admin user if doesn't exist
         self.create_default_admin()
         self.create_default_agent()
         self.create_sample_data()
     
+    def apply_migrations(self, conn):
+        """Apply pending schema migrations, recording each version once"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current_version = cursor.fetchone()[0]
+        
+        for version, description, statements in self.migrations:
+            if version <= current_version:
+                continue
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                               (version, description))
+                conn.commit()
+            except self.dbapi.IntegrityError:
+                # Another process applied this version first
+                conn.rollback()
+    
     def create_default_admin(self):
         """Create a default admin user"""
         admin_email = "admin@smartfarm.com"
@@ -144,447 +1215,695 @@ class DatabaseManager:
     
     def create_sample_data(self):
         """Create sample data for demonstration (only if no data exists)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Check if sample data already exists
-        cursor.execute('SELECT COUNT(*) FROM crop_listings')
-        if cursor.fetchone()[0] > 0:
-            conn.close()
-            return  # Data already exists
-        
-        try:
-            # Create sample farmers
-            farmer_users = [
-                ("Ramesh Kumar", "farmer1@test.com", "farmer123", "farmer", "+919876543210", "Village Ramgarh, Rajasthan"),
-                ("Sunita Devi", "farmer2@test.com", "farmer123", "farmer", "+919876543211", "Village Khetri, Haryana"),
-                ("Mohan Singh", "farmer3@test.com", "farmer123", "farmer", "+919876543212", "Village Bhiwani, Punjab")
-            ]
-            
-            farmer_ids = []
-            for farmer in farmer_users:
-                farmer_id = self.create_user(*farmer)
-                if farmer_id:
-                    farmer_ids.append(farmer_id)
-            
-            # Create sample buyers
-            buyer_users = [
-                ("Anil Traders", "buyer1@test.com", "buyer123", "buyer", "+919876543220", "Mumbai, Maharashtra"),
-                ("Grain Merchants", "buyer2@test.com", "buyer123", "buyer", "+919876543221", "Delhi, India")
-            ]
-            
-            for buyer in buyer_users:
-                self.create_user(*buyer)
-            
-            # Create sample crop listings
-            if farmer_ids:
-                sample_listings = [
-                    (farmer_ids[0], "wheat", 1000, 20.0, "Premium quality wheat, organic", "Ramgarh, Rajasthan"),
-                    (farmer_ids[0], "rice", 800, 25.0, "Basmati rice, excellent quality", "Ramgarh, Rajasthan"),
-                    (farmer_ids[1] if len(farmer_ids) > 1 else farmer_ids[0], "cotton", 500, 55.0, "High quality cotton", "Khetri, Haryana"),
-                    (farmer_ids[2] if len(farmer_ids) > 2 else farmer_ids[0], "sugarcane", 2000, 28.0, "Fresh sugarcane", "Bhiwani, Punjab"),
-                    (farmer_ids[0], "tomato", 300, 40.0, "Fresh tomatoes", "Ramgarh, Rajasthan")
-                ]
-                
-                for listing in sample_listings:
-                    self.create_crop_listing(*listing)
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            print("Sample data created successfully!")
+            # Check if sample data already exists
+            cursor.execute('SELECT COUNT(*) FROM crop_listings')
+            if cursor.fetchone()[0] > 0:
+                return  # Data already exists
             
-        except Exception as e:
-            print(f"Error creating sample data: {e}")
-        finally:
-            conn.close()
+            try:
+                # Create sample farmers
+                farmer_users = [
+                    ("Ramesh Kumar", "farmer1@test.com", "farmer123", "farmer", "+919876543210", "Village Ramgarh, Rajasthan"),
+                    ("Sunita Devi", "farmer2@test.com", "farmer123", "farmer", "+919876543211", "Village Khetri, Haryana"),
+                    ("Mohan Singh", "farmer3@test.com", "farmer123", "farmer", "+919876543212", "Village Bhiwani, Punjab")
+                ]
+                
+                # Create sample buyers
+                buyer_users = [
+                    ("Anil Traders", "buyer1@test.com", "buyer123", "buyer", "+919876543220", "Mumbai, Maharashtra"),
+                    ("Grain Merchants", "buyer2@test.com", "buyer123", "buyer", "+919876543221", "Delhi, India")
+                ]
+                
+                self.bulk_create_users(farmer_users + buyer_users)
+                farmer_ids = [user['id'] for user in (self.get_user_by_email(farmer[1]) for farmer in farmer_users) if user]
+                
+                # Create sample crop listings
+                if farmer_ids:
+                    sample_listings = [
+                        (farmer_ids[0], "wheat", 1000, 20.0, "Premium quality wheat, organic", "Ramgarh, Rajasthan"),
+                        (farmer_ids[0], "rice", 800, 25.0, "Basmati rice, excellent quality", "Ramgarh, Rajasthan"),
+                        (farmer_ids[1] if len(farmer_ids) > 1 else farmer_ids[0], "cotton", 500, 55.0, "High quality cotton", "Khetri, Haryana"),
+                        (farmer_ids[2] if len(farmer_ids) > 2 else farmer_ids[0], "sugarcane", 2000, 28.0, "Fresh sugarcane", "Bhiwani, Punjab"),
+                        (farmer_ids[0], "tomato", 300, 40.0, "Fresh tomatoes", "Ramgarh, Rajasthan")
+                    ]
+                    
+                    self.bulk_create_listings(sample_listings)
+                
+                print("Sample data created successfully!")
+                
+            except Exception as e:
+                print(f"Error creating sample data: {e}")
     
     def hash_password(self, password: str) -> str:
         """Hash password using SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    @staticmethod
+    def _keyset_page(cursor: sqlite3.Cursor, limit: int, as_frame: bool = False,
+                     key: Tuple[str, str] = ('created_at', 'id')) -> Tuple[Union[List[Record], pd.DataFrame], Optional[tuple]]:
+        """Turn the rows of a `LIMIT limit + 1` keyset query into (page, next cursor)
+        
+        The next cursor holds the ``key`` columns of the last row. With
+        ``as_frame`` the page is a DataFrame built straight from the fetched
+        tuples (for st.dataframe views) instead of a list of Records.
+        """
+        index = column_index(cursor)
+        rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = tuple(rows[-1][index[column]] for column in key)
+        
+        if as_frame:
+            return rows_to_frame(list(index), rows), next_cursor
+        return [Record(index, row) for row in rows], next_cursor
+    
+    @invalidates('users')
     def create_user(self, name: str, email: str, password: str, role: str, phone: str = None, address: str = None) -> Optional[int]:
         """Create a new user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            password_hash = self.hash_password(password)
-            cursor.execute('''
-                INSERT INTO users (name, email, password_hash, role, phone, address)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, email, password_hash, role, phone, address))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
-        except sqlite3.IntegrityError:
-            return None
-        finally:
-            conn.close()
+            try:
+                password_hash = self.hash_password(password)
+                cursor.execute('''
+                    INSERT INTO users (name, email, password_hash, role, phone, address)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (name, email, password_hash, role, phone, address))
+                
+                user_id = cursor.lastrowid
+                conn.commit()
+                return user_id
+            except self.dbapi.IntegrityError:
+                return None
     
-    def authenticate_user(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+    def _bulk_insert(self, sql: str, rows: Iterator[Tuple[int, tuple]], chunk_size: int,
+                     errors: List[Dict[str, Any]]) -> int:
+        """Insert (row number, params) pairs with executemany, one transaction per chunk.
+        
+        If a chunk hits a constraint (e.g. a duplicate email) it is rolled back
+        and replayed row by row so only the offending rows are reported in
+        ``errors``. Returns the number of rows inserted.
+        """
+        inserted = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            def flush(chunk):
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                    cursor.executemany(sql, [params for _, params in chunk])
+                    conn.commit()
+                    return len(chunk)
+                except self.dbapi.IntegrityError:
+                    conn.rollback()
+                
+                # A savepoint per row, since a failed statement aborts the
+                # whole transaction on PostgreSQL
+                count = 0
+                cursor.execute('BEGIN IMMEDIATE')
+                for row_number, params in chunk:
+                    cursor.execute('SAVEPOINT import_row')
+                    try:
+                        cursor.execute(sql, params)
+                        count += 1
+                    except self.dbapi.IntegrityError as e:
+                        cursor.execute('ROLLBACK TO SAVEPOINT import_row')
+                        errors.append({'row': row_number, 'error': str(e)})
+                    cursor.execute('RELEASE SAVEPOINT import_row')
+                conn.commit()
+                return count
+            
+            chunk = []
+            try:
+                for item in rows:
+                    chunk.append(item)
+                    if len(chunk) >= chunk_size:
+                        inserted += flush(chunk)
+                        chunk = []
+                if chunk:
+                    inserted += flush(chunk)
+            except Exception:
+                conn.rollback()
+                raise
+        return inserted
+    
+    def _valid_import_rows(self, source: ImportSource, columns: List[str], to_params,
+                           errors: List[Dict[str, Any]]) -> Iterator[Tuple[int, tuple]]:
+        """Convert imported rows to insert params, recording rows that fail validation"""
+        for row_number, row in iter_import_rows(source, columns):
+            try:
+                yield row_number, to_params(row)
+            except ValueError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+    
+    @invalidates('users')
+    def bulk_create_users(self, source: ImportSource,
+                          chunk_size: int = config.BULK_IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+        """Create many users from a CSV/Excel file or an iterable of rows.
+        
+        Rows need name, email, password and role (farmer, buyer or agent);
+        phone and address are optional. Returns ``{'inserted': n, 'errors':
+        [{'row': ..., 'error': ...}]}``; bad rows are skipped, not fatal.
+        """
+        def to_params(row):
+            role = _import_text(row, 'role', required=True).lower()
+            if role not in ('farmer', 'buyer', 'agent'):
+                raise ValueError(f"invalid role: {role!r}")
+            return (_import_text(row, 'name', required=True),
+                    _import_text(row, 'email', required=True),
+                    self.hash_password(_import_text(row, 'password', required=True)),
+                    role,
+                    _import_text(row, 'phone'),
+                    _import_text(row, 'address'))
+        
+        errors = []
+        inserted = self._bulk_insert('''
+            INSERT INTO users (name, email, password_hash, role, phone, address)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', self._valid_import_rows(source, USER_IMPORT_COLUMNS, to_params, errors), chunk_size, errors)
+        errors.sort(key=lambda error: error['row'])
+        return {'inserted': inserted, 'errors': errors}
+    
+    def authenticate_user(self, email: str, password: str) -> Optional[Record]:
         """Authenticate user credentials"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        password_hash = self.hash_password(password)
-        cursor.execute('''
-            SELECT id, name, email, role, phone, address, is_active
-            FROM users
-            WHERE email = ? AND password_hash = ? AND is_active = 1
-        ''', (email, password_hash))
-        
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user:
-            return {
-                'id': user[0],
-                'name': user[1],
-                'email': user[2],
-                'role': user[3],
-                'phone': user[4],
-                'address': user[5],
-                'is_active': user[6]
-            }
-        return None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            password_hash = self.hash_password(password)
+            cursor.execute('''
+                SELECT id, name, email, role, phone, address, is_active
+                FROM users
+                WHERE email = ? AND password_hash = ? AND is_active = 1
+            ''', (email, password_hash))
+            
+            return fetch_record(cursor)
     
-    def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+    def get_user_by_email(self, email: str) -> Optional[Record]:
         """Get user by email"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, name, email, role, phone, address, is_active
-            FROM users
-            WHERE email = ?
-        ''', (email,))
-        
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user:
-            return {
-                'id': user[0],
-                'name': user[1],
-                'email': user[2],
-                'role': user[3],
-                'phone': user[4],
-                'address': user[5],
-                'is_active': user[6]
-            }
-        return None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, name, email, role, phone, address, is_active
+                FROM users
+                WHERE email = ?
+            ''', (email,))
+            
+            return fetch_record(cursor)
     
-    def get_user_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+    def get_user_by_id(self, user_id: int) -> Optional[Record]:
         """Get user by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, name, email, role, phone, address, is_active
+                FROM users
+                WHERE id = ?
+            ''', (user_id,))
+            
+            return fetch_record(cursor)
+    
+    def create_session(self, user_id: int, ttl: float = config.SESSION_TTL_SECONDS) -> Optional[str]:
+        """Start a login session and return its token (None on error)"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT INTO user_sessions (user_id, session_token, expires_at)
+                    VALUES (?, ?, ?)
+                ''', (user_id, hash_session_token(token), utc_timestamp(now + ttl)))
+                conn.commit()
+            except Exception as e:
+                print(f"Error creating session: {e}")
+                return None
+        
+        self._maybe_sweep_sessions(now)
+        return token
+    
+    def validate_session(self, token: str) -> Optional[Record]:
+        """Return the user a session token belongs to, or None if it is unknown, expired or revoked
         
-        cursor.execute('''
-            SELECT id, name, email, role, phone, address, is_active
-            FROM users
-            WHERE id = ?
-        ''', (user_id,))
-        
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user:
-            return {
-                'id': user[0],
-                'name': user[1],
-                'email': user[2],
-                'role': user[3],
-                'phone': user[4],
-                'address': user[5],
-                'is_active': user[6]
-            }
-        return None
+        Recently validated tokens are answered from the in-process session
+        cache without touching the database.
+        """
+        if not token:
+            return None
+        key = hash_session_token(token)
+        now = time.time()
+        user = self.session_cache.get(key, now)
+        if user is not None:
+            return user
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT u.id, u.name, u.email, u.role, u.phone, u.address, u.is_active,
+                       s.expires_at AS session_expires
+                FROM user_sessions s
+                JOIN users u ON s.user_id = u.id
+                WHERE s.session_token = ? AND s.is_active = 1 AND s.expires_at > ? AND u.is_active = 1
+            ''', (key, utc_timestamp(now)))
+            row = cursor.fetchone()
+            index = column_index(cursor)
+        
+        if row is None:
+            self.session_cache.discard(key)
+            return None
+        expires_at = epoch_seconds(row[index.pop('session_expires')])
+        user = Record(index, row)  # same keys as authenticate_user
+        self.session_cache.put(key, user, expires_at, now)
+        return user
+    
+    def end_session(self, token: str) -> bool:
+        """Log a session out everywhere (other replicas notice within the cache TTL)"""
+        key = hash_session_token(token)
+        self.session_cache.discard(key)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('DELETE FROM user_sessions WHERE session_token = ?', (key,))
+                conn.commit()
+                return cursor.rowcount > 0
+            except Exception as e:
+                print(f"Error ending session: {e}")
+                return False
+    
+    def sweep_expired_sessions(self, batch_size: int = config.SESSION_SWEEP_BATCH_SIZE) -> int:
+        """Delete expired sessions in small batches so writers are never blocked for long"""
+        now = time.time()
+        self.session_cache.purge_expired(now)
+        deleted = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            while True:
+                cursor.execute('''
+                    DELETE FROM user_sessions WHERE id IN (
+                        SELECT id FROM user_sessions WHERE expires_at <= ? LIMIT ?
+                    )
+                ''', (utc_timestamp(now), batch_size))
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    return deleted
     
+    def _maybe_sweep_sessions(self, now: float):
+        """Run sweep_expired_sessions at most once per SESSION_SWEEP_INTERVAL_SECONDS"""
+        with self._sweep_lock:
+            if now < self._next_session_sweep:
+                return
+            self._next_session_sweep = now + config.SESSION_SWEEP_INTERVAL_SECONDS
+        try:
+            self.sweep_expired_sessions()
+        except self.dbapi.Error as e:
+            print(f"Error sweeping expired sessions: {e}")
+
+    @invalidates('crop_listings')
     def create_crop_listing(self, farmer_id: int, crop_name: str, quantity: float, 
                           expected_price: float, description: str = None, location: str = None,
                           farmer_name: str = None, farmer_phone: str = None, agent_id: int = None) -> Optional[int]:
         """Create a new crop listing"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, description, location, farmer_name, farmer_phone, agent_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (farmer_id, crop_name, quantity, expected_price, description, location, farmer_name, farmer_phone, agent_id))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            listing_id = cursor.lastrowid
-            conn.commit()
-            return listing_id
-        except Exception as e:
-            print(f"Error creating crop listing: {e}")
-            return None
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, description, location, farmer_name, farmer_phone, agent_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (farmer_id, crop_name, quantity, expected_price, description, location, farmer_name, farmer_phone, agent_id))
+                
+                listing_id = cursor.lastrowid
+                conn.commit()
+                return listing_id
+            except Exception as e:
+                print(f"Error creating crop listing: {e}")
+                return None
+    
+    @invalidates('crop_listings')
+    def bulk_create_listings(self, source: ImportSource, agent_id: int = None,
+                             chunk_size: int = config.BULK_IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+        """Create many crop listings from a CSV/Excel file or an iterable of rows.
+        
+        Rows need farmer_id, crop_name, quantity and expected_price; the other
+        LISTING_IMPORT_COLUMNS are optional. ``agent_id`` is used for rows that
+        do not name an agent. Returns the same report as bulk_create_users.
+        """
+        def to_params(row):
+            return (_import_id(row, 'farmer_id', required=True),
+                    _import_text(row, 'crop_name', required=True),
+                    _import_number(row, 'quantity'),
+                    _import_number(row, 'expected_price'),
+                    _import_text(row, 'description'),
+                    _import_text(row, 'location'),
+                    _import_text(row, 'farmer_name'),
+                    _import_text(row, 'farmer_phone'),
+                    _import_id(row, 'agent_id') or agent_id)
+        
+        errors = []
+        inserted = self._bulk_insert('''
+            INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, description, location, farmer_name, farmer_phone, agent_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', self._valid_import_rows(source, LISTING_IMPORT_COLUMNS, to_params, errors), chunk_size, errors)
+        errors.sort(key=lambda error: error['row'])
+        return {'inserted': inserted, 'errors': errors}
     
-    def get_crop_listings(self, status: str = 'available') -> List[Dict[str, Any]]:
+    @cached_read(*LISTING_READ_TABLES)
+    def get_crop_listings(self, status: str = 'available') -> List[Record]:
         """Get all crop listings"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT cl.id, cl.farmer_id, 
-                   COALESCE(cl.farmer_name, u.name) as farmer_name, 
-                   COALESCE(cl.farmer_phone, u.phone) as farmer_phone, 
-                   cl.crop_name, cl.quantity, cl.expected_price, cl.description, 
-                   cl.location, cl.status, cl.created_at, cl.updated_at, cl.agent_id
-            FROM crop_listings cl
-            LEFT JOIN users u ON cl.farmer_id = u.id
-            WHERE cl.status = ?
-            ORDER BY cl.created_at DESC
-        ''', (status,))
-        
-        listings = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': listing[0],
-                'farmer_id': listing[1],
-                'farmer_name': listing[2],
-                'farmer_phone': listing[3],
-                'crop_name': listing[4],
-                'quantity': listing[5],
-                'expected_price': listing[6],
-                'description': listing[7],
-                'location': listing[8],
-                'status': listing[9],
-                'created_at': listing[10],
-                'updated_at': listing[11],
-                'agent_id': listing[12]
-            }
-            for listing in listings
-        ]
-    
-    def get_farmer_listings(self, farmer_id: int) -> List[Dict[str, Any]]:
-        """Get crop listings for a specific farmer"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, crop_name, quantity, expected_price, description, location, status, created_at
-            FROM crop_listings
-            WHERE farmer_id = ?
-            ORDER BY created_at DESC
-        ''', (farmer_id,))
-        
-        listings = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': listing[0],
-                'crop_name': listing[1],
-                'quantity': listing[2],
-                'expected_price': listing[3],
-                'description': listing[4],
-                'location': listing[5],
-                'status': listing[6],
-                'created_at': listing[7]
-            }
-            for listing in listings
-        ]
-    
-    def get_agent_listings(self, agent_id: int) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT cl.id, cl.farmer_id, 
+                       COALESCE(cl.farmer_name, u.name) as farmer_name, 
+                       COALESCE(cl.farmer_phone, u.phone) as farmer_phone, 
+                       cl.crop_name, cl.quantity, cl.expected_price, cl.description, 
+                       cl.location, cl.status, cl.created_at, cl.updated_at, cl.agent_id
+                FROM crop_listings cl
+                LEFT JOIN users u ON cl.farmer_id = u.id
+                WHERE cl.status = ?
+                ORDER BY cl.created_at DESC
+            ''', (status,))
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*LISTING_READ_TABLES)
+    def get_crop_listings_page(self, status: str = 'available', limit: int = 20,
+                               after: Optional[PageCursor] = None,
+                               as_frame: bool = False) -> Tuple[Union[List[Record], pd.DataFrame], Optional[PageCursor]]:
+        """Get one page of crop listings, newest first.
+        
+        Pass the returned cursor back as `after` to get the next page; it is
+        None on the last page. ``as_frame`` returns the page as a DataFrame.
+        """
+        conditions, params = ['cl.status = ?'], [status]
+        if after:
+            conditions.append('(cl.created_at, cl.id) < (?, ?)')
+            params.extend(after)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT cl.id, cl.farmer_id, 
+                       COALESCE(cl.farmer_name, u.name) as farmer_name, 
+                       COALESCE(cl.farmer_phone, u.phone) as farmer_phone, 
+                       cl.crop_name, cl.quantity, cl.expected_price, cl.description, 
+                       cl.location, cl.status, cl.created_at, cl.updated_at, cl.agent_id
+                FROM crop_listings cl
+                LEFT JOIN users u ON cl.farmer_id = u.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY cl.created_at DESC, cl.id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(cursor, limit, as_frame)
+    
+    def search_listings(self, query: str, filters: Optional[Dict[str, Any]] = None, limit: int = 20,
+                        cursor: Optional[SearchCursor] = None,
+                        as_frame: bool = False) -> Tuple[Union[List[Record], pd.DataFrame], Optional[SearchCursor]]:
+        """Ranked full-text search over crop name, description, location and farmer name.
+        
+        Every word of ``query`` must match (the last one as a prefix, so "tom"
+        finds tomato) and the best matches come first. ``filters`` narrows the results by
+        SEARCH_FILTERS; status defaults to 'available' and None means any
+        status. Pass the returned cursor back as ``cursor`` for the next page.
+        """
+        filters = {'status': 'available', **(filters or {})}
+        unknown = set(filters) - set(SEARCH_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown search filters: {', '.join(sorted(unknown))}")
+        
+        to_query, matches = SEARCH_MATCHES[self.backend.name]
+        match = to_query(query)
+        if match is None:
+            return (pd.DataFrame() if as_frame else []), None
+        
+        conditions, params = [], [match]
+        for name, value in filters.items():
+            if value is not None:
+                conditions.append(SEARCH_FILTERS[name])
+                params.append(value)
+        if cursor:
+            conditions.append('(m.score, cl.id) > (?, ?)')
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with self.connection() as conn:
+            sql_cursor = conn.cursor()
+            sql_cursor.execute(f'''
+                SELECT cl.id, cl.farmer_id,
+                       COALESCE(cl.farmer_name, u.name) as farmer_name,
+                       COALESCE(cl.farmer_phone, u.phone) as farmer_phone,
+                       cl.crop_name, cl.quantity, cl.expected_price, cl.description,
+                       cl.location, cl.status, cl.created_at, cl.updated_at, cl.agent_id, m.score
+                FROM ({matches}) m
+                JOIN crop_listings cl ON cl.id = m.rowid
+                LEFT JOIN users u ON cl.farmer_id = u.id
+                {where}
+                ORDER BY m.score, cl.id
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(sql_cursor, limit, as_frame, key=('score', 'id'))
+    
+    @cached_read(*LISTING_READ_TABLES)
+    def get_farmer_listings(self, farmer_id: int, include_archived: bool = False) -> List[Record]:
+        """Get crop listings for a specific farmer (archived ones too if include_archived)"""
+        listings = 'crop_listings_all' if include_archived else 'crop_listings'
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT id, crop_name, quantity, expected_price, description, location, status, created_at
+                FROM {listings}
+                WHERE farmer_id = ?
+                ORDER BY created_at DESC
+            ''', (farmer_id,))
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*LISTING_READ_TABLES)
+    def get_agent_listings(self, agent_id: int) -> List[Record]:
         """Get crop listings created by a specific agent"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, crop_name, quantity, expected_price, description, location, status, 
-                   created_at, farmer_name, farmer_phone
-            FROM crop_listings
-            WHERE agent_id = ?
-            ORDER BY created_at DESC
-        ''', (agent_id,))
-        
-        listings = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': listing[0],
-                'crop_name': listing[1],
-                'quantity': listing[2],
-                'expected_price': listing[3],
-                'description': listing[4],
-                'location': listing[5],
-                'status': listing[6],
-                'created_at': listing[7],
-                'farmer_name': listing[8],
-                'farmer_phone': listing[9]
-            }
-            for listing in listings
-        ]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, crop_name, quantity, expected_price, description, location, status, 
+                       created_at, farmer_name, farmer_phone
+                FROM crop_listings
+                WHERE agent_id = ?
+                ORDER BY created_at DESC
+            ''', (agent_id,))
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*LISTING_READ_TABLES)
+    def get_agent_listings_page(self, agent_id: int, limit: int = 20,
+                                after: Optional[PageCursor] = None) -> Tuple[List[Record], Optional[PageCursor]]:
+        """Get one page of an agent's crop listings, newest first"""
+        conditions, params = ['agent_id = ?'], [agent_id]
+        if after:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, crop_name, quantity, expected_price, description, location, status, 
+                       created_at, farmer_name, farmer_phone
+                FROM crop_listings
+                WHERE {' AND '.join(conditions)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(cursor, limit)
     
+    @invalidates('buyer_offers')
     def create_buyer_offer(self, buyer_id: int, crop_listing_id: int, crop_name: str,
                           offer_price: float, quantity_wanted: float, notes: str = None) -> Optional[int]:
         """Create a new buyer offer"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            offer_id = cursor.lastrowid
-            conn.commit()
-            return offer_id
-        except Exception as e:
-            print(f"Error creating buyer offer: {e}")
-            return None
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes))
+                
+                offer_id = cursor.lastrowid
+                conn.commit()
+                return offer_id
+            except Exception as e:
+                print(f"Error creating buyer offer: {e}")
+                return None
     
-    def get_buyer_offers(self, buyer_id: int = None) -> List[Dict[str, Any]]:
+    @cached_read(*OFFER_READ_TABLES)
+    def get_buyer_offers(self, buyer_id: int = None) -> List[Record]:
         """Get buyer offers"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if buyer_id:
+                cursor.execute('''
+                    SELECT bo.id, bo.buyer_id, u.name as buyer_name, bo.crop_listing_id, 
+                           bo.crop_name, bo.offer_price, bo.quantity_wanted, bo.notes, 
+                           bo.status, bo.created_at
+                    FROM buyer_offers bo
+                    JOIN users u ON bo.buyer_id = u.id
+                    WHERE bo.buyer_id = ?
+                    ORDER BY bo.created_at DESC
+                ''', (buyer_id,))
+            else:
+                cursor.execute('''
+                    SELECT bo.id, bo.buyer_id, u.name as buyer_name, bo.crop_listing_id, 
+                           bo.crop_name, bo.offer_price, bo.quantity_wanted, bo.notes, 
+                           bo.status, bo.created_at
+                    FROM buyer_offers bo
+                    JOIN users u ON bo.buyer_id = u.id
+                    ORDER BY bo.created_at DESC
+                ''')
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*OFFER_READ_TABLES)
+    def get_buyer_offers_page(self, buyer_id: int = None, limit: int = 20,
+                              after: Optional[PageCursor] = None) -> Tuple[List[Record], Optional[PageCursor]]:
+        """Get one page of buyer offers, newest first"""
+        conditions, params = [], []
         if buyer_id:
-            cursor.execute('''
+            conditions.append('bo.buyer_id = ?')
+            params.append(buyer_id)
+        if after:
+            conditions.append('(bo.created_at, bo.id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
                 SELECT bo.id, bo.buyer_id, u.name as buyer_name, bo.crop_listing_id, 
                        bo.crop_name, bo.offer_price, bo.quantity_wanted, bo.notes, 
                        bo.status, bo.created_at
                 FROM buyer_offers bo
                 JOIN users u ON bo.buyer_id = u.id
-                WHERE bo.buyer_id = ?
-                ORDER BY bo.created_at DESC
-            ''', (buyer_id,))
-        else:
+                {where}
+                ORDER BY bo.created_at DESC, bo.id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(cursor, limit)
+    
+    @cached_read(*OFFER_READ_TABLES)
+    def get_offers_for_farmer(self, farmer_id: int) -> List[Record]:
+        """Get all offers for a farmer's listings"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                SELECT bo.id, bo.buyer_id, u.name as buyer_name, bo.crop_listing_id, 
-                       bo.crop_name, bo.offer_price, bo.quantity_wanted, bo.notes, 
-                       bo.status, bo.created_at
+                SELECT bo.id, bo.buyer_id, u.name as buyer_name, u.phone as buyer_phone,
+                       bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
+                       bo.notes, bo.status, bo.created_at, cl.expected_price
                 FROM buyer_offers bo
                 JOIN users u ON bo.buyer_id = u.id
+                JOIN crop_listings cl ON bo.crop_listing_id = cl.id
+                WHERE cl.farmer_id = ?
                 ORDER BY bo.created_at DESC
-            ''')
-        
-        offers = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': offer[0],
-                'buyer_id': offer[1],
-                'buyer_name': offer[2],
-                'crop_listing_id': offer[3],
-                'crop_name': offer[4],
-                'offer_price': offer[5],
-                'quantity_wanted': offer[6],
-                'notes': offer[7],
-                'status': offer[8],
-                'created_at': offer[9]
-            }
-            for offer in offers
-        ]
-    
-    def get_offers_for_farmer(self, farmer_id: int) -> List[Dict[str, Any]]:
-        """Get all offers for a farmer's listings"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT bo.id, bo.buyer_id, u.name as buyer_name, u.phone as buyer_phone,
-                   bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
-                   bo.notes, bo.status, bo.created_at, cl.expected_price
-            FROM buyer_offers bo
-            JOIN users u ON bo.buyer_id = u.id
-            JOIN crop_listings cl ON bo.crop_listing_id = cl.id
-            WHERE cl.farmer_id = ?
-            ORDER BY bo.created_at DESC
-        ''', (farmer_id,))
-        
-        offers = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': offer[0],
-                'buyer_id': offer[1],
-                'buyer_name': offer[2],
-                'buyer_phone': offer[3],
-                'crop_listing_id': offer[4],
-                'crop_name': offer[5],
-                'offer_price': offer[6],
-                'quantity_wanted': offer[7],
-                'notes': offer[8],
-                'status': offer[9],
-                'created_at': offer[10],
-                'expected_price': offer[11]
-            }
-            for offer in offers
-        ]
-    
-    def get_offers_for_agent(self, agent_id: int) -> List[Dict[str, Any]]:
+            ''', (farmer_id,))
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*OFFER_READ_TABLES)
+    def get_offers_for_agent(self, agent_id: int) -> List[Record]:
         """Get all offers for agent's farmer listings"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT bo.id, bo.buyer_id, u.name as buyer_name, u.phone as buyer_phone,
-                   bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
-                   bo.notes, bo.status, bo.created_at, cl.expected_price, cl.farmer_name, cl.farmer_phone
-            FROM buyer_offers bo
-            JOIN users u ON bo.buyer_id = u.id
-            JOIN crop_listings cl ON bo.crop_listing_id = cl.id
-            WHERE cl.agent_id = ?
-            ORDER BY bo.created_at DESC
-        ''', (agent_id,))
-        
-        offers = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': offer[0],
-                'buyer_id': offer[1],
-                'buyer_name': offer[2],
-                'buyer_phone': offer[3],
-                'crop_listing_id': offer[4],
-                'crop_name': offer[5],
-                'offer_price': offer[6],
-                'quantity_wanted': offer[7],
-                'notes': offer[8],
-                'status': offer[9],
-                'created_at': offer[10],
-                'expected_price': offer[11],
-                'farmer_name': offer[12],
-                'farmer_phone': offer[13]
-            }
-            for offer in offers
-        ]
-    
-    def get_offers_by_status(self, status: str = None) -> List[Dict[str, Any]]:
-        """Get offers by status (for admin dashboard)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if status:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                SELECT bo.id, bo.buyer_id, ub.name as buyer_name, ub.phone as buyer_phone,
+                SELECT bo.id, bo.buyer_id, u.name as buyer_name, u.phone as buyer_phone,
                        bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
-                       bo.notes, bo.status, bo.created_at, cl.expected_price,
-                       COALESCE(cl.farmer_name, uf.name) as farmer_name,
-                       COALESCE(cl.farmer_phone, uf.phone) as farmer_phone,
-                       ua.name as agent_name
+                       bo.notes, bo.status, bo.created_at, cl.expected_price, cl.farmer_name, cl.farmer_phone
                 FROM buyer_offers bo
-                JOIN users ub ON bo.buyer_id = ub.id
+                JOIN users u ON bo.buyer_id = u.id
                 JOIN crop_listings cl ON bo.crop_listing_id = cl.id
-                LEFT JOIN users uf ON cl.farmer_id = uf.id
-                LEFT JOIN users ua ON cl.agent_id = ua.id
-                WHERE bo.status = ?
+                WHERE cl.agent_id = ?
                 ORDER BY bo.created_at DESC
-            ''', (status,))
+            ''', (agent_id,))
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*OFFER_READ_TABLES)
+    def get_offers_by_status(self, status: str = None, include_archived: bool = False) -> List[Record]:
+        """Get offers by status (for admin dashboard); archived offers too if include_archived"""
+        if include_archived:
+            offers, listings = 'buyer_offers_all', 'crop_listings_all'
         else:
-            cursor.execute('''
+            offers, listings = 'buyer_offers', 'crop_listings'
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if status:
+                cursor.execute(f'''
+                    SELECT bo.id, bo.buyer_id, ub.name as buyer_name, ub.phone as buyer_phone,
+                           bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
+                           bo.notes, bo.status, bo.created_at, cl.expected_price,
+                           COALESCE(cl.farmer_name, uf.name) as farmer_name,
+                           COALESCE(cl.farmer_phone, uf.phone) as farmer_phone,
+                           ua.name as agent_name
+                    FROM {offers} bo
+                    JOIN users ub ON bo.buyer_id = ub.id
+                    JOIN {listings} cl ON bo.crop_listing_id = cl.id
+                    LEFT JOIN users uf ON cl.farmer_id = uf.id
+                    LEFT JOIN users ua ON cl.agent_id = ua.id
+                    WHERE bo.status = ?
+                    ORDER BY bo.created_at DESC
+                ''', (status,))
+            else:
+                cursor.execute(f'''
+                    SELECT bo.id, bo.buyer_id, ub.name as buyer_name, ub.phone as buyer_phone,
+                           bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
+                           bo.notes, bo.status, bo.created_at, cl.expected_price,
+                           COALESCE(cl.farmer_name, uf.name) as farmer_name,
+                           COALESCE(cl.farmer_phone, uf.phone) as farmer_phone,
+                           ua.name as agent_name
+                    FROM {offers} bo
+                    JOIN users ub ON bo.buyer_id = ub.id
+                    JOIN {listings} cl ON bo.crop_listing_id = cl.id
+                    LEFT JOIN users uf ON cl.farmer_id = uf.id
+                    LEFT JOIN users ua ON cl.agent_id = ua.id
+                    ORDER BY bo.created_at DESC
+                ''')
+            
+            return fetch_records(cursor)
+    
+    @cached_read(*OFFER_READ_TABLES)
+    def get_offers_by_status_page(self, status: str = None, limit: int = 20,
+                                  after: Optional[PageCursor] = None) -> Tuple[List[Record], Optional[PageCursor]]:
+        """Get one page of offers by status (for admin dashboard), newest first"""
+        conditions, params = [], []
+        if status:
+            conditions.append('bo.status = ?')
+            params.append(status)
+        if after:
+            conditions.append('(bo.created_at, bo.id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
                 SELECT bo.id, bo.buyer_id, ub.name as buyer_name, ub.phone as buyer_phone,
                        bo.crop_listing_id, bo.crop_name, bo.offer_price, bo.quantity_wanted, 
                        bo.notes, bo.status, bo.created_at, cl.expected_price,
@@ -596,34 +1915,14 @@ class DatabaseManager:
                 JOIN crop_listings cl ON bo.crop_listing_id = cl.id
                 LEFT JOIN users uf ON cl.farmer_id = uf.id
                 LEFT JOIN users ua ON cl.agent_id = ua.id
-                ORDER BY bo.created_at DESC
-            ''')
-        
-        offers = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': offer[0],
-                'buyer_id': offer[1],
-                'buyer_name': offer[2],
-                'buyer_phone': offer[3],
-                'crop_listing_id': offer[4],
-                'crop_name': offer[5],
-                'offer_price': offer[6],
-                'quantity_wanted': offer[7],
-                'notes': offer[8],
-                'status': offer[9],
-                'created_at': offer[10],
-                'expected_price': offer[11],
-                'farmer_name': offer[12],
-                'farmer_phone': offer[13],
-                'agent_name': offer[14]
-            }
-            for offer in offers
-        ]
-    
-    def update_market_price(self, crop_name: str, price: float, trend: str) -> bool:
+                {where}
+                ORDER BY bo.created_at DESC, bo.id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(cursor, limit)
+    
+    def update_market_price(self, crop_name: str, price: float, trend: str, actor_id: int = None) -> bool:
         """Update market price for a crop (this would typically update the CSV file)"""
         try:
             import pandas as pd
@@ -661,268 +1960,407 @@ class DatabaseManager:
                     
                     # Replace the original file
                     shutil.move(tmp_path, csv_path)
-                    return True
                 except:
                     # Fallback: try direct write
                     df.to_csv(csv_path, index=False)
-                    return True
+                self.event_log.record('update_market_price', actor_id, 'market_prices', None,
+                                      {'crop_name': crop_name, 'price': price, 'trend': trend})
+                return True
             return False
         except Exception as e:
             print(f"Error updating market price: {e}")
             return False
     
+    @invalidates('transactions')
     def create_transaction(self, buyer_id: int, farmer_id: int, crop_listing_id: int,
                           crop_name: str, quantity: float, price_per_unit: float, 
                           total_amount: float, notes: str = None) -> Optional[int]:
         """Create a new transaction"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, 
-                                        quantity, price_per_unit, total_amount, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (buyer_id, farmer_id, crop_listing_id, crop_name, quantity, price_per_unit, total_amount, notes))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            transaction_id = cursor.lastrowid
-            conn.commit()
-            return transaction_id
-        except Exception as e:
-            print(f"Error creating transaction: {e}")
-            return None
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, 
+                                            quantity, price_per_unit, total_amount, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (buyer_id, farmer_id, crop_listing_id, crop_name, quantity, price_per_unit, total_amount, notes))
+                
+                transaction_id = cursor.lastrowid
+                conn.commit()
+                return transaction_id
+            except Exception as e:
+                print(f"Error creating transaction: {e}")
+                return None
     
-    def get_all_users(self) -> List[Dict[str, Any]]:
+    def get_all_users(self) -> List[Record]:
         """Get all users (for admin)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, name, email, role, phone, address, is_active, created_at
-            FROM users
-            ORDER BY created_at DESC
-        ''')
-        
-        users = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': user[0],
-                'name': user[1],
-                'email': user[2],
-                'role': user[3],
-                'phone': user[4],
-                'address': user[5],
-                'is_active': user[6],
-                'created_at': user[7]
-            }
-            for user in users
-        ]
-    
-    def get_all_transactions(self) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, name, email, role, phone, address, is_active, created_at
+                FROM users
+                ORDER BY created_at DESC
+            ''')
+            
+            return fetch_records(cursor)
+    
+    def get_all_users_page(self, limit: int = 20, after: Optional[PageCursor] = None,
+                           as_frame: bool = False) -> Tuple[Union[List[Record], pd.DataFrame], Optional[PageCursor]]:
+        """Get one page of users (for admin), newest first"""
+        conditions, params = [], []
+        if after:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, name, email, role, phone, address, is_active, created_at
+                FROM users
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            
+            return self._keyset_page(cursor, limit, as_frame)
+    
+    def get_all_transactions(self) -> List[Record]:
         """Get all transactions (for admin)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT t.id, t.buyer_id, ub.name as buyer_name, t.farmer_id, uf.name as farmer_name,
-                   t.crop_name, t.quantity, t.price_per_unit, t.total_amount, t.transaction_date, t.status
-            FROM transactions t
-            JOIN users ub ON t.buyer_id = ub.id
-            JOIN users uf ON t.farmer_id = uf.id
-            ORDER BY t.transaction_date DESC
-        ''')
-        
-        transactions = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'id': transaction[0],
-                'buyer_id': transaction[1],
-                'buyer_name': transaction[2],
-                'farmer_id': transaction[3],
-                'farmer_name': transaction[4],
-                'crop_name': transaction[5],
-                'quantity': transaction[6],
-                'price_per_unit': transaction[7],
-                'total_amount': transaction[8],
-                'transaction_date': transaction[9],
-                'status': transaction[10]
-            }
-            for transaction in transactions
-        ]
-    
-    def update_user_status(self, user_id: int, is_active: bool) -> bool:
-        """Update user active status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                UPDATE users SET is_active = ? WHERE id = ?
-            ''', (is_active, user_id))
+                SELECT t.id, t.buyer_id, ub.name as buyer_name, t.farmer_id, uf.name as farmer_name,
+                       t.crop_name, t.quantity, t.price_per_unit, t.total_amount, t.transaction_date, t.status
+                FROM transactions t
+                JOIN users ub ON t.buyer_id = ub.id
+                JOIN users uf ON t.farmer_id = uf.id
+                ORDER BY t.transaction_date DESC
+            ''')
             
-            conn.commit()
-            return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating user status: {e}")
-            return False
-        finally:
-            conn.close()
+            return fetch_records(cursor)
+    
+    @invalidates('users')
+    def update_user_status(self, user_id: int, is_active: bool, actor_id: int = None) -> bool:
+        """Update user active status"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    UPDATE users SET is_active = ? WHERE id = ?
+                ''', (is_active, user_id))
+                updated = cursor.rowcount > 0
+                
+                # A deactivated user is logged out everywhere
+                if not is_active:
+                    cursor.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
+                    self.session_cache.discard_user(user_id)
+                
+                conn.commit()
+                if updated:
+                    self.event_log.record('update_user_status', actor_id, 'users', user_id,
+                                          {'is_active': bool(is_active)})
+                return updated
+            except Exception as e:
+                print(f"Error updating user status: {e}")
+                return False
     
+    @invalidates('crop_listings')
     def update_crop_listing_status(self, listing_id: int, status: str) -> bool:
         """Update crop listing status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                UPDATE crop_listings SET status = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (status, listing_id))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating crop listing status: {e}")
-            return False
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    UPDATE crop_listings SET status = ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ?
+                ''', (status, listing_id))
+                
+                conn.commit()
+                return cursor.rowcount > 0
+            except Exception as e:
+                print(f"Error updating crop listing status: {e}")
+                return False
     
-    def update_offer_status(self, offer_id: int, status: str) -> bool:
+    @invalidates('buyer_offers')
+    def update_offer_status(self, offer_id: int, status: str, actor_id: int = None) -> bool:
         """Update offer status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                UPDATE buyer_offers SET status = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (status, offer_id))
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating offer status: {e}")
-            return False
-        finally:
-            conn.close()
+            try:
+                cursor.execute('''
+                    UPDATE buyer_offers SET status = ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ?
+                ''', (status, offer_id))
+                updated = cursor.rowcount > 0
+                
+                conn.commit()
+                if updated:
+                    self.event_log.record('update_offer_status', actor_id, 'buyer_offers', offer_id,
+                                          {'status': status})
+                return updated
+            except Exception as e:
+                print(f"Error updating offer status: {e}")
+                return False
     
-    def get_offer_details(self, offer_id: int) -> Optional[Dict[str, Any]]:
+    def get_offer_details(self, offer_id: int) -> Optional[Record]:
         """Get offer details by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT bo.id, bo.buyer_id, bo.crop_listing_id, bo.crop_name, 
-                   bo.offer_price, bo.quantity_wanted, bo.notes, bo.status,
-                   cl.farmer_id, cl.quantity as available_quantity, cl.expected_price
-            FROM buyer_offers bo
-            JOIN crop_listings cl ON bo.crop_listing_id = cl.id
-            WHERE bo.id = ?
-        ''', (offer_id,))
-        
-        offer = cursor.fetchone()
-        conn.close()
-        
-        if offer:
-            return {
-                'id': offer[0],
-                'buyer_id': offer[1],
-                'crop_listing_id': offer[2],
-                'crop_name': offer[3],
-                'offer_price': offer[4],
-                'quantity_wanted': offer[5],
-                'notes': offer[6],
-                'status': offer[7],
-                'farmer_id': offer[8],
-                'available_quantity': offer[9],
-                'expected_price': offer[10]
-            }
-        return None
-    
-    def accept_offer(self, offer_id: int) -> bool:
-        """Accept an offer and create transaction"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Get offer details
-            offer = self.get_offer_details(offer_id)
-            if not offer:
-                return False
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            # Update offer status to accepted
             cursor.execute('''
-                UPDATE buyer_offers SET status = 'accepted', updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?
+                SELECT bo.id, bo.buyer_id, bo.crop_listing_id, bo.crop_name, 
+                       bo.offer_price, bo.quantity_wanted, bo.notes, bo.status,
+                       cl.farmer_id, cl.quantity as available_quantity, cl.expected_price
+                FROM buyer_offers bo
+                JOIN crop_listings cl ON bo.crop_listing_id = cl.id
+                WHERE bo.id = ?
             ''', (offer_id,))
             
-            # Create transaction
-            total_amount = offer['offer_price'] * offer['quantity_wanted']
-            cursor.execute('''
-                INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, 
-                                        quantity, price_per_unit, total_amount, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (offer['buyer_id'], offer['farmer_id'], offer['crop_listing_id'], 
-                  offer['crop_name'], offer['quantity_wanted'], offer['offer_price'], 
-                  total_amount, f"Accepted offer - {offer['notes']}"))
-            
-            # Update crop listing - reduce quantity or mark as sold
-            remaining_quantity = offer['available_quantity'] - offer['quantity_wanted']
-            if remaining_quantity <= 0:
+            return fetch_record(cursor)
+    
+    @invalidates('crop_listings', 'buyer_offers', 'transactions')
+    def accept_offer(self, offer_id: int, actor_id: int = None) -> bool:
+        """Accept an offer and create transaction
+        
+        Everything happens in one BEGIN IMMEDIATE transaction on one
+        connection, and the listing is only decremented while enough quantity
+        is left, so concurrent acceptances can never oversell a listing.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                
+                # Get the pending offer together with its listing
                 cursor.execute('''
-                    UPDATE crop_listings SET status = 'sold', updated_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                ''', (offer['crop_listing_id'],))
-            else:
+                    SELECT bo.buyer_id, bo.crop_listing_id, bo.crop_name, bo.offer_price,
+                           bo.quantity_wanted, bo.notes, cl.farmer_id
+                    FROM buyer_offers bo
+                    JOIN crop_listings cl ON bo.crop_listing_id = cl.id
+                    WHERE bo.id = ? AND bo.status = 'pending'
+                ''', (offer_id,))
+                offer = cursor.fetchone()
+                if not offer:
+                    conn.rollback()
+                    return False
+                buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, notes, farmer_id = offer
+                
+                # Reduce the listing quantity, marking it sold when nothing is left
                 cursor.execute('''
-                    UPDATE crop_listings SET quantity = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                ''', (remaining_quantity, offer['crop_listing_id']))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error accepting offer: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+                    UPDATE crop_listings
+                    SET quantity = quantity - ?,
+                        status = CASE WHEN quantity - ? <= 0 THEN 'sold' ELSE status END,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'available' AND quantity >= ?
+                ''', (quantity_wanted, quantity_wanted, crop_listing_id, quantity_wanted))
+                if cursor.rowcount == 0:
+                    # Not enough quantity left (or listing no longer available)
+                    conn.rollback()
+                    return False
+                
+                # Update offer status to accepted, unless a concurrent call got
+                # there first (PostgreSQL does not serialize the read above)
+                cursor.execute('''
+                    UPDATE buyer_offers SET status = 'accepted', updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ? AND status = 'pending'
+                ''', (offer_id,))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False
+                
+                # Create transaction
+                cursor.execute('''
+                    INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, 
+                                            quantity, price_per_unit, total_amount, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (buyer_id, farmer_id, crop_listing_id, crop_name, quantity_wanted, offer_price,
+                      offer_price * quantity_wanted, f"Accepted offer - {notes}"))
+                
+                conn.commit()
+                self.event_log.record('accept_offer', actor_id, 'buyer_offers', offer_id,
+                                      {'crop_listing_id': crop_listing_id, 'quantity': quantity_wanted,
+                                       'total_amount': offer_price * quantity_wanted})
+                return True
+            except Exception as e:
+                print(f"Error accepting offer: {e}")
+                conn.rollback()
+                return False
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
-        """Get dashboard statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Get dashboard statistics
+        
+        Reads the single dashboard_counters row that triggers keep current
+        (migration 3), so the cost does not grow with the tables.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'SELECT {", ".join(DASHBOARD_COUNTER_COLUMNS)} FROM dashboard_counters WHERE id = 1')
+            counters = cursor.fetchone()
+            if counters is None:
+                self.reconcile_dashboard_counters()
+                cursor.execute(f'SELECT {", ".join(DASHBOARD_COUNTER_COLUMNS)} FROM dashboard_counters WHERE id = 1')
+                counters = cursor.fetchone()
+            
+            return dict(zip(DASHBOARD_COUNTER_COLUMNS, counters))
+    
+    def reconcile_dashboard_counters(self) -> Optional[Dict[str, Any]]:
+        """Rebuild dashboard_counters from the base tables and return the drift it corrected
+        
+        Triggers keep the counters exact for every write, but the transaction
+        value is a running float sum, and data restored from an old backup or
+        edited with triggers dropped would be off. This scans the base tables,
+        so run it off-peak (admin Analytics tab).
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(f'SELECT {", ".join(DASHBOARD_COUNTER_COLUMNS)} FROM dashboard_counters WHERE id = 1')
+                before = cursor.fetchone() or (0,) * len(DASHBOARD_COUNTER_COLUMNS)
+                cursor.execute(DASHBOARD_COUNTERS_REBUILD)
+                cursor.execute(f'SELECT {", ".join(DASHBOARD_COUNTER_COLUMNS)} FROM dashboard_counters WHERE id = 1')
+                after = cursor.fetchone()
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error reconciling dashboard counters: {e}")
+                return None
+            
+            return {column: new - old
+                    for column, old, new in zip(DASHBOARD_COUNTER_COLUMNS, before, after) if new != old}
+    
+    def get_events(self, since: Union[str, datetime] = None, until: Union[str, datetime] = None,
+                   action: str = None, limit: int = 500) -> List[Record]:
+        """Logged events with since <= occurred_at < until (UTC), newest first
+        
+        Buffered events are flushed first, so an action shows up as soon as
+        it returns.
+        """
+        self.event_log.flush()
+        where, params = event_range(since, until, action)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT e.id, e.occurred_at, e.action, e.actor_id, u.name as actor_name,
+                       e.subject_type, e.subject_id, e.details
+                FROM event_log e
+                LEFT JOIN users u ON e.actor_id = u.id
+                {where}
+                ORDER BY e.occurred_at DESC, e.id DESC
+                LIMIT ?
+            ''', params + [limit])
+            
+            return fetch_records(cursor)
+    
+    def get_event_counts(self, since: Union[str, datetime] = None,
+                         until: Union[str, datetime] = None) -> Dict[str, int]:
+        """Number of logged events per action with since <= occurred_at < until (UTC)"""
+        self.event_log.flush()
+        where, params = event_range(since, until)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT e.action, COUNT(*) FROM event_log e
+                {where}
+                GROUP BY e.action
+                ORDER BY e.action
+            ''', params)
+            
+            return dict(cursor.fetchall())
+    
+    @invalidates('crop_listings', 'buyer_offers')
+    def archive_closed_rows(self, older_than_days: float = config.ARCHIVE_AFTER_DAYS,
+                            batch_size: int = config.ARCHIVE_BATCH_SIZE) -> Optional[Dict[str, int]]:
+        """Move closed offers and sold/cancelled listings not updated for older_than_days into the archive tables
+        
+        Rows move ``batch_size`` at a time, one short transaction each, so
+        marketplace writes are never blocked for long. Archived rows leave
+        search and the everyday reads; pass include_archived=True to
+        get_farmer_listings / get_offers_by_status to see them. Returns the
+        number of rows moved per table, or None on error.
+        """
+        cutoff = utc_timestamp(time.time() - older_than_days * 86400)
+        archived = {}
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            for table, archive, columns, statuses, condition in ARCHIVE_TIERS:
+                archived[table] = 0
+                while True:
+                    try:
+                        cursor.execute('BEGIN IMMEDIATE')
+                        cursor.execute(f'''
+                            SELECT id FROM {table}
+                            WHERE status IN ({", ".join("?" * len(statuses))}) AND updated_at < ? {condition}
+                            ORDER BY id
+                            LIMIT ?
+                        ''', (*statuses, cutoff, batch_size))
+                        ids = [row[0] for row in cursor.fetchall()]
+                        if ids:
+                            placeholders = ", ".join("?" * len(ids))
+                            cursor.execute(f'INSERT INTO {archive} ({columns}) SELECT {columns} FROM {table} '
+                                           f'WHERE id IN ({placeholders})', ids)
+                            cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"Error archiving {table}: {e}")
+                        return None
+                    
+                    archived[table] += len(ids)
+                    if len(ids) < batch_size:
+                        break
         
-        # Total users by role
-        cursor.execute('SELECT role, COUNT(*) FROM users WHERE is_active = 1 GROUP BY role')
-        user_stats = dict(cursor.fetchall())
-        
-        # Total active crop listings
-        cursor.execute('SELECT COUNT(*) FROM crop_listings WHERE status = "available"')
-        active_listings = cursor.fetchone()[0]
-        
-        # Total transactions
-        cursor.execute('SELECT COUNT(*) FROM transactions')
-        total_transactions = cursor.fetchone()[0]
-        
-        # Total transaction value
-        cursor.execute('SELECT SUM(total_amount) FROM transactions')
-        total_value = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        return {
-            'total_farmers': user_stats.get('farmer', 0),
-            'total_buyers': user_stats.get('buyer', 0),
-            'total_agents': user_stats.get('agent', 0),
-            'total_admins': user_stats.get('admin', 0),
-            'active_listings': active_listings,
-            'total_transactions': total_transactions,
-            'total_transaction_value': total_value
-        }
+        return archived
+    
+    def _export_query(self, destination: Union[str, os.PathLike], columns: List[str], sql: str,
+                      params: tuple, chunk_size: int) -> int:
+        """Stream a query to a CSV/Excel file with fetchmany, never holding the whole result"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            
+            def rows():
+                while True:
+                    batch = cursor.fetchmany(chunk_size)
+                    if not batch:
+                        return
+                    yield from batch
+            
+            return write_export_rows(destination, columns, rows())
+    
+    def export_listings(self, destination: Union[str, os.PathLike], status: str = None,
+                        chunk_size: int = config.BULK_IMPORT_CHUNK_SIZE) -> int:
+        """Export crop listings (optionally one status) to CSV/Excel; returns the row count.
+        
+        The file uses LISTING_EXPORT_COLUMNS, so it can be fed straight back
+        into bulk_create_listings.
+        """
+        where = 'WHERE status = ?' if status else ''
+        return self._export_query(destination, LISTING_EXPORT_COLUMNS, f'''
+            SELECT {', '.join(LISTING_EXPORT_COLUMNS)}
+            FROM crop_listings {where}
+            ORDER BY id
+        ''', (status,) if status else (), chunk_size)
+    
+    def export_users(self, destination: Union[str, os.PathLike], role: str = None,
+                     chunk_size: int = config.BULK_IMPORT_CHUNK_SIZE) -> int:
+        """Export users (optionally one role, without password hashes) to CSV/Excel"""
+        where = 'WHERE role = ?' if role else ''
+        return self._export_query(destination, USER_EXPORT_COLUMNS, f'''
+            SELECT {', '.join(USER_EXPORT_COLUMNS)}
+            FROM users {where}
+            ORDER BY id
+        ''', (role,) if role else (), chunk_size)
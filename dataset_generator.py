@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Vectorized synthetic crop datasets for training and stress tests
+
+Usage:
+    python dataset_generator.py comprehensive 1000000 data/stress.csv
+    python dataset_generator.py enhanced 5000000 data/stress.parquet 7    # optional seed
+"""
+
+import os
+import sys
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from recommendations import FEATURE_COLUMNS
+
+# Rows drawn per chunk; generate() returns the same rows as write_dataset() streams
+CHUNK_SIZE = 100000
+
+# Every generated value is clipped to these realistic ranges
+CLIP_RANGES = {
+    'temperature': (10, 45),
+    'humidity': (30, 95),
+    'N': (20, 200),
+    'P': (10, 100),
+    'K': (15, 180),
+    'pH': (5.0, 8.5),
+    'rainfall': (200, 2000),
+}
+
+# Comprehensive dataset (train_model.py): each crop's features are normally
+# distributed, as (mean, standard deviation) in FEATURE_COLUMNS order
+COMPREHENSIVE_PROFILES = pd.DataFrame.from_records([
+    ('wheat', (20, 3), (55, 8), (80, 15), (30, 8), (40, 10), (6.8, 0.3), (500, 100)),  # Cool season crop
+    ('rice', (28, 2), (85, 5), (110, 20), (40, 10), (50, 12), (6.2, 0.4), (1500, 200)),  # High humidity and rainfall
+    ('maize', (25, 2), (70, 8), (100, 15), (60, 12), (40, 8), (6.5, 0.3), (900, 150)),  # Moderate conditions
+    ('cotton', (30, 3), (65, 10), (140, 20), (35, 8), (125, 15), (6.8, 0.4), (750, 120)),  # Warm, high N and K
+    ('sugarcane', (32, 2), (80, 8), (125, 18), (40, 10), (75, 12), (6.8, 0.3), (1250, 180)),  # Very warm, humid
+    ('tomato', (24, 3), (70, 8), (100, 15), (65, 12), (75, 10), (6.5, 0.2), (600, 100)),  # Moderate temp, high P
+    ('potato', (18, 2), (80, 8), (120, 15), (60, 10), (100, 12), (6.0, 0.3), (550, 80)),  # Cool, high N and K
+    ('onion', (23, 2), (60, 8), (80, 12), (45, 8), (60, 10), (6.8, 0.3), (800, 100)),  # Moderate conditions
+    ('barley', (18, 2), (55, 8), (80, 12), (35, 8), (45, 8), (6.8, 0.3), (450, 80)),  # Cool, low rainfall
+    ('millet', (35, 2), (50, 8), (60, 10), (25, 5), (35, 8), (6.5, 0.4), (300, 50)),  # Very hot, drought resistant
+], columns=['crop'] + FEATURE_COLUMNS).set_index('crop')
+
+# Enhanced dataset (train_enhanced_model.py): each crop's features are
+# uniform over (low, high), in FEATURE_COLUMNS order
+ENHANCED_RANGES = pd.DataFrame.from_records([
+    ('rice', (26, 30), (80, 95), (100, 140), (40, 60), (40, 70), (5.5, 7.0), (1200, 1800)),
+    ('sugarcane', (30, 35), (70, 90), (120, 160), (30, 50), (60, 100), (6.0, 7.5), (1000, 1500)),
+    ('millet', (32, 38), (40, 65), (40, 80), (15, 35), (20, 50), (5.5, 7.5), (200, 500)),
+    ('barley', (15, 22), (45, 70), (60, 100), (20, 40), (30, 60), (6.0, 7.5), (300, 600)),
+    ('wheat', (18, 25), (50, 75), (70, 120), (25, 45), (30, 60), (6.0, 7.5), (400, 800)),
+    ('maize', (22, 28), (60, 80), (90, 130), (50, 80), (35, 65), (5.8, 7.2), (600, 1000)),
+    ('cotton', (25, 35), (55, 80), (120, 180), (25, 45), (100, 150), (5.8, 8.0), (500, 900)),
+    ('tomato', (20, 28), (60, 80), (80, 120), (60, 90), (60, 100), (6.0, 7.0), (400, 700)),
+    ('potato', (15, 22), (70, 90), (100, 150), (50, 80), (80, 120), (5.5, 6.5), (400, 600)),
+    ('onion', (20, 27), (50, 70), (70, 110), (35, 55), (50, 80), (6.0, 7.5), (600, 900)),
+], columns=['crop'] + FEATURE_COLUMNS).set_index('crop')
+
+# Enhanced dataset strata: (crop, water resource, rainfall factor, share of rows).
+# High- and low-water crops are grown with that water resource only;
+# moderate-water crops under both, with 20% more or less rainfall.
+ENHANCED_STRATA = (
+    [(crop, 'high', 1.0, 2) for crop in ('rice', 'sugarcane')]
+    + [(crop, 'low', 1.0, 2) for crop in ('millet', 'barley')]
+    + [(crop, water, factor, 1) for crop in ('wheat', 'maize', 'cotton', 'tomato', 'potato', 'onion')
+       for water, factor in (('high', 1.2), ('low', 0.8))]
+)
+
+DATASETS = ('comprehensive', 'enhanced')
+
+def stratum_counts(rows: int, shares) -> np.ndarray:
+    """Split rows between strata in proportion to shares (largest remainder)"""
+    shares = np.asarray(shares, dtype=float)
+    exact = rows * shares / shares.sum()
+    counts = np.floor(exact).astype(np.int64)
+    counts[np.argsort(counts - exact)[:rows - counts.sum()]] += 1
+    return counts
+
+def generate_chunks(dataset: str, rows: int, seed: Optional[int] = 42,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield a synthetic dataset of ``rows`` rows as DataFrames of up to chunk_size rows
+
+    Rows are grouped by crop (and water resource), in the tables' order,
+    each getting a share of ``rows`` like the original datasets. Every
+    column of a chunk is drawn at once from one np.random.Generator, so the
+    same seed and chunk_size always give the same rows.
+    """
+    if dataset == 'comprehensive':
+        crops = COMPREHENSIVE_PROFILES.index.to_numpy()
+        # (crop, feature, [mean, std])
+        params = np.array(COMPREHENSIVE_PROFILES.to_numpy().tolist(), dtype=float)
+        means, spreads = params[..., 0], params[..., 1]
+        water = factors = None
+        counts = stratum_counts(rows, np.ones(len(crops)))
+    elif dataset == 'enhanced':
+        strata = pd.DataFrame(ENHANCED_STRATA, columns=['crop', 'water_resource', 'rainfall_factor', 'share'])
+        crops = strata['crop'].to_numpy()
+        # (stratum, feature, [low, high])
+        params = np.array(ENHANCED_RANGES.loc[crops].to_numpy().tolist(), dtype=float)
+        means, spreads = params[..., 0], params[..., 1] - params[..., 0]
+        water = strata['water_resource'].to_numpy()
+        factors = strata['rainfall_factor'].to_numpy()
+        counts = stratum_counts(rows, strata['share'])
+    else:
+        raise ValueError(f"unknown dataset {dataset!r} (choose from {', '.join(DATASETS)})")
+
+    rng = np.random.default_rng(seed)
+    low, high = np.array([CLIP_RANGES[name] for name in FEATURE_COLUMNS], dtype=float).T
+    ends = np.cumsum(counts)
+    rainfall = FEATURE_COLUMNS.index('rainfall')
+    for start in range(0, rows, chunk_size):
+        stop = min(start + chunk_size, rows)
+        stratum = np.searchsorted(ends, np.arange(start, stop), side='right')
+        if dataset == 'comprehensive':
+            values = means[stratum] + spreads[stratum] * rng.standard_normal((stop - start, len(FEATURE_COLUMNS)))
+        else:
+            values = means[stratum] + spreads[stratum] * rng.random((stop - start, len(FEATURE_COLUMNS)))
+            values[:, rainfall] *= factors[stratum]
+        np.clip(values, low, high, out=values)
+
+        chunk = pd.DataFrame(values, columns=FEATURE_COLUMNS, index=pd.RangeIndex(start, stop))
+        if water is not None:
+            chunk['water_resource'] = water[stratum]
+        chunk['crop'] = crops[stratum]
+        yield chunk
+
+def generate(dataset: str, rows: int, seed: Optional[int] = 42, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """A whole synthetic dataset in memory (see generate_chunks)"""
+    chunks = list(generate_chunks(dataset, rows, seed, chunk_size))
+    if not chunks:
+        columns = FEATURE_COLUMNS + (['water_resource'] if dataset == 'enhanced' else []) + ['crop']
+        return pd.DataFrame({name: pd.Series(dtype=float if name in FEATURE_COLUMNS else object) for name in columns})
+    return pd.concat(chunks)
+
+def write_dataset(path: str, dataset: str, rows: int, seed: Optional[int] = 42, chunk_size: int = CHUNK_SIZE) -> int:
+    """Stream a synthetic dataset to a .csv or .parquet file chunk by chunk; returns the rows written
+
+    Only one chunk is in memory at a time, so the row count is limited by
+    disk space, not RAM. Parquet output needs pyarrow.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.csv', '.parquet'):
+        raise ValueError(f"unsupported output format {extension!r} (use .csv or .parquet)")
+    writer = None
+    written = 0
+    try:
+        for chunk in generate_chunks(dataset, rows, seed, chunk_size):
+            if extension == '.csv':
+                chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] not in DATASETS:
+        print(__doc__.strip())
+        sys.exit(1)
+    start = time.perf_counter()
+    try:
+        written = write_dataset(sys.argv[3], sys.argv[1], int(sys.argv[2]),
+                                int(sys.argv[4]) if len(sys.argv) == 5 else 42)
+    except (ValueError, ImportError) as e:
+        print(f"❌ Error generating dataset: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Wrote {written:,} {sys.argv[1]} rows to {sys.argv[3]} in {elapsed:.1f} s "
+          f"({written / elapsed:,.0f} rows/s)")
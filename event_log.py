@@ -0,0 +1,131 @@
+import atexit
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import config
+
+EVENT_INSERT = '''
+    INSERT INTO event_log (occurred_at, action, actor_id, subject_type, subject_id, details)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+class EventLog:
+    """Buffered writer for the append-only event_log table (migration 7).
+
+    record() only appends to an in-memory buffer, so logging an action costs
+    microseconds instead of a database write. A background thread writes the
+    buffer in batches, one transaction each, as soon as ``batch_size`` events
+    are waiting and at most ``flush_interval`` seconds after the first one
+    arrived, so an event reaches the table within about flush_interval of
+    being recorded. flush() writes everything now; close() (also run at
+    interpreter exit) flushes and stops the thread.
+
+    Writes go through a connection of the log's own, so logging never takes
+    a pooled connection from a request. Events that fail to write stay
+    buffered and are retried; past ``max_pending`` of them record() flushes
+    inline, so memory stays bounded.
+    """
+
+    def __init__(self, backend, flush_interval: float = config.EVENT_LOG_FLUSH_SECONDS,
+                 batch_size: int = config.EVENT_LOG_BATCH_SIZE, max_pending: int = config.EVENT_LOG_MAX_PENDING):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._wake = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time, in recording order
+        self._conn = None
+        self._thread = None
+        self._closed = False
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+
+    def record(self, action: str, actor_id: Optional[int] = None, subject_type: Optional[str] = None,
+               subject_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None):
+        """Buffer an event; ``details`` is stored as JSON"""
+        event = (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), action, actor_id, subject_type, subject_id,
+                 None if details is None else json.dumps(details, default=str))
+        with self._wake:
+            self._pending.append(event)
+            self.recorded += 1
+            pending = len(self._pending)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            if pending == 1 or pending >= self.batch_size:
+                self._wake.notify()
+        if self._closed or pending >= self.max_pending:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._pending and not self._closed:
+                    self._wake.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _write(self, batch):
+        if self._conn is None:
+            self._conn = self.backend.connect()
+        try:
+            self._conn.executemany(EVENT_INSERT, batch)
+            self._conn.commit()
+        except Exception:
+            # Reconnect on the next attempt, in case the connection broke
+            self._conn.close()
+            self._conn = None
+            raise
+
+    def flush(self) -> int:
+        """Write every buffered event now and return how many were written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._wake:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    with self._wake:
+                        self._pending.extendleft(reversed(batch))
+                    print(f"Error writing event log: {e}")
+                    return written
+                written += len(batch)
+                self.written += len(batch)
+                self.batches += 1
+
+    def pending(self) -> int:
+        with self._wake:
+            return len(self._pending)
+
+    def close(self):
+        """Flush, stop the background thread and close the log's connection"""
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+        with self._flush_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import config
+from tree_engine import FOREST_META, FlatForest, HybridForest, compile_model
+
+MODEL_FILE = 'model.pkl'
+ENCODER_FILE = 'encoder.pkl'
+MANIFEST_FILE = 'manifest.json'
+FOREST_DIR = 'forest'
+CURRENT_FILE = 'CURRENT'
+HISTORY_FILE = 'HISTORY'
+
+# Pickles trained before the registry existed, imported as version 1 the
+# first time their model is asked for: name -> (model file, encoder file)
+LEGACY_MODELS = {
+    'crop': ('crop_recommendation_model.pkl', None),
+    'enhanced': ('enhanced_crop_model.pkl', 'water_resource_encoder.pkl'),
+}
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_atomic(path: str, data: bytes):
+    """Replace path with data in one step: readers see the old file or the new one"""
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ModelBundle:
+    """One registered version: the model (compiled, see tree_engine) with its encoder and manifest"""
+
+    def __init__(self, name: str, version: str, model, encoder, manifest: Dict[str, Any]):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.encoder = encoder
+        self.manifest = manifest
+
+    @property
+    def features(self) -> List[str]:
+        return self.manifest.get('features', [])
+
+class ModelRegistry:
+    """Versioned model artifacts on disk, hot-swapped into the running app.
+
+    Every version lives in ``<root>/<name>/<version>/`` with the pickled
+    model, its encoder (if it has one) and a manifest of feature schema,
+    classes, metrics and file checksums. ``<root>/<name>/CURRENT`` names the
+    active version and is only ever replaced atomically, so publishing or
+    rolling back from any process switches every app process over without a
+    restart. ``<root>/<name>/HISTORY`` lists the versions activation replaced,
+    most recent last, for rollback to undo activations in order.
+
+    Tree models are also stored flattened as raw .npy arrays (``forest/``,
+    see FlatForest.save) and loaded from there memory-mapped: the app never
+    unpickles them, and all processes on a machine share one copy in the
+    page cache.
+
+    get() re-reads CURRENT at most every ``poll_interval`` seconds. A new
+    version is loaded and checksum-verified before it replaces the one in
+    use, so requests keep the old model until the new one is ready and a
+    broken artifact is never swapped in. The version it replaced stays
+    loaded, so a rollback to it is instant.
+    """
+
+    def __init__(self, root: str = config.MODEL_REGISTRY_DIR,
+                 poll_interval: float = config.MODEL_REGISTRY_POLL_SECONDS, legacy_dir: str = '.'):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.legacy_dir = legacy_dir
+        self._lock = threading.Lock()
+        self._active: Dict[str, ModelBundle] = {}
+        self._previous: Dict[str, ModelBundle] = {}
+        self._next_check: Dict[str, float] = {}
+
+    def _path(self, name: str, *parts: str) -> str:
+        return os.path.join(self.root, name, *parts)
+
+    def versions(self, name: str) -> List[str]:
+        """Published versions of a model, oldest first"""
+        try:
+            entries = os.listdir(self._path(name))
+        except FileNotFoundError:
+            return []
+        return sorted((entry for entry in entries if entry.startswith('v') and entry[1:].isdigit()),
+                      key=lambda entry: int(entry[1:]))
+
+    def current_version(self, name: str) -> Optional[str]:
+        try:
+            with open(self._path(name, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def history(self, name: str) -> List[str]:
+        """Versions that were active before the current one, most recent last"""
+        try:
+            with open(self._path(name, HISTORY_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def manifest(self, name: str, version: str) -> Dict[str, Any]:
+        with open(self._path(name, version, MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def publish(self, name: str, model, encoder=None, metrics: Optional[Dict[str, float]] = None,
+                features: Optional[List[str]] = None, activate: bool = True) -> str:
+        """Store a trained model (and its encoder) as the next version; returns the version.
+
+        The version directory is written under a temporary name and renamed
+        into place, so a half-written version is never visible.
+        """
+        os.makedirs(self._path(name), exist_ok=True)
+        staging = self._path(name, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            files = {'model': MODEL_FILE}
+            with open(os.path.join(staging, MODEL_FILE), 'wb') as f:
+                pickle.dump(model, f)
+            if encoder is not None:
+                files['encoder'] = ENCODER_FILE
+                with open(os.path.join(staging, ENCODER_FILE), 'wb') as f:
+                    pickle.dump(encoder, f)
+            compiled = compile_model(model)
+            if isinstance(compiled, FlatForest):
+                files.update((f"forest/{filename}", os.path.join(FOREST_DIR, filename))
+                             for filename in compiled.save(os.path.join(staging, FOREST_DIR)))
+            if features is None and hasattr(model, 'feature_names_in_'):
+                features = [str(feature) for feature in model.feature_names_in_]
+
+            while True:
+                existing = self.versions(name)
+                version = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+                manifest = {
+                    'name': name,
+                    'version': version,
+                    'created_at': datetime.now().isoformat(timespec='seconds'),
+                    'model_type': type(model).__name__,
+                    'features': list(features or []),
+                    'classes': [str(label) for label in getattr(model, 'classes_', [])],
+                    'metrics': dict(metrics or {}),
+                    'files': files,
+                    'checksums': {role: file_checksum(os.path.join(staging, filename))
+                                  for role, filename in files.items()},
+                    'previous': self.current_version(name),
+                }
+                with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+                    json.dump(manifest, f, indent=2)
+                try:
+                    os.rename(staging, self._path(name, version))
+                    break
+                except OSError:
+                    # Another publisher took this version number first
+                    if not os.path.isdir(self._path(name, version)):
+                        raise
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def activate(self, name: str, version: str) -> bool:
+        """Point every app process at an already published version"""
+        if version not in self.versions(name):
+            print(f"Error activating {name} {version}: no such version")
+            return False
+        current = self.current_version(name)
+        if current is not None and current != version:
+            _write_atomic(self._path(name, HISTORY_FILE), json.dumps(self.history(name) + [current]).encode())
+        _write_atomic(self._path(name, CURRENT_FILE), version.encode())
+        self._next_check.pop(name, None)
+        return True
+
+    def rollback(self, name: str) -> Optional[str]:
+        """Reactivate the version the current one replaced; returns it, or None if there is none
+
+        Each rollback undoes one activation, publishing included, so
+        repeated rollbacks walk back through every version that was active.
+        """
+        current = self.current_version(name)
+        if current is None:
+            return None
+        history = self.history(name)
+        versions = self.versions(name)
+        while history:
+            previous = history.pop()
+            if previous != current and previous in versions:
+                _write_atomic(self._path(name, HISTORY_FILE), json.dumps(history).encode())
+                _write_atomic(self._path(name, CURRENT_FILE), previous.encode())
+                self._next_check.pop(name, None)
+                return previous
+        return None
+
+    def load(self, name: str, version: str) -> ModelBundle:
+        """Read and verify one version; raises ValueError if a file it reads doesn't match its checksum"""
+        manifest = self.manifest(name, version)
+        files = manifest['files']
+        flattened = f"forest/{FOREST_META}" in files
+        # A flattened model is read from its arrays; its pickle is only read,
+        # and verified, the first time a batch too large for them comes in
+        for role, filename in files.items():
+            if (role == 'model' and flattened) or (role.startswith('forest/') and not flattened):
+                continue
+            if file_checksum(self._path(name, version, filename)) != manifest['checksums'][role]:
+                raise ValueError(f"{name} {version}: {filename} does not match its checksum")
+
+        def unpickle(role):
+            with open(self._path(name, version, files[role]), 'rb') as f:
+                return pickle.load(f)
+
+        def load_estimator():
+            if file_checksum(self._path(name, version, files['model'])) != manifest['checksums']['model']:
+                raise ValueError(f"{name} {version}: {files['model']} does not match its checksum")
+            return unpickle('model')
+
+        if flattened:
+            model = FlatForest.load(self._path(name, version, FOREST_DIR))
+            # A forest trained as a FlatForest (train_streaming_model) has no sklearn model to hand large batches to
+            if manifest.get('model_type') != FlatForest.__name__:
+                model = HybridForest(model, load_estimator=load_estimator)
+        else:
+            estimator = unpickle('model')
+            model = compile_model(estimator)
+            if isinstance(model, FlatForest) and model is not estimator:
+                model = HybridForest(model, estimator=estimator)
+        encoder = unpickle('encoder') if 'encoder' in files else None
+        return ModelBundle(name, version, model, encoder, manifest)
+
+    def import_legacy(self, name: str) -> Optional[str]:
+        """Publish the pre-registry pickle files of a model as its first version, if they exist"""
+        model_file, encoder_file = LEGACY_MODELS.get(name, (None, None))
+        if model_file is None or self.versions(name):
+            return None
+        paths = [os.path.join(self.legacy_dir, filename) for filename in (model_file, encoder_file) if filename]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        loaded = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                loaded.append(pickle.load(f))
+        return self.publish(name, *loaded, metrics={'imported_from': model_file})
+
+    def get(self, name: str) -> Optional[ModelBundle]:
+        """The active version of a model, swapping in a newly activated one; None if there is none"""
+        now = time.monotonic()
+        bundle = self._active.get(name)
+        if bundle is not None and now < self._next_check.get(name, 0):
+            return bundle
+
+        with self._lock:
+            bundle = self._active.get(name)
+            if bundle is not None and now < self._next_check.get(name, 0):
+                return bundle
+            self._next_check[name] = now + self.poll_interval
+            version = self.current_version(name)
+            if version is None:
+                version = self.import_legacy(name)
+                if version is None:
+                    return bundle
+            if bundle is not None and bundle.version == version:
+                return bundle
+
+            previous = self._previous.get(name)
+            if previous is not None and previous.version == version:
+                new_bundle = previous
+            else:
+                try:
+                    new_bundle = self.load(name, version)
+                except Exception as e:
+                    print(f"Error loading {name} {version}: {e}")
+                    return bundle
+            if bundle is not None:
+                self._previous[name] = bundle
+            self._active[name] = new_bundle
+            return new_bundle
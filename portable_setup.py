@@ -180,7 +180,71 @@ LOG_DIR = "logs"
 WEATHER_API_KEY = "your_api_key_here"
 
 # Database Configuration
-DATABASE_PATH = "smart_farming.db"
+DATABASE_BACKEND = "sqlite"  # "sqlite" or "postgres" (needs psycopg2; lets several app replicas share one database)
+DATABASE_PATH = "smart_farming.db"  # sqlite backend
+DATABASE_URL = "postgresql://localhost/smart_farming"  # postgres backend
+DATABASE_POOL_SIZE = 8  # Max pooled database connections per process
+BULK_IMPORT_CHUNK_SIZE = 5000  # Rows per transaction for bulk imports/exports
+READ_CACHE_SIZE = 256  # Cached listing/offer reads per process
+READ_CACHE_TTL_SECONDS = 30  # Bounds how stale a read can be after another process writes
+
+# Login sessions (user_sessions table)
+SESSION_TTL_SECONDS = 7 * 24 * 3600  # How long a login lasts
+SESSION_CACHE_SIZE = 4096  # Validated tokens kept in memory per process
+SESSION_CACHE_TTL_SECONDS = 60  # Re-check a cached token against the database after this
+SESSION_SWEEP_INTERVAL_SECONDS = 600  # Min time between expired-session sweeps
+SESSION_SWEEP_BATCH_SIZE = 500  # Rows deleted per sweep transaction
+
+# Archive tiers (crop_listings_archive, buyer_offers_archive)
+ARCHIVE_AFTER_DAYS = 90  # Closed offers and sold/cancelled listings untouched this long are archived
+ARCHIVE_BATCH_SIZE = 1000  # Rows moved per archive transaction
+
+# Event log (event_log table)
+EVENT_LOG_FLUSH_SECONDS = 1.0  # Longest an event waits in memory before it is written
+EVENT_LOG_BATCH_SIZE = 500  # Events per write transaction; a full batch is written at once
+EVENT_LOG_MAX_PENDING = 10000  # Buffered events past which callers write them inline
+
+# Model registry (see model_registry.py)
+MODEL_REGISTRY_DIR = "models/registry"  # One directory of versions per model, plus its CURRENT pointer
+MODEL_REGISTRY_POLL_SECONDS = 5  # How often each app process checks for a newly activated version
+FLAT_FOREST_MAX_ROWS = 500  # Larger predict_proba batches go to the sklearn model (tree_engine.HybridForest)
+
+# Prediction cache (recommendations.PredictionCache), shared by all sessions of an app process
+PREDICTION_CACHE_SIZE = 4096  # Cached grid cells
+PREDICTION_CACHE_TTL_SECONDS = 600  # How long a cached recommendation is reused
+PREDICTION_CACHE_RESOLUTION = {  # Inputs closer than this share a cached recommendation
+    "temperature": 0.5,  # Celsius
+    "humidity": 1,  # %
+    "N": 1,
+    "P": 1,
+    "K": 1,
+    "pH": 0.1,
+    "rainfall": 10,  # mm
+}
+
+# Recommendation grid (recommendation_grid.py): answers for chatbot/location lookups without running the model
+RECOMMENDATION_GRID_DIR = "models/grids"  # One .npz per model version
+RECOMMENDATION_GRID_AXES = {  # (first, last, step) of each weather axis; matches the training data ranges
+    "temperature": (10, 45, 1.0),  # Celsius
+    "humidity": (30, 95, 2.5),  # %
+    "rainfall": (200, 2000, 50),  # mm
+}
+
+# SQLite storage profile applied to every pooled connection.
+# "wal" lets readers keep going while a writer commits; "default" keeps
+# SQLite's rollback journal.
+DATABASE_STORAGE_PROFILE = "wal"
+DATABASE_STORAGE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # ms
+        "mmap_size": 268435456,  # 256 MB
+        "cache_size": -16000,  # 16 MB
+        "temp_store": "MEMORY",
+    },
+}
 
 # Supported file paths for soil data
 SOIL_DATA_PATHS = [
@@ -189,6 +253,30 @@ SOIL_DATA_PATHS = [
     "../playground-series-s5e6/train.csv",
     "train.csv"
 ]
+
+# Out-of-core training (train_streaming_model.py) for soil CSVs too big for RAM:
+# rows parsed per chunk, random samples drawn across the whole file, rows per
+# sample, the forest fitted on each sample and the rows held out for accuracy
+STREAMING_CHUNK_ROWS = 250000
+STREAMING_SAMPLES = 8
+STREAMING_SAMPLE_ROWS = 200000
+STREAMING_FOREST_PARAMS = {"n_estimators": 10, "max_depth": 15, "min_samples_split": 5, "min_samples_leaf": 3}
+STREAMING_HOLDOUT_ROWS = 50000
+
+# Hyperparameter search for the enhanced model (tune_enhanced_model.py). Fold
+# scores are cached in TUNING_CACHE_DIR, so re-runs only fit what is new.
+TUNING_CACHE_DIR = "models/tuning_cache"
+TUNING_FOLDS = 5
+TUNING_RANDOM_CANDIDATES = 20  # Sampled from the grid by "random" searches
+TUNING_WORKERS = None  # Processes fitting folds; None uses every CPU
+TUNING_PARAM_GRID = {
+    "n_estimators": [100, 300, 500],
+    "max_depth": [10, 20, None],
+    "min_samples_split": [2, 3, 5],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", 0.5],
+    "criterion": ["gini", "entropy"],
+}
 """
     
     with open("config.py", "w") as f:
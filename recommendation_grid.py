@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Precomputed crop recommendations over a weather grid for every soil profile
+
+Usage:
+    python recommendation_grid.py    # build the grid for the active crop model
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+from model_registry import ModelRegistry
+from recommendations import FEATURE_COLUMNS, choose_crops
+from soil_profiles import all_soil_profiles, soil_profile
+
+# Weather varies along the grid; N, P, K and pH come from the soil profile
+GRID_AXES = ('temperature', 'humidity', 'rainfall')
+
+# Grid points evaluated per predict_proba call while building
+BUILD_CHUNK_SIZE = 50000
+
+def axis_values(start: float, stop: float, step: float) -> np.ndarray:
+    return start + step * np.arange(int(round((stop - start) / step)) + 1)
+
+class RecommendationGrid:
+    """recommend_batch's answer at every grid point, for every soil profile, in three arrays.
+
+    ``crop``, ``confidence`` and ``from_model`` are indexed by (profile,
+    temperature, humidity, rainfall). A lookup snaps the weather to the
+    nearest grid point (clamped to the grid, which covers the range the
+    models were trained on) and reads one element of each: no model is
+    loaded or run.
+    """
+
+    def __init__(self, version: str, crops, profiles, axes: Dict[str, tuple], crop: np.ndarray,
+                 confidence: np.ndarray, from_model: np.ndarray):
+        self.version = version
+        self.crops = np.asarray(crops)
+        self.profiles = list(profiles)
+        self.axes = {name: tuple(axes[name]) for name in GRID_AXES}
+        self.crop = crop
+        self.confidence = confidence
+        self.from_model = from_model
+        self._profile_index = {name: i for i, name in enumerate(self.profiles)}
+
+    @classmethod
+    def build(cls, model, version: str, axes: Optional[Dict[str, tuple]] = None) -> 'RecommendationGrid':
+        """Evaluate the model at every grid point of every soil profile"""
+        axes = dict(config.RECOMMENDATION_GRID_AXES if axes is None else axes)
+        profiles = all_soil_profiles()
+        weather = np.meshgrid(*(axis_values(*axes[name]) for name in GRID_AXES), indexing='ij')
+        shape = weather[0].shape
+        weather = {name: values.ravel() for name, values in zip(GRID_AXES, weather)}
+
+        crop_names = []
+        confidence = np.empty((len(profiles), weather['temperature'].size), dtype=np.float32)
+        from_model = np.empty(confidence.shape, dtype=bool)
+        for i, profile in enumerate(profiles.values()):
+            for start in range(0, confidence.shape[1], BUILD_CHUNK_SIZE):
+                chunk = slice(start, start + BUILD_CHUNK_SIZE)
+                rows = pd.DataFrame({name: weather[name][chunk] if name in weather else profile[name]
+                                     for name in FEATURE_COLUMNS})
+                crop, confidence[i, chunk], source = choose_crops(
+                    model.predict_proba(rows), model.classes_, rows['rainfall'], rows['temperature'], rows['humidity'])
+                crop_names.append(crop)
+                from_model[i, chunk] = source == 'model'
+
+        crops, crop = np.unique(np.concatenate(crop_names), return_inverse=True)
+        crop = crop.astype(np.min_scalar_type(len(crops))).reshape((len(profiles),) + shape)
+        return cls(version, crops, profiles, axes, crop, confidence.reshape(crop.shape),
+                   from_model.reshape(crop.shape))
+
+    def save(self, path: str):
+        """Write the grid as one .npz file, replacing any previous one atomically"""
+        meta = {'version': self.version, 'crops': self.crops.tolist(), 'profiles': self.profiles, 'axes': self.axes}
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, crop=self.crop, confidence=self.confidence, from_model=self.from_model,
+                     meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'RecommendationGrid':
+        with np.load(path) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            return cls(meta['version'], meta['crops'], meta['profiles'], meta['axes'],
+                       arrays['crop'], arrays['confidence'], arrays['from_model'])
+
+    def lookup(self, location: str, temperature: float, humidity: float,
+               rainfall: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """recommended_crop, confidence and source for a location's soil and weather
+
+        rainfall defaults to the location's typical rainfall. None if the
+        location's soil profile was added after the grid was built.
+        """
+        name, profile = soil_profile(location)
+        if name not in self._profile_index:
+            return None
+        weather = (temperature, humidity, profile['rainfall'] if rainfall is None else rainfall)
+        point = (self._profile_index[name],)
+        for axis, value, size in zip(GRID_AXES, weather, self.crop.shape[1:]):
+            start, _, step = self.axes[axis]
+            point += (min(max(math.floor((value - start) / step + 0.5), 0), size - 1),)
+        return {'recommended_crop': str(self.crops[self.crop[point]]), 'confidence': float(self.confidence[point]),
+                'source': 'model' if self.from_model[point] else 'water', 'profile': name}
+
+class RecommendationGrids:
+    """The grid of a registry model's active version, rebuilt when another version is activated.
+
+    get() returns the grid built for the active version. When that grid
+    doesn't exist yet, it is built on a background thread and get() returns
+    None until it is ready, so callers ask the model itself rather than
+    answer from a version that was just replaced or rolled back. A version
+    whose build failed isn't built again by this process.
+    """
+
+    def __init__(self, registry: ModelRegistry, directory: str = config.RECOMMENDATION_GRID_DIR, name: str = 'crop',
+                 axes: Optional[Dict[str, tuple]] = None):
+        self.registry = registry
+        self.directory = directory
+        self.name = name
+        self.axes = axes
+        self._grid = None
+        self._building = None
+        self._failed = None
+        self._lock = threading.Lock()
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.directory, f"{self.name}-{version}.npz")
+
+    def build(self, bundle) -> RecommendationGrid:
+        """Build and save the grid of one registry version"""
+        grid = RecommendationGrid.build(bundle.model, bundle.version, self.axes)
+        os.makedirs(self.directory, exist_ok=True)
+        grid.save(self.path(bundle.version))
+        return grid
+
+    def get(self) -> Optional[RecommendationGrid]:
+        bundle = self.registry.get(self.name)
+        if bundle is None:
+            return None
+        with self._lock:
+            if self._grid is not None and self._grid.version == bundle.version:
+                return self._grid
+            if os.path.exists(self.path(bundle.version)):
+                try:
+                    self._grid = RecommendationGrid.load(self.path(bundle.version))
+                    return self._grid
+                except Exception as e:
+                    print(f"Error loading recommendation grid for {self.name} {bundle.version}: {e}")
+            if self._building != bundle.version and self._failed != bundle.version:
+                self._building = bundle.version
+                threading.Thread(target=self._build_in_background, args=(bundle,), daemon=True).start()
+            return None
+
+    def _build_in_background(self, bundle):
+        try:
+            grid = self.build(bundle)
+        except Exception as e:
+            print(f"Error building recommendation grid for {self.name} {bundle.version}: {e}")
+            grid = None
+        with self._lock:
+            if grid is not None:
+                self._grid = grid
+            else:
+                self._failed = bundle.version
+            if self._building == bundle.version:
+                self._building = None
+
+if __name__ == "__main__":
+    registry = ModelRegistry()
+    bundle = registry.get('crop')
+    if bundle is None:
+        print("❌ No crop model published yet. Run train_model.py first.")
+    else:
+        grids = RecommendationGrids(registry)
+        start = time.perf_counter()
+        grid = grids.build(bundle)
+        print(f"✅ Built the {bundle.version} grid: {len(grid.profiles)} soil profiles x "
+              f"{' x '.join(str(size) for size in grid.crop.shape[1:])} weather points in "
+              f"{time.perf_counter() - start:.1f} s, {os.path.getsize(grids.path(bundle.version)) / 1e6:.1f} MB "
+              f"at {grids.path(bundle.version)}")
@@ -0,0 +1,185 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Model inputs, in the order the recommendation model was trained on (train_model.py)
+FEATURE_COLUMNS = ['temperature', 'humidity', 'N', 'P', 'K', 'pH', 'rainfall']
+
+# Below this confidence (%) the water-based rule is recommended instead of the model's crop
+CONFIDENCE_THRESHOLD = 90.0
+
+# Manual soil input has no rainfall; it is estimated from the moisture % as rainfall = moisture * 20
+MOISTURE_TO_RAINFALL = 20
+
+# Anything recommend_batch accepts: a DataFrame, a 2-D array in FEATURE_COLUMNS
+# order, or an iterable of dicts keyed by column or of sequences in that order
+BatchRows = Union[pd.DataFrame, np.ndarray, Iterable[Any]]
+
+def water_based_crops(rainfall, temperature, humidity) -> np.ndarray:
+    """Water-availability fallback crop for whole arrays of conditions at once"""
+    rainfall, temperature, humidity = (np.asarray(values, dtype=float) for values in (rainfall, temperature, humidity))
+    hot, warm = temperature > 30, temperature > 25
+    dry = (rainfall < 600) | (humidity < 50)
+    # Drought-resistant crops when water is short, water-loving ones otherwise
+    return np.where(dry,
+                    np.select([hot, warm], ['millet', 'cotton'], 'barley'),
+                    np.select([hot, warm], ['rice', 'maize'], 'wheat'))
+
+def batch_frame(rows: BatchRows) -> pd.DataFrame:
+    """rows as a DataFrame with float FEATURE_COLUMNS, keeping any other columns (farm name, ...)
+
+    Column names are matched case-insensitively, and a Moisture column stands
+    in for a missing rainfall one. Raises ValueError naming missing columns
+    or rows with non-numeric values.
+    """
+    if isinstance(rows, pd.DataFrame):
+        frame = rows.copy()
+    elif isinstance(rows, np.ndarray):
+        frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    else:
+        rows = list(rows)
+        if rows and isinstance(rows[0], Mapping):
+            frame = pd.DataFrame(rows)
+        else:
+            frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+    canonical = {name.lower(): name for name in FEATURE_COLUMNS + ['Moisture']}
+    frame = frame.rename(columns=lambda name: canonical.get(str(name).strip().lower(), name))
+    if 'rainfall' not in frame.columns and 'Moisture' in frame.columns:
+        frame['rainfall'] = pd.to_numeric(frame['Moisture'], errors='coerce') * MOISTURE_TO_RAINFALL
+
+    missing = [name for name in FEATURE_COLUMNS if name not in frame.columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    for name in FEATURE_COLUMNS:
+        frame[name] = pd.to_numeric(frame[name], errors='coerce')
+    invalid = frame[FEATURE_COLUMNS].isna().any(axis=1)
+    if invalid.any():
+        raise ValueError(f"non-numeric or empty values in rows {', '.join(str(i + 1) for i in np.flatnonzero(invalid))}")
+    return frame
+
+def choose_crops(probabilities: np.ndarray, classes, rainfall, temperature, humidity):
+    """(crop, confidence %, source) arrays from model probabilities, falling back below CONFIDENCE_THRESHOLD"""
+    best = probabilities.argmax(axis=1)
+    confidence = probabilities[np.arange(len(best)), best] * 100
+    confident = confidence >= CONFIDENCE_THRESHOLD
+    water = water_based_crops(rainfall, temperature, humidity)
+    return (np.where(confident, np.asarray(classes)[best], water),
+            np.where(confident, confidence, CONFIDENCE_THRESHOLD),
+            np.where(confident, 'model', 'water'))
+
+def recommend_batch(model, rows: BatchRows) -> pd.DataFrame:
+    """Recommend a crop for every row with a single predict_proba pass
+
+    The model's crop is the argmax of its probabilities (what predict()
+    would return). Rows where that confidence is below CONFIDENCE_THRESHOLD
+    get the water-based crop instead, at CONFIDENCE_THRESHOLD, as the
+    single-farm recommendation does. Returns the rows (see batch_frame) with
+    recommended_crop, confidence (%) and source ('model' or 'water') added.
+    """
+    frame = batch_frame(rows)
+    if frame.empty:
+        return frame.assign(recommended_crop=pd.Series(dtype=object), confidence=pd.Series(dtype=float),
+                            source=pd.Series(dtype=object))
+
+    frame['recommended_crop'], frame['confidence'], frame['source'] = choose_crops(
+        model.predict_proba(frame[FEATURE_COLUMNS]), model.classes_,
+        frame['rainfall'], frame['temperature'], frame['humidity'])
+    return frame
+
+class PredictionCache:
+    """Thread-safe LRU of single-farm model probabilities keyed on quantized features.
+
+    Each feature is snapped to the nearest multiple of its ``resolution``
+    (0.5 °C, 1% humidity, 0.1 pH, ...) before the model sees it, so farms
+    whose inputs differ by less than that share one cell and one cached
+    prediction, and a result never depends on which farm in the cell came
+    first.
+
+    Entries are trusted for ``ttl`` seconds, and all of them are dropped when
+    a different model is passed in (a newly activated registry version).
+    """
+
+    def __init__(self, max_size: int = config.PREDICTION_CACHE_SIZE, ttl: float = config.PREDICTION_CACHE_TTL_SECONDS,
+                 resolution: Optional[Dict[str, float]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.resolution = dict(config.PREDICTION_CACHE_RESOLUTION if resolution is None else resolution)
+        self._entries = OrderedDict()
+        self._model = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def snap(self, features: Sequence[float]) -> tuple:
+        """(cell, the cell's centre as a row) for one FEATURE_COLUMNS-ordered row
+
+        Values after the FEATURE_COLUMNS ones, such as the enhanced model's
+        encoded water resource, are categories: they key the cell unchanged.
+        """
+        extra = tuple(float(value) for value in features[len(FEATURE_COLUMNS):])
+        cell = tuple(math.floor(float(value) / self.resolution[name] + 0.5)
+                     for name, value in zip(FEATURE_COLUMNS, features))
+        return cell + extra, [index * self.resolution[name] for name, index in zip(FEATURE_COLUMNS, cell)] + list(extra)
+
+    def predict_proba(self, model, features: Sequence[float], now: Optional[float] = None) -> np.ndarray:
+        """The model's class probabilities for the cell a row falls in
+
+        The row is FEATURE_COLUMNS-ordered; a model trained on more columns
+        (its feature_names_in_) takes the rest after them.
+        """
+        return self.lookup(model, features, now)[0]
+
+    def lookup(self, model, features: Sequence[float], now: Optional[float] = None) -> Tuple[np.ndarray, bool]:
+        """predict_proba's probabilities and whether this call found them in the cache"""
+        now = time.time() if now is None else now
+        key, snapped = self.snap(features)
+        with self._lock:
+            if model is not self._model:
+                self._entries.clear()
+                self._model = model
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], True
+            self.misses += 1
+
+        columns = FEATURE_COLUMNS if len(snapped) == len(FEATURE_COLUMNS) else list(model.feature_names_in_)
+        probabilities = model.predict_proba(pd.DataFrame([snapped], columns=columns))[0]
+        probabilities.flags.writeable = False
+        with self._lock:
+            if model is self._model:
+                self._entries[key] = (probabilities, now)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return probabilities, False
+
+    def recommend(self, model, features: Sequence[float], now: Optional[float] = None) -> Dict[str, Any]:
+        """recommended_crop, confidence and source for one row, as recommend_batch gives them for its cell"""
+        probabilities = self.predict_proba(model, features, now)
+        _, snapped = self.snap(features)
+        temperature, humidity, rainfall = (snapped[FEATURE_COLUMNS.index(name)]
+                                           for name in ('temperature', 'humidity', 'rainfall'))
+        crop, confidence, source = choose_crops(probabilities[np.newaxis, :], model.classes_,
+                                                rainfall, temperature, humidity)
+        return {'recommended_crop': crop[0], 'confidence': float(confidence[0]), 'source': source[0]}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,62 @@
+from typing import Any, Dict, Tuple
+
+# Typical soil and annual rainfall (mm) around each city, matched by name
+# in the location the farmer types
+CITY_SOIL_PROFILES = {
+    'mumbai': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.5, 'rainfall': 2200, 'soil_type': 'Clayey', 'organic_matter': 3.0, 'drainage': 'Moderate'},
+    'delhi': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650, 'soil_type': 'Sandy-loam', 'organic_matter': 2.0, 'drainage': 'Well-drained'},
+    'hyderabad': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.8, 'rainfall': 800, 'soil_type': 'Red soil', 'organic_matter': 2.8, 'drainage': 'Well-drained'},
+    'chennai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.3, 'rainfall': 1400, 'soil_type': 'Sandy', 'organic_matter': 2.2, 'drainage': 'Excellent'},
+    'bangalore': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.0, 'rainfall': 900, 'soil_type': 'Red soil', 'organic_matter': 3.5, 'drainage': 'Well-drained'},
+    'kolkata': {'N': 100, 'P': 60, 'K': 80, 'pH': 6.2, 'rainfall': 1600, 'soil_type': 'Alluvial', 'organic_matter': 4.0, 'drainage': 'Poor'},
+    'pune': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 700, 'soil_type': 'Black soil', 'organic_matter': 2.5, 'drainage': 'Moderate'},
+    'ahmedabad': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.5, 'rainfall': 550, 'soil_type': 'Sandy', 'organic_matter': 1.8, 'drainage': 'Excellent'},
+    'jaipur': {'N': 65, 'P': 25, 'K': 45, 'pH': 7.8, 'rainfall': 450, 'soil_type': 'Sandy', 'organic_matter': 1.5, 'drainage': 'Excellent'},
+    'lucknow': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.5, 'rainfall': 1000, 'soil_type': 'Alluvial', 'organic_matter': 3.2, 'drainage': 'Moderate'},
+    'kanpur': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.8, 'rainfall': 850, 'soil_type': 'Alluvial', 'organic_matter': 2.8, 'drainage': 'Well-drained'},
+    'nagpur': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.9, 'rainfall': 1200, 'soil_type': 'Black soil', 'organic_matter': 2.6, 'drainage': 'Moderate'},
+    'indore': {'N': 75, 'P': 35, 'K': 55, 'pH': 7.0, 'rainfall': 950, 'soil_type': 'Black soil', 'organic_matter': 2.4, 'drainage': 'Well-drained'},
+    'bhopal': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.6, 'rainfall': 1150, 'soil_type': 'Black soil', 'organic_matter': 2.7, 'drainage': 'Well-drained'},
+    'visakhapatnam': {'N': 90, 'P': 50, 'K': 70, 'pH': 6.2, 'rainfall': 1100, 'soil_type': 'Red soil', 'organic_matter': 2.9, 'drainage': 'Well-drained'},
+    'vijayawada': {'N': 95, 'P': 55, 'K': 75, 'pH': 6.4, 'rainfall': 950, 'soil_type': 'Alluvial', 'organic_matter': 3.1, 'drainage': 'Well-drained'},
+    'coimbatore': {'N': 85, 'P': 45, 'K': 65, 'pH': 6.1, 'rainfall': 650, 'soil_type': 'Red soil', 'organic_matter': 2.3, 'drainage': 'Well-drained'},
+    'madurai': {'N': 80, 'P': 40, 'K': 60, 'pH': 6.0, 'rainfall': 850, 'soil_type': 'Black soil', 'organic_matter': 2.1, 'drainage': 'Moderate'},
+    'nashik': {'N': 75, 'P': 35, 'K': 55, 'pH': 6.8, 'rainfall': 600, 'soil_type': 'Black soil', 'organic_matter': 2.2, 'drainage': 'Well-drained'},
+    'vadodara': {'N': 70, 'P': 30, 'K': 50, 'pH': 7.3, 'rainfall': 900, 'soil_type': 'Alluvial', 'organic_matter': 2.4, 'drainage': 'Well-drained'},
+}
+
+# Regional defaults for other towns: name -> (towns in the region, profile)
+REGIONAL_SOIL_PROFILES = {
+    'maharashtra': (['mumbai', 'pune', 'nashik', 'kolhapur'],
+                    {'N': 85, 'P': 45, 'K': 65, 'pH': 6.7, 'rainfall': 800, 'soil_type': 'Black soil', 'organic_matter': 2.5, 'drainage': 'Moderate'}),
+    'ncr': (['delhi', 'gurgaon', 'noida', 'faridabad'],
+            {'N': 75, 'P': 35, 'K': 55, 'pH': 7.2, 'rainfall': 650, 'soil_type': 'Sandy-loam', 'organic_matter': 2.0, 'drainage': 'Well-drained'}),
+    'andhra_telangana': (['hyderabad', 'vijayawada', 'visakhapatnam', 'warangal'],
+                         {'N': 90, 'P': 50, 'K': 70, 'pH': 6.6, 'rainfall': 900, 'soil_type': 'Red soil', 'organic_matter': 2.8, 'drainage': 'Well-drained'}),
+    'tamil_nadu': (['chennai', 'coimbatore', 'madurai', 'salem'],
+                   {'N': 80, 'P': 40, 'K': 60, 'pH': 6.2, 'rainfall': 1000, 'soil_type': 'Red soil', 'organic_matter': 2.3, 'drainage': 'Well-drained'}),
+    'karnataka': (['bangalore', 'mysore', 'hubli', 'mangalore'],
+                  {'N': 90, 'P': 50, 'K': 70, 'pH': 6.4, 'rainfall': 850, 'soil_type': 'Red soil', 'organic_matter': 3.0, 'drainage': 'Well-drained'}),
+}
+
+# Moderate N/P/K, slightly acidic to neutral pH, average rainfall
+DEFAULT_SOIL_PROFILE = {'N': 80, 'P': 40, 'K': 60, 'pH': 6.5, 'rainfall': 800, 'soil_type': 'Loamy', 'organic_matter': 2.5,
+                        'drainage': 'Well-drained'}
+
+def all_soil_profiles() -> Dict[str, Dict[str, Any]]:
+    """Every profile soil_profile can return, by name, in a fixed order"""
+    profiles = dict(CITY_SOIL_PROFILES)
+    profiles.update((name, profile) for name, (_, profile) in REGIONAL_SOIL_PROFILES.items())
+    profiles['default'] = DEFAULT_SOIL_PROFILE
+    return profiles
+
+def soil_profile(location: str) -> Tuple[str, Dict[str, Any]]:
+    """(profile name, soil profile) for a location: its city's, else its region's, else the default"""
+    location_lower = location.lower()
+    for city, profile in CITY_SOIL_PROFILES.items():
+        if city in location_lower:
+            return city, dict(profile)
+    for region, (towns, profile) in REGIONAL_SOIL_PROFILES.items():
+        if any(town in location_lower for town in towns):
+            return region, dict(profile)
+    return 'default', dict(DEFAULT_SOIL_PROFILE)
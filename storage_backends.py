@@ -0,0 +1,153 @@
+import re
+import sqlite3
+from typing import Any, Dict, Optional
+
+class SQLiteBackend:
+    """A SQLite database file: one writer at a time, on one node"""
+
+    name = 'sqlite'
+    dbapi = sqlite3
+
+    def __init__(self, path: str, pragmas: Optional[Dict[str, Any]] = None, timeout: float = 30.0):
+        self.path = path
+        self.pragmas = dict(pragmas or {})
+        self.timeout = timeout
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply the per-connection PRAGMAs once"""
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+class PostgresBackend:
+    """A PostgreSQL server shared by every app replica (needs psycopg2)
+
+    Connections are wrapped so DatabaseManager's SQL and transaction handling
+    work unchanged: see PostgresConnection.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        import psycopg2
+        import psycopg2.extras
+        self.dbapi = psycopg2
+        self.url = url
+        self.timeout = timeout
+
+    def connect(self) -> 'PostgresConnection':
+        raw = self.dbapi.connect(self.url, connect_timeout=max(1, int(self.timeout)))
+        raw.autocommit = True  # transactions are opened by PostgresCursor, as sqlite3 does
+        with raw.cursor() as cursor:
+            # CURRENT_TIMESTAMP defaults store UTC, like SQLite
+            cursor.execute("SET TIME ZONE 'UTC'")
+        return PostgresConnection(raw, self.dbapi)
+
+# Tokens of a statement that matter when rewriting it for psycopg2: string
+# literals and quoted identifiers are kept as they are
+SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\?|%")
+SQL_WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+SQL_BEGIN = re.compile(r'\s*BEGIN(\s+IMMEDIATE)?\s*$', re.IGNORECASE)
+SQL_ROLLBACK = re.compile(r'\s*ROLLBACK\b', re.IGNORECASE)
+
+def to_pyformat(sql: str) -> str:
+    """Rewrite qmark placeholders (?) as psycopg2's %s, escaping literal %"""
+    return SQL_TOKENS.sub(lambda m: '%s' if m.group() == '?' else '%%' if m.group() == '%' else m.group(), sql)
+
+def to_pg_param(value: Any) -> Any:
+    # Flags such as is_active are INTEGER columns, as they are in SQLite
+    return int(value) if isinstance(value, bool) else value
+
+class PostgresConnection:
+    """sqlite3-style wrapper around an autocommit psycopg2 connection
+
+    - ``?`` placeholders and ``BEGIN IMMEDIATE`` are accepted (the latter
+      opens a plain transaction; row locks taken by UPDATE do the rest)
+    - like sqlite3, a transaction is opened implicitly before INSERT,
+      UPDATE and DELETE and lasts until commit() or rollback()
+    - a transaction left aborted by an error is rolled back before the next
+      statement, since PostgreSQL refuses to run anything else in it
+    """
+
+    def __init__(self, raw, dbapi):
+        self.raw = raw
+        self.dbapi = dbapi
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.raw.get_transaction_status() != self.dbapi.extensions.TRANSACTION_STATUS_IDLE
+
+    def _prepare(self, cursor, sql: str):
+        """Run the implicit ROLLBACK/BEGIN a statement needs and return its psycopg2 form"""
+        extensions = self.dbapi.extensions
+        status = self.raw.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_INERROR and not SQL_ROLLBACK.match(sql):
+            cursor.execute('ROLLBACK')
+            status = extensions.TRANSACTION_STATUS_IDLE
+        if SQL_BEGIN.match(sql):
+            return 'BEGIN'
+        if status == extensions.TRANSACTION_STATUS_IDLE and SQL_WRITE.match(sql):
+            cursor.execute('BEGIN')
+        return sql
+
+    def cursor(self) -> 'PostgresCursor':
+        return PostgresCursor(self)
+
+    def execute(self, sql: str, params=None) -> 'PostgresCursor':
+        cursor = self.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def executemany(self, sql: str, seq_of_params) -> 'PostgresCursor':
+        cursor = self.cursor()
+        cursor.executemany(sql, seq_of_params)
+        return cursor
+
+    def commit(self):
+        if self.in_transaction:
+            with self.raw.cursor() as cursor:
+                cursor.execute('COMMIT')
+
+    def rollback(self):
+        if self.in_transaction:
+            with self.raw.cursor() as cursor:
+                cursor.execute('ROLLBACK')
+
+    def close(self):
+        self.raw.close()
+
+class PostgresCursor:
+    """sqlite3-style cursor for PostgresConnection (adds lastrowid)"""
+
+    def __init__(self, connection: PostgresConnection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+
+    def execute(self, sql: str, params=None) -> 'PostgresCursor':
+        sql = self.connection._prepare(self._cursor, sql)
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(to_pyformat(sql), [to_pg_param(value) for value in params])
+        return self
+
+    def executemany(self, sql: str, seq_of_params) -> 'PostgresCursor':
+        sql = self.connection._prepare(self._cursor, sql)
+        rows = [[to_pg_param(value) for value in params] for params in seq_of_params]
+        self.connection.dbapi.extras.execute_batch(self._cursor, to_pyformat(sql), rows, page_size=500)
+        return self
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        """Id generated by the last INSERT on this connection"""
+        with self.connection.raw.cursor() as cursor:
+            cursor.execute('SELECT lastval()')
+            return cursor.fetchone()[0]
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        # description, rowcount, fetchone, fetchall, fetchmany, close
+        return getattr(self._cursor, name)
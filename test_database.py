@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Tests for the marketplace database layer
+"""
+
+import asyncio
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from async_database import AsyncDatabaseManager
+from database import SCHEMA_VERSION, DatabaseManager
+
+def temp_db_path():
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='test_')
+    os.close(fd)
+    os.remove(path)
+    return path
+
+def remove_db(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def run_reader_writer_stress(storage_profile, readers=4, listings=500, duration=1.5, busy_timeout=20):
+    """Hammer get_crop_listings from several threads while one thread writes offers.
+
+    A short busy_timeout is used for every profile so lock contention shows
+    up as "database is locked" errors instead of silent waiting.
+    """
+    path = temp_db_path()
+    db = DatabaseManager(path, pool_size=readers + 1, storage_profile=storage_profile,
+                         pragmas={'busy_timeout': busy_timeout})
+    buyer = db.get_user_by_email("buyer1@test.com")
+    farmer = db.get_user_by_email("farmer1@test.com")
+    # Enough listings that each read holds its shared lock for a while
+    with db.connection() as conn:
+        conn.executemany('''
+            INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, location)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(farmer['id'], 'wheat', 100, 20.0, 'Stress Village')] * listings)
+        conn.commit()
+    stop = threading.Event()
+    stats = {'reads': 0, 'read_locked': 0, 'writes': 0, 'write_locked': 0}
+    lock = threading.Lock()
+
+    def reader():
+        reads = locked = 0
+        while not stop.is_set():
+            try:
+                db.get_crop_listings()
+                reads += 1
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+        with lock:
+            stats['reads'] += reads
+            stats['read_locked'] += locked
+
+    def writer():
+        while not stop.is_set():
+            try:
+                with db.connection() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany('''
+                        INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', [(buyer['id'], 1, 'wheat', 20.0, 100)] * 50)
+                    conn.commit()
+                stats['writes'] += 1
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                stats['write_locked'] += 1
+            time.sleep(0.002)
+
+    try:
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        db.close()
+        remove_db(path)
+
+    stats['reads_per_sec'] = stats['reads'] / duration
+    return stats
+
+def test_wal_profile_reduces_lock_errors():
+    """Concurrent readers/writer: rollback journal vs WAL profile"""
+    print("🔒 Reader/writer stress test")
+    results = {profile: run_reader_writer_stress(profile) for profile in ('default', 'wal')}
+    for profile, stats in results.items():
+        print(f"   {profile:<8} reads/s={stats['reads_per_sec']:>8.0f}  "
+              f"locked reads={stats['read_locked']:>5}  writes={stats['writes']:>5}  "
+              f"locked writes={stats['write_locked']:>3}")
+
+    assert results['wal']['read_locked'] == 0
+    assert results['wal']['read_locked'] <= results['default']['read_locked']
+    assert results['wal']['reads'] > 0
+
+def test_wal_profile_pragmas_applied():
+    """Every pooled connection gets the configured storage profile"""
+    path = temp_db_path()
+    db = DatabaseManager(path, storage_profile='wal')
+    try:
+        with db.connection() as conn:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+            assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2  # MEMORY
+    finally:
+        db.close()
+        remove_db(path)
+
+PLAN_TEST_ROWS = int(os.getenv('PLAN_TEST_ROWS', 1000000))
+
+# Read methods that return a whole table by design; every other read must
+# be served by an index.
+FULL_TABLE_READS = {
+    'get_buyer_offers()',
+    'get_offers_by_status()',
+    'get_all_users()',
+    'get_all_transactions()',
+}
+
+# Keyset cursor for a page somewhere in the middle of a table
+LAST_CURSOR = ('9999-12-31 00:00:00', 1 << 62)
+
+def fill_tables(db, rows):
+    """Bulk-fill users, listings, offers and transactions with `rows` rows each"""
+    with db.connection() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+            INSERT INTO users (name, email, password_hash, role, phone, address)
+            SELECT 'User ' || x, 'user' || x || '@plan.test', 'x',
+                   CASE x % 3 WHEN 0 THEN 'farmer' WHEN 1 THEN 'buyer' ELSE 'agent' END,
+                   '+91' || x, 'Plan Village'
+            FROM n
+        ''', (rows,))
+        conn.execute('''
+            WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+            INSERT INTO crop_listings (farmer_id, crop_name, quantity, expected_price, location, status, agent_id)
+            SELECT x % 10000 + 1, 'wheat', 100, 20.0, 'Plan Village',
+                   CASE x % 4 WHEN 0 THEN 'sold' ELSE 'available' END, x % 50 + 1
+            FROM n
+        ''', (rows,))
+        conn.execute('''
+            WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+            INSERT INTO buyer_offers (buyer_id, crop_listing_id, crop_name, offer_price, quantity_wanted, status)
+            SELECT x % 10000 + 1, x, 'wheat', 20.0, 10,
+                   CASE x % 3 WHEN 0 THEN 'accepted' WHEN 1 THEN 'pending' ELSE 'rejected' END
+            FROM n
+        ''', (rows,))
+        conn.execute('''
+            WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+            INSERT INTO transactions (buyer_id, farmer_id, crop_listing_id, crop_name, quantity, price_per_unit, total_amount)
+            SELECT x % 10000 + 1, x % 10000 + 2, x, 'wheat', 10, 20.0, 200.0
+            FROM n
+        ''', (rows,))
+        conn.commit()
+
+def traced_statements(db, call):
+    """Return the SQL a DatabaseManager call issues, without running it to completion"""
+    statements = []
+    with db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        conn.set_progress_handler(lambda: 1, 1)  # interrupt right after the statement starts
+        try:
+            call()
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.set_progress_handler(None, 1)
+            conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+def full_scans(conn, sql):
+    """Plan steps of `sql` that walk a whole table or index (an FTS5 MATCH lookup is fine)"""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return [row[3] for row in plan if row[3].startswith('SCAN ') and not re.search(r'VIRTUAL TABLE INDEX \d+:M', row[3])]
+
+def test_read_methods_use_indexes():
+    """EXPLAIN QUERY PLAN regression: no full-table scans on indexed read paths"""
+    print(f"🔎 Query plans at {PLAN_TEST_ROWS:,} rows per table")
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        fill_tables(db, PLAN_TEST_ROWS)
+        calls = {
+            'authenticate_user(email, password)': lambda: db.authenticate_user('user7@plan.test', 'x'),
+            'get_user_by_email(email)': lambda: db.get_user_by_email('user7@plan.test'),
+            'get_user_by_id(id)': lambda: db.get_user_by_id(7),
+            'get_crop_listings()': db.get_crop_listings,
+            'get_farmer_listings(farmer_id)': lambda: db.get_farmer_listings(3),
+            'get_agent_listings(agent_id)': lambda: db.get_agent_listings(2),
+            'get_buyer_offers(buyer_id)': lambda: db.get_buyer_offers(4),
+            'get_buyer_offers()': db.get_buyer_offers,
+            'get_offers_for_farmer(farmer_id)': lambda: db.get_offers_for_farmer(3),
+            'get_offers_for_agent(agent_id)': lambda: db.get_offers_for_agent(2),
+            'get_offers_by_status(status)': lambda: db.get_offers_by_status('pending'),
+            'get_offers_by_status()': db.get_offers_by_status,
+            'get_offer_details(offer_id)': lambda: db.get_offer_details(5),
+            'get_all_users()': db.get_all_users,
+            'get_all_transactions()': db.get_all_transactions,
+            'get_dashboard_stats()': db.get_dashboard_stats,
+            'get_crop_listings_page()': lambda: db.get_crop_listings_page(after=LAST_CURSOR),
+            'get_agent_listings_page(agent_id)': lambda: db.get_agent_listings_page(2, after=LAST_CURSOR),
+            'get_buyer_offers_page(buyer_id)': lambda: db.get_buyer_offers_page(4, after=LAST_CURSOR),
+            'get_buyer_offers_page()': lambda: db.get_buyer_offers_page(after=LAST_CURSOR),
+            'get_offers_by_status_page(status)': lambda: db.get_offers_by_status_page('pending', after=LAST_CURSOR),
+            'get_offers_by_status_page()': lambda: db.get_offers_by_status_page(after=LAST_CURSOR),
+            'get_all_users_page()': lambda: db.get_all_users_page(after=LAST_CURSOR),
+            'search_listings(query)': lambda: db.search_listings('wheat village', cursor=(-1e9, 0)),
+            'search_listings(query, filters)': lambda: db.search_listings('wheat', {'status': None, 'max_price': 50}),
+        }
+        
+        failures = []
+        with db.connection() as conn:
+            for name, call in calls.items():
+                statements = traced_statements(db, call)
+                assert statements, f"{name} issued no SELECT"
+                scans = [scan for sql in statements for scan in full_scans(conn, sql)]
+                if name in FULL_TABLE_READS:
+                    print(f"   ➖ {name}: whole-table read")
+                elif scans:
+                    print(f"   ❌ {name}: {'; '.join(scans)}")
+                    failures.append(name)
+                else:
+                    print(f"   ✅ {name}")
+        
+        assert not failures, f"Full-table scans in: {', '.join(failures)}"
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_keyset_pages_cover_every_row_once():
+    """Walking the pages returns the same rows, in order, as the full list"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        fill_tables(db, 95)  # rows share created_at, so the id tie-break matters
+        for full, fetch_page in (
+            (db.get_crop_listings(), lambda after: db.get_crop_listings_page(limit=10, after=after)),
+            (db.get_offers_by_status('pending'), lambda after: db.get_offers_by_status_page('pending', limit=10, after=after)),
+            (db.get_buyer_offers(), lambda after: db.get_buyer_offers_page(limit=10, after=after)),
+            (db.get_all_users(), lambda after: db.get_all_users_page(limit=10, after=after)),
+        ):
+            paged, after = [], None
+            while True:
+                page, after = fetch_page(after)
+                assert len(page) <= 10
+                paged.extend(page)
+                if after is None:
+                    break
+            
+            assert sorted(row['id'] for row in paged) == sorted(row['id'] for row in full)
+            assert len({row['id'] for row in paged}) == len(paged)
+            assert [(row['created_at'], row['id']) for row in paged] == sorted(
+                ((row['created_at'], row['id']) for row in paged), reverse=True)
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_accept_offer_never_oversells():
+    """Offers beyond the remaining quantity are refused; the last one marks the listing sold"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        farmer = db.get_user_by_email("farmer1@test.com")
+        buyer = db.get_user_by_email("buyer1@test.com")
+        listing_id = db.create_crop_listing(farmer['id'], 'wheat', 100, 20.0)
+        offer_ids = [db.create_buyer_offer(buyer['id'], listing_id, 'wheat', 21.0, quantity)
+                     for quantity in (60, 60, 40)]
+
+        assert db.accept_offer(offer_ids[0])
+        assert not db.accept_offer(offer_ids[0])  # no longer pending
+        assert not db.accept_offer(offer_ids[1])  # only 40 left
+        assert db.accept_offer(offer_ids[2])
+
+        with db.connection() as conn:
+            quantity, status = conn.execute('SELECT quantity, status FROM crop_listings WHERE id = ?',
+                                            (listing_id,)).fetchone()
+            sold = conn.execute('SELECT SUM(quantity) FROM transactions WHERE crop_listing_id = ?',
+                                (listing_id,)).fetchone()[0]
+        assert (quantity, status, sold) == (0, 'sold', 100)
+        assert db.get_offer_details(offer_ids[1])['status'] == 'pending'
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_bulk_import_reports_bad_rows_and_round_trips():
+    """Bulk imports skip bad rows with their line numbers; exports re-import cleanly"""
+    path = temp_db_path()
+    export_dir = tempfile.mkdtemp()
+    db = DatabaseManager(path)
+    try:
+        report = db.bulk_create_users([
+            ('Village Farmer', 'village1@test.com', 'pw', 'farmer'),
+            ('Duplicate', 'farmer1@test.com', 'pw', 'farmer'),
+            ('No Admins', 'boss@test.com', 'pw', 'admin'),
+        ], chunk_size=2)
+        assert report['inserted'] == 1
+        assert [error['row'] for error in report['errors']] == [2, 3]
+        farmer_id = db.get_user_by_email('village1@test.com')['id']
+
+        csv_path = os.path.join(export_dir, 'listings.csv')
+        with open(csv_path, 'w', newline='') as f:
+            f.write('farmer_id,crop_name,quantity,expected_price,location\n')
+            for i in range(25):
+                f.write(f'{farmer_id},wheat,{i + 1},20,Village\n')
+            f.write(f'{farmer_id},rice,-5,20,Village\n')  # line 27
+            f.write(f'abc,rice,5,20,Village\n')  # line 28
+        report = db.bulk_create_listings(csv_path, agent_id=2, chunk_size=10)
+        assert report['inserted'] == 25
+        assert [error['row'] for error in report['errors']] == [27, 28]
+        assert len(db.get_agent_listings(2)) == 25
+
+        for name in ('listings.csv', 'listings.xlsx'):
+            export_path = os.path.join(export_dir, name)
+            exported = db.export_listings(export_path, chunk_size=7)
+            copy_path = temp_db_path()
+            copy = DatabaseManager(copy_path)
+            try:
+                before = len(copy.get_crop_listings())
+                report = copy.bulk_create_listings(export_path)
+                assert report == {'inserted': exported, 'errors': []}
+                assert len(copy.get_crop_listings()) == before + len(db.get_crop_listings())
+            finally:
+                copy.close()
+                remove_db(copy_path)
+    finally:
+        db.close()
+        remove_db(path)
+        shutil.rmtree(export_dir)
+
+def test_dashboard_counters_track_every_write():
+    """Trigger-maintained counters match a full recount after mixed writes"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        farmer = db.get_user_by_email("farmer1@test.com")
+        buyer = db.get_user_by_email("buyer1@test.com")
+        db.bulk_create_users([(f'Farmer {i}', f'counter{i}@test.com', 'pw', 'farmer') for i in range(20)])
+        db.update_user_status(buyer['id'], False)
+        db.bulk_create_listings([(farmer['id'], 'wheat', 50, 20.0)] * 30)
+        listing_id = db.create_crop_listing(farmer['id'], 'rice', 10, 30.0)
+        db.update_crop_listing_status(listing_id, 'cancelled')
+        offer_id = db.create_buyer_offer(buyer['id'], listing_id - 1, 'wheat', 21.5, 50)
+        db.accept_offer(offer_id)  # sells the listing out
+        db.create_transaction(buyer['id'], farmer['id'], listing_id - 2, 'wheat', 5, 19.75, 98.75)
+        with db.connection() as conn:
+            conn.execute("UPDATE users SET role = 'agent' WHERE email = 'counter0@test.com'")
+            conn.execute("DELETE FROM crop_listings WHERE id = ?", (listing_id - 3,))
+            conn.commit()
+
+        stats = db.get_dashboard_stats()
+        assert stats['total_transactions'] == 2
+        assert stats['total_transaction_value'] == 21.5 * 50 + 98.75
+        assert db.reconcile_dashboard_counters() == {}
+        assert db.get_dashboard_stats() == stats
+
+        # Drift from writes made with the triggers bypassed is repaired
+        with db.connection() as conn:
+            conn.execute('UPDATE dashboard_counters SET active_listings = active_listings + 7')
+            conn.commit()
+        assert db.reconcile_dashboard_counters() == {'active_listings': -7}
+        assert db.get_dashboard_stats() == stats
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_records_and_frames_match_the_columns_selected():
+    """Read methods return read-only mappings keyed by the SELECT; frame pages hold the same rows"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        fill_tables(db, 45)
+        user = db.get_user_by_email('farmer1@test.com')
+        assert dict(user) == {'id': user['id'], 'name': 'Ramesh Kumar', 'email': 'farmer1@test.com', 'role': 'farmer',
+                              'phone': '+919876543210', 'address': 'Village Ramgarh, Rajasthan', 'is_active': 1}
+        assert user.get('password_hash') is None and 'password_hash' not in user
+        assert pickle.loads(pickle.dumps(user)) == user
+
+        records, record_cursor = db.get_crop_listings_page(limit=10)
+        frame, frame_cursor = db.get_crop_listings_page(limit=10, as_frame=True)
+        assert frame_cursor == record_cursor
+        assert list(frame.columns) == list(records[0])
+        assert frame.to_dict('records') == [dict(record) for record in records]
+
+        empty, _ = db.get_all_users_page(after=('0000-01-01', 0), as_frame=True)
+        assert empty.empty and 'email' in empty.columns
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_search_listings_follows_writes_and_pages():
+    """The FTS index tracks listing writes; ranked pages cover every match once"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        farmer = db.get_user_by_email("farmer2@test.com")
+        db.bulk_create_listings([(farmer['id'], 'brinjal', 10 + i, 30.0 + i, 'Hybrid brinjal' if i % 2 else 'Desi',
+                                  'Khetri, Haryana') for i in range(35)])
+        search = lambda query, filters=None: [row['id'] for row in db.search_listings(query, filters, limit=100)[0]]
+
+        brinjals = search('brin')
+        assert len(brinjals) == 35
+        assert len(search('hybrid BRINJAL')) == 17
+        assert search('sunita cotton') == [row['id'] for row in db.get_farmer_listings(farmer['id'])
+                                           if row['crop_name'] == 'cotton']  # account name of the farmer
+        assert len(search('brinjal', {'min_price': 60})) == 5
+        assert search('brinjal "unbalanced') == [] and search('   ') == []
+
+        db.update_crop_listing_status(brinjals[0], 'sold')
+        assert brinjals[0] not in search('brinjal') and brinjals[0] in search('brinjal', {'status': None})
+        with db.connection() as conn:
+            conn.execute("UPDATE crop_listings SET description = 'Purple brinjal' WHERE id = ?", (brinjals[1],))
+            conn.execute("DELETE FROM crop_listings WHERE id = ?", (brinjals[2],))
+            conn.commit()
+        db.update_user_status(farmer['id'], True)  # untouched names stay indexed
+        with db.connection() as conn:
+            conn.execute("UPDATE users SET name = 'Sunita Rani' WHERE id = ?", (farmer['id'],))
+            conn.commit()
+        assert search('purple') == [brinjals[1]]
+        assert brinjals[2] not in search('brinjal', {'status': None})
+        assert len(search('rani')) == len(search('brinjal')) + 1 and search('sunita devi') == []
+
+        paged, cursor = [], None
+        while True:
+            page, cursor = db.search_listings('haryana', limit=4, cursor=cursor)
+            paged.extend(page)
+            if cursor is None:
+                break
+        assert [row['id'] for row in paged] == search('haryana')
+        assert [row['score'] for row in paged] == sorted(row['score'] for row in paged)
+    finally:
+        db.close()
+        remove_db(path)
+
+def test_sessions_survive_restarts_and_revocation():
+    """Sessions validate from any manager on the database; logout, expiry and deactivation end them"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    replica = DatabaseManager(path)  # another worker process on the same database
+    try:
+        farmer = db.get_user_by_email("farmer2@test.com")
+        token = db.create_session(farmer['id'])
+        assert dict(db.validate_session(token)) == dict(db.authenticate_user("farmer2@test.com", "farmer123"))
+        for _ in range(100):
+            db.validate_session(token)
+        assert db.session_cache.misses == 1 and db.session_cache.hits == 100
+        assert replica.validate_session(token)['id'] == farmer['id']
+
+        db.end_session(token)
+        assert db.validate_session(token) is None
+        replica.session_cache.ttl = 0  # as if SESSION_CACHE_TTL_SECONDS had passed
+        assert replica.validate_session(token) is None
+        assert db.validate_session('not-a-session-token') is None and db.validate_session('') is None
+
+        expired = db.create_session(farmer['id'], ttl=-1)
+        revoked = db.create_session(farmer['id'])
+        assert db.validate_session(expired) is None and db.validate_session(revoked)
+        db.update_user_status(farmer['id'], False)
+        assert db.validate_session(revoked) is None
+
+        db.update_user_status(farmer['id'], True)
+        for _ in range(5):
+            db.create_session(farmer['id'], ttl=-1)
+        assert db.sweep_expired_sessions(batch_size=2) == 5
+        with db.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0] == 0
+    finally:
+        replica.close()
+        db.close()
+        remove_db(path)
+
+def test_bootstrap_runs_once_and_is_idempotent():
+    """Only a database behind SCHEMA_VERSION is bootstrapped; re-running the bootstrap changes nothing"""
+    class CountingManager(DatabaseManager):
+        bootstraps = 0
+
+        def init_database(self):
+            CountingManager.bootstraps += 1
+            super().init_database()
+
+    path = temp_db_path()
+    try:
+        CountingManager(path).close()
+        db = CountingManager(path)
+        assert CountingManager.bootstraps == 1 and db.schema_version() == SCHEMA_VERSION
+        with db.connection() as conn:
+            counts = lambda: [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                              for table in ('users', 'crop_listings', 'schema_version')]
+            before = counts()
+            conn.execute("DELETE FROM schema_version WHERE version = ?", (SCHEMA_VERSION,))
+            conn.commit()
+            CountingManager(path).close()
+            assert CountingManager.bootstraps == 2 and counts() == before
+        db.close()
+    finally:
+        remove_db(path)
+
+def test_async_facade_serves_concurrent_requests_on_one_thread():
+    """Hundreds of concurrent awaits share one database thread and one connection"""
+    path = temp_db_path()
+    DatabaseManager(path).close()
+
+    async def scenario():
+        async with AsyncDatabaseManager(path) as db:
+            farmer = await db.run(db.db.get_user_by_email, "farmer1@test.com")
+            buyer = await db.run(db.db.get_user_by_email, "buyer1@test.com")
+            listing_id = await db.run(db.db.create_crop_listing, farmer['id'], 'wheat', 100, 20.0)
+            threads_before = threading.active_count()
+            offer_ids = await asyncio.gather(*[db.create_buyer_offer(buyer['id'], listing_id, 'wheat', 21.0, 1)
+                                               for _ in range(300)])
+            accepted = await asyncio.gather(*[db.accept_offer(offer_id) for offer_id in offer_ids])
+            listings, offers = await asyncio.gather(db.get_crop_listings('sold'), db.get_offers_for_farmer(farmer['id']))
+            assert threading.active_count() <= threads_before + 1
+            assert db.db.pool.connections_opened == 1
+        return accepted, listings, offers, listing_id
+
+    accepted, listings, offers, listing_id = asyncio.run(scenario())
+    try:
+        assert accepted.count(True) == 100
+        assert listing_id in [row['id'] for row in listings]
+        assert sum(row['status'] == 'accepted' for row in offers if row['crop_listing_id'] == listing_id) == 100
+    finally:
+        remove_db(path)
+
+def test_read_cache_serves_reads_until_their_tables_change():
+    """Cached reads skip the database until a write bumps a table they read"""
+    path = temp_db_path()
+    db = DatabaseManager(path)
+    try:
+        farmer = db.get_user_by_email("farmer1@test.com")
+        buyer = db.get_user_by_email("buyer1@test.com")
+        agent = db.get_user_by_email("agent@smartfarm.com")
+        statements = []
+        with db.connection() as conn:
+            conn.set_trace_callback(statements.append)
+            rerun = lambda: (db.get_crop_listings(), db.get_farmer_listings(farmer['id']),
+                             db.get_offers_for_agent(agent['id']))
+
+            listings = rerun()[0]
+            assert len(statements) == 3
+            for _ in range(10):
+                assert rerun()[0] == listings
+            assert len(statements) == 3 and db.read_cache.hits == 30 and db.read_cache.misses == 3
+
+            # Positional, keyword and default spellings of one call share an entry
+            assert db.get_crop_listings('available') == db.get_crop_listings(status='available') == listings
+            assert len(statements) == 3
+
+            listings.clear()  # callers get their own copy
+            assert db.get_crop_listings()
+            listing_id = db.create_crop_listing(farmer['id'], 'barley', 40, 18.0, agent_id=agent['id'])
+            assert listing_id in [row['id'] for row in db.get_crop_listings()]
+            offer_id = db.create_buyer_offer(buyer['id'], listing_id, 'barley', 19.0, 40)
+            assert [row['id'] for row in db.get_offers_for_agent(agent['id'])] == [offer_id]
+            assert db.accept_offer(offer_id)
+            assert db.get_offers_for_agent(agent['id'])[0]['status'] == 'accepted'
+            assert listing_id not in [row['id'] for row in db.get_crop_listings()]
+
+            conn.execute("UPDATE crop_listings SET status = 'cancelled'")  # bypasses the cache
+            conn.commit()
+            assert db.get_crop_listings()
+            db.read_cache.ttl = 0
+            assert db.get_crop_listings() == []
+            conn.set_trace_callback(None)
+        assert 0 < db.read_cache.hit_rate() < 1
+    finally:
+        db.close()
+        remove_db(path)
+
+if __name__ == "__main__":
+    test_keyset_pages_cover_every_row_once()
+    test_wal_profile_pragmas_applied()
+    test_accept_offer_never_oversells()
+    test_bulk_import_reports_bad_rows_and_round_trips()
+    test_dashboard_counters_track_every_write()
+    test_records_and_frames_match_the_columns_selected()
+    test_search_listings_follows_writes_and_pages()
+    test_sessions_survive_restarts_and_revocation()
+    test_bootstrap_runs_once_and_is_idempotent()
+    test_async_facade_serves_concurrent_requests_on_one_thread()
+    test_read_cache_serves_reads_until_their_tables_change()
+    test_wal_profile_reduces_lock_errors()
+    test_read_methods_use_indexes()
+    print("✅ Database tests passed")
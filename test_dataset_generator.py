@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized synthetic dataset generator
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+
+from dataset_generator import CLIP_RANGES, generate, generate_chunks, write_dataset
+from recommendations import FEATURE_COLUMNS
+
+def test_datasets_are_balanced_seeded_and_in_range():
+    """Any row count splits evenly across the crops; the same seed gives the same rows"""
+    df = generate('comprehensive', 1003, seed=5)
+    assert len(df) == 1003 and list(df.columns) == FEATURE_COLUMNS + ['crop']
+    assert sorted(df['crop'].value_counts().unique()) == [100, 101]
+    for name, (low, high) in CLIP_RANGES.items():
+        assert df[name].between(low, high).all()
+    pd.testing.assert_frame_equal(df, generate('comprehensive', 1003, seed=5))
+    assert not df.equals(generate('comprehensive', 1003, seed=6))
+
+    enhanced = generate('enhanced', 2000)
+    counts = enhanced.groupby(['crop', 'water_resource']).size()
+    assert counts[('rice', 'high')] == 200 and counts[('wheat', 'high')] == counts[('wheat', 'low')] == 100
+    assert ('rice', 'low') not in counts
+    wheat = enhanced[enhanced['crop'] == 'wheat'].groupby('water_resource')['rainfall']
+    assert wheat.max()['high'] > 800 and wheat.min()['low'] < 400  # 20% more or less rainfall
+
+    empty = generate('enhanced', 0)
+    assert empty.empty and list(empty.columns) == FEATURE_COLUMNS + ['water_resource', 'crop']
+    assert list(empty.dtypes[FEATURE_COLUMNS].unique()) == [float]
+    with pytest.raises(ValueError):
+        generate('tropical', 10)
+    with pytest.raises(ValueError):
+        generate('tropical', 0)
+
+def test_streamed_files_match_generated_rows():
+    """Chunks written to CSV or Parquet read back as the in-memory dataset"""
+    expected = generate('enhanced', 2500, seed=9, chunk_size=1000)
+    assert [len(chunk) for chunk in generate_chunks('enhanced', 2500, seed=9, chunk_size=1000)] == [1000, 1000, 500]
+    with tempfile.TemporaryDirectory() as directory:
+        for path, read in ((os.path.join(directory, 'data.csv'), pd.read_csv),
+                           (os.path.join(directory, 'data.parquet'), pd.read_parquet)):
+            assert write_dataset(path, 'enhanced', 2500, seed=9, chunk_size=1000) == 2500
+            pd.testing.assert_frame_equal(read(path), expected.reset_index(drop=True), check_exact=False)
+        with pytest.raises(ValueError):
+            write_dataset(os.path.join(directory, 'data.json'), 'enhanced', 10)
+
+if __name__ == "__main__":
+    test_datasets_are_balanced_seeded_and_in_range()
+    test_streamed_files_match_generated_rows()
+    print("✅ Dataset generator tests passed")
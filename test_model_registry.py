@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned model registry
+"""
+
+import os
+import pickle
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from model_registry import ModelRegistry
+from recommendations import FEATURE_COLUMNS
+from train_model import create_comprehensive_dataset
+from tree_engine import FlatForest, HybridForest
+
+def small_models():
+    df = create_comprehensive_dataset()
+    return [RandomForestClassifier(n_estimators=5, max_depth=depth, random_state=0).fit(df[FEATURE_COLUMNS], df['crop'])
+            for depth in (2, 12)]
+
+def test_publish_hot_swap_and_rollback():
+    """A published version reaches a running registry without a restart; rollback reuses the warm one"""
+    old_model, new_model = small_models()
+    rows = create_comprehensive_dataset()[FEATURE_COLUMNS].head(50)
+    with tempfile.TemporaryDirectory() as root:
+        publisher = ModelRegistry(root)
+        app = ModelRegistry(root, poll_interval=0)
+        assert app.get('crop') is None
+
+        assert publisher.publish('crop', old_model, metrics={'accuracy': 0.5}) == 'v1'
+        first = app.get('crop')
+        assert first.version == 'v1' and isinstance(first.model, HybridForest) and isinstance(first.model.flat, FlatForest)
+        assert first.features == FEATURE_COLUMNS and first.manifest['metrics'] == {'accuracy': 0.5}
+
+        assert publisher.publish('crop', new_model) == 'v2'
+        second = app.get('crop')
+        assert second.version == 'v2' and second.manifest['previous'] == 'v1'
+        assert np.array_equal(second.model.predict_proba(rows), new_model.predict_proba(rows))
+        # The pickled sklearn model is only read for a batch too large for the flat arrays
+        assert second.model._estimator is None
+        batch = create_comprehensive_dataset()[FEATURE_COLUMNS].head(second.model.max_flat_rows + 1)
+        assert np.array_equal(second.model.predict_proba(batch), new_model.predict_proba(batch))
+        assert second.model._estimator is not None
+
+        assert publisher.rollback('crop') == 'v1'
+        assert app.get('crop') is first
+        assert publisher.activate('crop', 'v2') and app.get('crop') is second
+        assert not publisher.activate('crop', 'v9')
+
+        # A corrupted artifact is refused and the running version kept
+        publisher.publish('crop', old_model, activate=False)
+        with open(os.path.join(root, 'crop', 'v3', 'forest', 'leaf_proba.npy'), 'r+b') as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b'tampered')
+        publisher.activate('crop', 'v3')
+        assert app.get('crop') is second
+        assert publisher.versions('crop') == ['v1', 'v2', 'v3']
+
+def test_model_and_encoder_load_as_one_bundle():
+    """Legacy pickles are imported as version 1, the encoder together with its model"""
+    model, _ = small_models()
+    encoder = LabelEncoder().fit(['high', 'low'])
+    with tempfile.TemporaryDirectory() as root:
+        for filename, obj in (('enhanced_crop_model.pkl', model), ('water_resource_encoder.pkl', encoder)):
+            with open(os.path.join(root, filename), 'wb') as f:
+                pickle.dump(obj, f)
+        registry = ModelRegistry(os.path.join(root, 'registry'), legacy_dir=root)
+        bundle = registry.get('enhanced')
+        assert bundle.version == 'v1' and bundle.manifest['metrics'] == {'imported_from': 'enhanced_crop_model.pkl'}
+        assert list(bundle.encoder.transform(['low', 'high'])) == [1, 0]
+        assert {'model', 'encoder', 'forest/leaf_proba.npy'} <= set(bundle.manifest['checksums'])
+        assert registry.get('crop') is None
+
+def test_rollback_undoes_activations_in_order():
+    """Rollback returns to the version active before the last activation, not the one published before"""
+    model, _ = small_models()
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(root)
+        assert registry.rollback('crop') is None
+        for _ in range(3):
+            registry.publish('crop', model)
+        assert registry.activate('crop', 'v1') and registry.rollback('crop') == 'v3'
+        assert registry.activate('crop', 'v2') and registry.rollback('crop') == 'v3'
+        # Rollbacks consume the history, so further ones walk back through the publishes
+        assert registry.history('crop') == ['v1', 'v2']
+        assert [registry.rollback('crop') for _ in range(3)] == ['v2', 'v1', None]
+        assert registry.current_version('crop') == 'v1'
+
+if __name__ == "__main__":
+    test_publish_hot_swap_and_rollback()
+    test_model_and_encoder_load_as_one_bundle()
+    test_rollback_undoes_activations_in_order()
+    print("✅ Model registry tests passed")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the precomputed recommendation grid
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_registry import ModelRegistry
+from recommendation_grid import RecommendationGrid, RecommendationGrids
+from recommendations import FEATURE_COLUMNS, recommend_batch
+from soil_profiles import soil_profile
+from train_model import create_comprehensive_dataset
+
+AXES = {'temperature': (10, 45, 5.0), 'humidity': (30, 95, 13), 'rainfall': (200, 2000, 300)}
+
+def train_model(seed):
+    df = create_comprehensive_dataset()
+    return RandomForestClassifier(n_estimators=10, max_depth=10, random_state=seed).fit(df[FEATURE_COLUMNS], df['crop'])
+
+def wait_for_grid(grids, version):
+    for _ in range(300):
+        grid = grids.get()
+        if grid is not None and grid.version == version:
+            return grid
+        time.sleep(0.1)
+    raise AssertionError(f"grid for {version} was never built")
+
+def test_grid_lookup_matches_recommend_batch():
+    """A lookup returns recommend_batch's answer at the nearest grid point of the location's soil profile"""
+    model = train_model(0)
+    grid = RecommendationGrid.build(model, 'v1', AXES)
+    assert grid.crop.shape == (26, 8, 6, 7)
+    assert [soil_profile(town)[0] for town in ('Pune', 'Kolhapur', 'Shimla')] == ['pune', 'maharashtra', 'default']
+
+    for location, temperature, humidity, rainfall in (('Pune', 27.6, 70, None), ('Kolhapur', 8, 99, 2500),
+                                                      ('Shimla', 31, 42, 640)):
+        _, profile = soil_profile(location)
+        point = [10 + 5 * min(max(round((temperature - 10) / 5), 0), 7), 30 + 13 * min(max(round((humidity - 30) / 13), 0), 5),
+                 profile['N'], profile['P'], profile['K'], profile['pH'],
+                 200 + 300 * min(max(round(((rainfall or profile['rainfall']) - 200) / 300), 0), 6)]
+        expected = recommend_batch(model, [point]).iloc[0]
+        result = grid.lookup(location, temperature, humidity, rainfall)
+        assert result['recommended_crop'] == expected['recommended_crop'] and result['source'] == expected['source']
+        assert np.isclose(result['confidence'], expected['confidence'], rtol=1e-6)
+
+    with tempfile.TemporaryDirectory() as directory:
+        grid.save(os.path.join(directory, 'grid.npz'))
+        loaded = RecommendationGrid.load(os.path.join(directory, 'grid.npz'))
+        assert loaded.version == 'v1' and loaded.lookup('Pune', 27.6, 70) == grid.lookup('Pune', 27.6, 70)
+
+def test_grids_follow_the_active_model_version():
+    """The grid is rebuilt in the background for a newly activated version, serving none meanwhile"""
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(os.path.join(root, 'registry'), poll_interval=0)
+        grids = RecommendationGrids(registry, os.path.join(root, 'grids'), axes=AXES)
+        assert grids.get() is None
+
+        registry.publish('crop', train_model(0))
+        wait_for_grid(grids, 'v1')
+        assert os.path.exists(grids.path('v1'))
+
+        registry.publish('crop', train_model(1))
+        assert grids.get() is None  # not the replaced version's grid while the new one builds
+        second = wait_for_grid(grids, 'v2')
+        assert second.lookup('Delhi', 25, 60) == RecommendationGrid.load(grids.path('v2')).lookup('Delhi', 25, 60)
+
+        # Rolling back finds the saved grid instead of building it again
+        registry.rollback('crop')
+        assert grids.get().version == 'v1'
+
+def test_failed_build_is_not_retried():
+    """A version whose grid fails to build is built once, not on every get()"""
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(os.path.join(root, 'registry'), poll_interval=0)
+        registry.publish('crop', train_model(0))
+        grids = RecommendationGrids(registry, os.path.join(root, 'grids'), axes=AXES)
+        builds = []
+
+        def build(bundle):
+            builds.append(bundle.version)
+            raise MemoryError("grid too large")
+
+        grids.build = build
+        for _ in range(20):
+            assert grids.get() is None
+            time.sleep(0.01)
+        assert builds == ['v1']
+
+if __name__ == "__main__":
+    test_grid_lookup_matches_recommend_batch()
+    test_grids_follow_the_active_model_version()
+    test_failed_build_is_not_retried()
+    print("✅ Recommendation grid tests passed")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for batch crop recommendations
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from recommendations import CONFIDENCE_THRESHOLD, FEATURE_COLUMNS, PredictionCache, recommend_batch
+from train_enhanced_model import create_enhanced_dataset, prepare_enhanced_data
+from train_model import create_comprehensive_dataset
+
+def train_data():
+    df = create_comprehensive_dataset()
+    return df[FEATURE_COLUMNS], df['crop']
+
+def train_small_model():
+    """A quick stand-in for crop_recommendation_model.pkl, trained the same way"""
+    return RandomForestClassifier(n_estimators=30, max_depth=15, random_state=42).fit(*train_data())
+
+def recommend_one(model, features):
+    """The one-farm-at-a-time path recommend_batch replaces"""
+    temperature, humidity, _, _, _, _, rainfall = features
+    input_features = pd.DataFrame([features], columns=FEATURE_COLUMNS)
+    confidence = max(model.predict_proba(input_features)[0]) * 100
+    if confidence >= 90:
+        return model.predict(input_features)[0], confidence
+    if rainfall < 600 or humidity < 50:
+        crop = 'millet' if temperature > 30 else 'cotton' if temperature > 25 else 'barley'
+    else:
+        crop = 'rice' if temperature > 30 else 'maize' if temperature > 25 else 'wheat'
+    return crop, 90.0
+
+def test_recommend_batch_matches_one_at_a_time():
+    """One vectorized pass gives the same crop and confidence as per-farm predictions"""
+    model = train_small_model()
+    rng = np.random.default_rng(7)
+    rows = np.column_stack([rng.uniform(10, 40, 300), rng.uniform(20, 95, 300), rng.uniform(0, 150, 300),
+                            rng.uniform(0, 100, 300), rng.uniform(0, 100, 300), rng.uniform(5, 8.5, 300),
+                            rng.uniform(200, 2000, 300)])
+    rows = np.vstack([rows, create_comprehensive_dataset()[FEATURE_COLUMNS].to_numpy()[::10]])
+
+    results = recommend_batch(model, rows)
+    expected = [recommend_one(model, list(row)) for row in rows]
+    assert list(results['recommended_crop']) == [crop for crop, _ in expected]
+    assert np.allclose(results['confidence'], [confidence for _, confidence in expected])
+    assert set(results['source']) == {'model', 'water'}
+    assert (results.loc[results['source'] == 'water', 'confidence'] == CONFIDENCE_THRESHOLD).all()
+
+def test_recommend_batch_accepts_csv_style_rows():
+    """Dict rows match columns case-insensitively, keep extra columns and may give Moisture for rainfall"""
+    model = train_small_model()
+    farms = [{'Farm': 'North', 'Temperature': 28, 'Humidity': 85, 'n': 110, 'p': 40, 'k': 50, 'ph': 6.2, 'moisture': 75},
+             {'Farm': 'South', 'Temperature': 20, 'Humidity': 55, 'n': 80, 'p': 30, 'k': 40, 'ph': 6.8, 'moisture': 25}]
+    results = recommend_batch(model, farms)
+    assert list(results['Farm']) == ['North', 'South'] and list(results['rainfall']) == [1500, 500]
+    assert list(results['recommended_crop']) == list(recommend_batch(model, results[FEATURE_COLUMNS].values.tolist())['recommended_crop'])
+
+    assert recommend_batch(model, []).empty
+    with pytest.raises(ValueError, match='pH, rainfall'):
+        recommend_batch(model, [{'temperature': 20, 'humidity': 50, 'N': 1, 'P': 1, 'K': 1}])
+    with pytest.raises(ValueError, match='rows 2'):
+        recommend_batch(model, pd.DataFrame([[20, 50, 1, 1, 1, 7, 500], [20, 'dry', 1, 1, 1, 7, 500]], columns=FEATURE_COLUMNS))
+
+def test_prediction_cache_shares_quantized_inputs():
+    """Inputs in one resolution cell share a prediction, computed on the cell's centre"""
+    model = train_small_model()
+    cache = PredictionCache(max_size=2, ttl=60)
+    farm = [28.2, 84.6, 20, 20, 20, 6.52, 1503]
+    first = cache.recommend(model, farm, now=0)
+    assert cache.recommend(model, [28.1, 85.4, 20.3, 19.8, 20, 6.48, 1498], now=10) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    expected = recommend_batch(model, [[28.0, 85, 20, 20, 20, 6.5, 1500]]).iloc[0]
+    assert first['recommended_crop'] == expected['recommended_crop']
+    assert np.isclose(first['confidence'], expected['confidence']) and first['source'] == expected['source']
+    assert not cache.predict_proba(model, farm, now=10).flags.writeable
+
+    # Expired after ttl, least recently used entry evicted past max_size
+    cache.recommend(model, farm, now=61)
+    cache.recommend(model, [20, 50, 1, 1, 1, 7, 500], now=61)
+    cache.recommend(model, [35, 40, 1, 1, 1, 7, 300], now=61)
+    assert cache.stats()['entries'] == 2 and cache.misses == 4
+    cache.recommend(model, farm, now=62)
+    assert cache.misses == 5
+
+    # A different (e.g. newly activated) model never sees the old one's entries
+    other = RandomForestClassifier(n_estimators=5, random_state=1).fit(*train_data())
+    cache.recommend(other, farm, now=62)
+    assert cache.misses == 6 and cache.stats()['entries'] == 1
+
+    # lookup tells each call whether it was served from the cache, whatever other callers did since
+    shared = PredictionCache()
+    proba, cached = shared.lookup(model, farm, now=0)
+    shared.predict_proba(model, [20, 50, 1, 1, 1, 7, 500], now=0)
+    again, cached_again = shared.lookup(model, [28.1, 85, 20, 20, 20, 6.5, 1500], now=1)
+    assert not cached and cached_again and again is proba
+
+def test_prediction_cache_keys_encoded_categories():
+    """The enhanced model's encoded water resource follows the features and keys the cell unchanged"""
+    X, y, encoder = prepare_enhanced_data(create_enhanced_dataset())
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    cache = PredictionCache()
+    high, low = encoder.transform(['high', 'low'])
+    farm = [24.2, 70, 100, 50, 60, 6.5, 700]
+    expected = model.predict_proba(pd.DataFrame([[24.0, 70, 100, 50, 60, 6.5, 700, high]], columns=X.columns))
+    assert np.array_equal(cache.predict_proba(model, farm + [high], now=0), expected[0])
+    cache.predict_proba(model, farm + [low], now=0)
+    cache.predict_proba(model, [24.1] + farm[1:] + [low], now=0)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+if __name__ == "__main__":
+    test_recommend_batch_matches_one_at_a_time()
+    test_recommend_batch_accepts_csv_style_rows()
+    test_prediction_cache_shares_quantized_inputs()
+    test_prediction_cache_keys_encoded_categories()
+    print("✅ Recommendation tests passed")
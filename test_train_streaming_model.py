@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for out-of-core training on large soil CSVs
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from dataset_generator import generate
+from recommendations import FEATURE_COLUMNS, MOISTURE_TO_RAINFALL
+from train_streaming_model import soil_csv_columns, train_out_of_core
+
+def test_trains_on_a_sorted_csv_in_chunks():
+    """Samples drawn across a crop-sorted file learn every crop; incomplete rows are dropped"""
+    df = generate('comprehensive', 20000, seed=3)
+    # The app's soil schema: moisture instead of rainfall, any capitalization
+    df['Moisture'] = df.pop('rainfall') / MOISTURE_TO_RAINFALL
+    df = df.rename(columns={'temperature': 'Temperature', 'crop': 'Crop'})
+    df.loc[[5, 12000], 'N'] = None
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'train.csv')
+        df.to_csv(path, index=False)
+        forest, report = train_out_of_core(path, samples=3, sample_rows=2000, holdout_rows=1000, chunk_size=3000,
+                                           forest_params={'n_estimators': 5, 'max_depth': 10})
+
+        assert report['rows'] == 20000 and report['dropped_rows'] == 2
+        assert 5000 < report['trained_rows'] < 7000 and report['trees'] == 15
+        assert sorted(forest.classes_) == sorted(df['Crop'].unique())
+        assert list(forest.feature_names_in_) == FEATURE_COLUMNS
+        assert report['accuracy'] > 0.8
+
+        df.drop(columns=['pH']).to_csv(path, index=False)
+        with pytest.raises(ValueError, match='pH'):
+            soil_csv_columns(path)
+
+if __name__ == "__main__":
+    test_trains_on_a_sorted_csv_in_chunks()
+    print("✅ Out-of-core training tests passed")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the flattened tree-ensemble inference engine
+"""
+
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from recommendations import FEATURE_COLUMNS, recommend_batch
+from train_model import create_comprehensive_dataset
+from tree_engine import FlatForest, HybridForest, compile_model
+
+def crop_data():
+    df = create_comprehensive_dataset()
+    return df[FEATURE_COLUMNS], df['crop']
+
+def near_thresholds(model, base_row):
+    """Rows that put one feature exactly on, just above and just below a split threshold"""
+    trees = [estimator.tree_ for estimator in getattr(model, 'estimators_', [model])][:5]
+    split = np.concatenate([tree.feature >= 0 for tree in trees])
+    features = np.concatenate([tree.feature for tree in trees])[split]
+    thresholds = np.concatenate([tree.threshold for tree in trees])[split]
+    values = np.concatenate([thresholds, thresholds.astype(np.float32).astype(np.float64),
+                             np.nextafter(thresholds.astype(np.float32), np.float32(np.inf)).astype(np.float64)])
+    rows = np.repeat(base_row[np.newaxis, :], len(values), axis=0)
+    rows[np.arange(len(values)), np.tile(features, 3)] = values
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+@pytest.mark.parametrize('model', [
+    RandomForestClassifier(n_estimators=60, max_depth=20, min_samples_split=3, min_samples_leaf=2, random_state=42),
+    DecisionTreeClassifier(random_state=0),
+    DecisionTreeClassifier(max_depth=1, random_state=0),
+], ids=['forest', 'tree', 'stump'])
+def test_flat_forest_matches_sklearn_bit_for_bit(model):
+    """Flattened probabilities equal predict_proba exactly, including inputs on the split thresholds"""
+    X, y = crop_data()
+    model.fit(X, y)
+    flat = FlatForest.from_sklearn(model)
+    rng = np.random.default_rng(3)
+    rows = pd.DataFrame(X.to_numpy()[rng.integers(0, len(X), 2000)] * rng.normal(1, 0.15, (2000, len(FEATURE_COLUMNS))),
+                        columns=FEATURE_COLUMNS)
+    for batch in (rows.head(1), rows, near_thresholds(model, rows.to_numpy()[0])):
+        assert np.array_equal(flat.predict_proba(batch), model.predict_proba(batch))
+        assert np.array_equal(flat.predict(batch), model.predict(batch))
+
+    # Columns are matched by name, like sklearn does
+    assert np.array_equal(flat.predict_proba(rows[FEATURE_COLUMNS[::-1]]), model.predict_proba(rows))
+    with pytest.raises(ValueError):
+        flat.predict_proba(np.array([[1.0, np.nan, 1, 1, 1, 7, 500]]))
+
+def test_compiled_model_drops_into_recommendations():
+    """compile_model flattens tree classifiers for recommend_batch and leaves other models alone"""
+    X, y = crop_data()
+    model = RandomForestClassifier(n_estimators=20, random_state=1).fit(X, y)
+    compiled = compile_model(model)
+    assert isinstance(compiled, FlatForest) and compile_model(compiled) is compiled
+    pd.testing.assert_frame_equal(recommend_batch(compiled, X.head(300)), recommend_batch(model, X.head(300)))
+
+    class Unsupported:
+        classes_ = np.array(['wheat'])
+    unsupported = Unsupported()
+    assert compile_model(unsupported) is unsupported
+
+def test_saved_forest_is_memory_mapped():
+    """A forest saved as .npy arrays opens memory-mapped and predicts exactly as the model does"""
+    X, y = crop_data()
+    model = RandomForestClassifier(n_estimators=20, max_depth=12, random_state=2).fit(X, y)
+    with tempfile.TemporaryDirectory() as directory:
+        FlatForest.from_sklearn(model).save(directory)
+        loaded = FlatForest.load(directory)
+        assert isinstance(loaded.leaf_proba.base, np.memmap) and not loaded.leaf_proba.flags.writeable
+        assert list(loaded.feature_names_in_) == FEATURE_COLUMNS
+        assert np.array_equal(loaded.predict_proba(X), model.predict_proba(X))
+        assert np.array_equal(loaded.predict(X.head(1)), model.predict(X.head(1)))
+        del loaded
+
+def test_combined_forests_average_their_trees():
+    """Forests fitted on different crops combine into one averaging all their trees over the union of classes"""
+    X, y = crop_data()
+    first = RandomForestClassifier(n_estimators=6, random_state=3).fit(X[y <= 'onion'], y[y <= 'onion'])
+    second = RandomForestClassifier(n_estimators=2, random_state=4).fit(X[y >= 'maize'], y[y >= 'maize'])
+    combined = FlatForest.combine([FlatForest.from_sklearn(first), FlatForest.from_sklearn(second)])
+    assert list(combined.classes_) == sorted(y.unique()) and combined.n_trees == 8
+
+    expected = pd.DataFrame(0.0, index=X.index, columns=combined.classes_)
+    for model in (first, second):
+        expected[model.classes_] += model.predict_proba(X) * len(model.estimators_) / combined.n_trees
+    assert np.allclose(combined.predict_proba(X), expected.to_numpy())
+
+def test_hybrid_forest_sends_large_batches_to_sklearn():
+    """Batches up to max_flat_rows are walked flat; larger ones load the sklearn model once and use it"""
+    X, y = crop_data()
+    model = RandomForestClassifier(n_estimators=10, random_state=5).fit(X, y)
+    loads = []
+
+    def load_estimator():
+        loads.append(1)
+        return model
+
+    hybrid = HybridForest(FlatForest.from_sklearn(model), load_estimator=load_estimator, max_flat_rows=100)
+    assert np.array_equal(hybrid.predict_proba(X.head(100)), model.predict_proba(X.head(100))) and not loads
+    reordered = X.head(300)[FEATURE_COLUMNS[::-1]]
+    for _ in range(2):
+        assert np.array_equal(hybrid.predict_proba(reordered), model.predict_proba(X.head(300)))
+    assert loads == [1] and hybrid.estimator is model
+    assert np.array_equal(hybrid.predict(X.head(300)), model.predict(X.head(300)))
+    pd.testing.assert_frame_equal(recommend_batch(hybrid, X.head(300)), recommend_batch(model, X.head(300)))
+
+    # Without an sklearn model every batch is walked flat
+    flat_only = HybridForest(FlatForest.from_sklearn(model), max_flat_rows=100)
+    assert np.array_equal(flat_only.predict_proba(X.head(300)), model.predict_proba(X.head(300)))
+
+if __name__ == "__main__":
+    for model in (RandomForestClassifier(n_estimators=60, max_depth=20, random_state=42),
+                  DecisionTreeClassifier(random_state=0), DecisionTreeClassifier(max_depth=1, random_state=0)):
+        test_flat_forest_matches_sklearn_bit_for_bit(model)
+    test_compiled_model_drops_into_recommendations()
+    test_saved_forest_is_memory_mapped()
+    test_combined_forests_average_their_trees()
+    test_hybrid_forest_sends_large_batches_to_sklearn()
+    print("✅ Tree engine tests passed")
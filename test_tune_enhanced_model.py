@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached, parallel hyperparameter search
+"""
+
+import os
+import tempfile
+
+from model_registry import ModelRegistry
+from train_enhanced_model import create_enhanced_dataset, prepare_enhanced_data
+from tune_enhanced_model import FoldCache, cross_validate, grid_candidates, tune_enhanced_model
+
+CANDIDATES = [{'n_estimators': 10, 'max_depth': 2}, {'n_estimators': 10, 'max_depth': None}]
+
+def test_fold_results_are_cached_per_data_and_params():
+    """A re-run reuses every fold; new data or params only fit what changed"""
+    X, y, _ = prepare_enhanced_data(create_enhanced_dataset(rows=600))
+    with tempfile.TemporaryDirectory() as directory:
+        first = cross_validate(X, y, CANDIDATES, folds=3, workers=2, cache=FoldCache(directory))
+        assert first['params'].iloc[0] == CANDIDATES[1] and first['mean_accuracy'].iloc[0] > 0.8
+        assert list(first['cached_folds']) == [0, 0] and len(os.listdir(directory)) == 6
+
+        cache = FoldCache(directory)
+        again = cross_validate(X, y, CANDIDATES + [{'n_estimators': 5}], folds=3, workers=1, cache=cache)
+        assert (cache.hits, cache.misses) == (6, 3)
+        scores = dict(zip(again['params'].astype(str), again['mean_accuracy']))
+        assert all(scores[str(params)] == score for params, score in zip(first['params'], first['mean_accuracy']))
+
+        cache = FoldCache(directory)
+        cross_validate(X.head(500), y.head(500), CANDIDATES, folds=3, workers=1, cache=cache)
+        assert cache.hits == 0
+
+def test_random_candidates_extend_the_same_shuffle():
+    """Asking for more random candidates keeps the earlier ones, whose folds are cached"""
+    grid = {'n_estimators': [10, 50, 100], 'max_depth': [2, 5, None], 'criterion': ['gini', 'entropy']}
+    assert grid_candidates(grid, 'random', 10)[:4] == grid_candidates(grid, 'random', 4)
+    assert len(grid_candidates(grid, 'random', 100)) == len(grid_candidates(grid, 'grid')) == 18
+
+def test_best_model_is_saved_and_published():
+    """The best candidate is retrained and written to the model files and the registry with its scores"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = ModelRegistry(os.path.join(directory, 'registry'))
+        model, _, results = tune_enhanced_model('grid', workers=1, grid={'n_estimators': [10], 'max_depth': [2, None]},
+                                                df=create_enhanced_dataset(rows=600),
+                                                cache=FoldCache(os.path.join(directory, 'cache')),
+                                                directory=directory, registry=registry)
+        assert os.path.exists(os.path.join(directory, 'enhanced_crop_model.pkl'))
+        assert os.path.exists(os.path.join(directory, 'water_resource_encoder.pkl'))
+        metrics = registry.get('enhanced').manifest['metrics']
+        assert metrics['cv_accuracy'] == round(results['mean_accuracy'].iloc[0], 4)
+        assert metrics['param_max_depth'] == model.max_depth
+
+if __name__ == "__main__":
+    test_fold_results_are_cached_per_data_and_params()
+    test_random_candidates_extend_the_same_shuffle()
+    test_best_model_is_saved_and_published()
+    print("✅ Hyperparameter search tests passed")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Out-of-core training of the crop model on soil CSVs larger than memory
+
+Usage:
+    python train_streaming_model.py                   # the first of config.SOIL_DATA_PATHS that exists
+    python train_streaming_model.py data/stress.csv   # any CSV with the model's columns and a crop column
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+import config
+from model_registry import ModelRegistry
+from recommendation_grid import RecommendationGrids
+from recommendations import FEATURE_COLUMNS, MOISTURE_TO_RAINFALL
+from tree_engine import FlatForest
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Header names (lower-case) accepted for the crop label column
+LABEL_NAMES = ('crop', 'label', 'crop type')
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, in MB (None where it can't be read)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+def find_soil_data(paths=config.SOIL_DATA_PATHS) -> Optional[str]:
+    return next((path for path in paths if os.path.exists(path)), None)
+
+def soil_csv_columns(path: str) -> Dict[str, str]:
+    """CSV column -> model column (FEATURE_COLUMNS, Moisture or crop), from the header alone
+
+    Names are matched case-insensitively like batch_frame does, and a
+    Moisture column stands in for a missing rainfall one. Raises ValueError
+    naming missing columns.
+    """
+    canonical = {name.lower(): name for name in FEATURE_COLUMNS + ['Moisture']}
+    canonical.update((name, 'crop') for name in LABEL_NAMES)
+    columns = {}
+    for name in pd.read_csv(path, nrows=0).columns:
+        target = canonical.get(str(name).strip().lower())
+        if target is not None and target not in columns.values():
+            columns[name] = target
+    if 'rainfall' in columns.values():
+        columns = {name: target for name, target in columns.items() if target != 'Moisture'}
+
+    found = {'rainfall' if target == 'Moisture' else target for target in columns.values()}
+    missing = [name for name in FEATURE_COLUMNS + ['crop'] if name not in found]
+    if missing:
+        raise ValueError(f"{path}: missing columns: {', '.join(missing)}")
+    return columns
+
+def scan_labels(path: str, columns: Dict[str, str], chunk_size: int = config.STREAMING_CHUNK_ROWS) -> pd.Series:
+    """Rows per crop, reading only the label column"""
+    label = next(name for name, target in columns.items() if target == 'crop')
+    counts = pd.Series(dtype=np.int64)
+    for chunk in pd.read_csv(path, usecols=[label], dtype={label: 'category'}, chunksize=chunk_size):
+        chunk_counts = chunk[label].value_counts()
+        chunk_counts.index = chunk_counts.index.astype(str)
+        counts = counts.add(chunk_counts, fill_value=0)
+    return counts[counts > 0].astype(np.int64).sort_index()
+
+def read_soil_chunks(path: str, columns: Dict[str, str], classes,
+                     chunk_size: int = config.STREAMING_CHUNK_ROWS) -> Iterator[Tuple[np.ndarray, np.ndarray, int]]:
+    """(features, class codes, rows dropped) per chunk of the CSV
+
+    Features are parsed straight to float32 in FEATURE_COLUMNS order and
+    labels to codes into ``classes``, so a chunk costs ~30 bytes a row
+    rather than pandas' float64 columns and a Python string per label. Rows
+    with an empty or non-numeric value or an unknown crop are dropped.
+    """
+    dtypes = {name: pd.CategoricalDtype(classes) if target == 'crop' else np.float32
+              for name, target in columns.items()}
+    by_target = {target: name for name, target in columns.items()}
+    for chunk in pd.read_csv(path, usecols=list(columns), dtype=dtypes, chunksize=chunk_size):
+        features = np.empty((len(chunk), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for i, name in enumerate(FEATURE_COLUMNS):
+            if name in by_target:
+                features[:, i] = chunk[by_target[name]].to_numpy()
+            else:
+                features[:, i] = chunk[by_target['Moisture']].to_numpy() * MOISTURE_TO_RAINFALL
+        codes = chunk[by_target['crop']].cat.codes.to_numpy()
+        valid = (codes >= 0) & np.isfinite(features).all(axis=1)
+        yield features[valid], codes[valid], int(len(chunk) - valid.sum())
+
+def train_out_of_core(path: str, samples: int = config.STREAMING_SAMPLES,
+                      sample_rows: int = config.STREAMING_SAMPLE_ROWS,
+                      holdout_rows: int = config.STREAMING_HOLDOUT_ROWS,
+                      chunk_size: int = config.STREAMING_CHUNK_ROWS,
+                      forest_params: Optional[Dict[str, Any]] = None,
+                      seed: int = 42) -> Tuple[FlatForest, Dict[str, Any]]:
+    """Fit a forest on a soil CSV of any size, holding only a chunk and the samples in memory
+
+    The CSV is read twice, chunk by chunk: once for the crops in it, then
+    for ``samples`` random samples of about ``sample_rows`` rows and a
+    holdout. Every row has the same chance of landing in a sample wherever
+    it is in the file, so each sample mixes all of it even when the CSV is
+    sorted by crop. A forest is fitted on each sample and their trees are
+    averaged (FlatForest.combine). Returns the forest and a report with
+    the holdout accuracy and this process's peak RSS.
+    """
+    start = time.perf_counter()
+    columns = soil_csv_columns(path)
+    counts = scan_labels(path, columns, chunk_size)
+    rows = int(counts.sum())
+    if rows == 0:
+        raise ValueError(f"{path}: no labelled rows")
+    classes = counts.index.to_numpy()
+
+    rng = np.random.default_rng(seed)
+    holdout_rate = min(1.0, holdout_rows / rows)
+    sample_rate = min(1.0 - holdout_rate, samples * sample_rows / rows)
+    parts = [[] for _ in range(samples + 1)]  # the last one is the holdout
+    dropped = 0
+    for features, codes, chunk_dropped in read_soil_chunks(path, columns, classes, chunk_size):
+        dropped += chunk_dropped
+        draw = rng.random(len(codes))
+        target = np.where(draw < holdout_rate, samples,
+                          np.where(draw < holdout_rate + sample_rate, rng.integers(0, samples, len(codes)), -1))
+        for i, part in enumerate(parts):
+            keep = target == i
+            part.append((features[keep], codes[keep]))
+
+    def take(i):
+        features = np.concatenate([features for features, _ in parts[i]])
+        codes = np.concatenate([codes for _, codes in parts[i]])
+        parts[i] = None
+        return pd.DataFrame(features, columns=FEATURE_COLUMNS, copy=False), classes[codes]
+
+    params = dict(config.STREAMING_FOREST_PARAMS if forest_params is None else forest_params)
+    forests = []
+    trained_rows = 0
+    for i in range(samples):
+        X, y = take(i)
+        if len(X):
+            model = RandomForestClassifier(random_state=seed + i, **params).fit(X, y)
+            forests.append(FlatForest.from_sklearn(model))
+            trained_rows += len(X)
+    if not forests:
+        raise ValueError(f"{path}: no complete rows to train on")
+    forest = FlatForest.combine(forests)
+
+    X_holdout, y_holdout = take(samples)
+    accuracy = float((forest.predict(X_holdout) == y_holdout).mean()) if len(X_holdout) else None
+    peak = peak_rss_mb()
+    report = {
+        'rows': rows,
+        'dropped_rows': dropped,
+        'trained_rows': trained_rows,
+        'holdout_rows': len(X_holdout),
+        'accuracy': accuracy,
+        'crops': len(classes),
+        'trees': forest.n_trees,
+        'nodes': len(forest.feature),
+        'seconds': round(time.perf_counter() - start, 1),
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+    }
+    return forest, report
+
+def train_streaming_model(path: Optional[str] = None):
+    """Train the crop model out of core and publish it like train_model.py does"""
+    path = path or find_soil_data()
+    if path is None:
+        print(f"❌ No soil data found. Looked for: {', '.join(config.SOIL_DATA_PATHS)}")
+        return None
+    print(f"Training on {path} ({os.path.getsize(path) / 1e6:,.0f} MB) in chunks of {config.STREAMING_CHUNK_ROWS:,} rows...")
+    try:
+        forest, report = train_out_of_core(path)
+    except (ValueError, pd.errors.ParserError) as e:
+        print(f"❌ Error training on {path}: {e}")
+        return None
+
+    accuracy = 'n/a' if report['accuracy'] is None else f"{report['accuracy']:.3f}"
+    peak = 'n/a' if report['peak_rss_mb'] is None else f"{report['peak_rss_mb']:,.0f} MB"
+    print(f"Read {report['rows']:,} rows ({report['dropped_rows']:,} incomplete dropped), "
+          f"trained {report['trees']} trees on {report['trained_rows']:,} sampled rows in {report['seconds']} s")
+    print(f"Holdout accuracy ({report['holdout_rows']:,} rows): {accuracy}")
+    print(f"Peak RSS: {peak}")
+
+    # Publish to the registry: running apps switch to it without a restart
+    registry = ModelRegistry()
+    metrics = {name: report[name] for name in ('rows', 'trained_rows', 'peak_rss_mb') if report[name] is not None}
+    if report['accuracy'] is not None:
+        metrics['accuracy'] = round(report['accuracy'], 4)
+    version = registry.publish('crop', forest, metrics=metrics)
+    print(f"Published and activated crop model {version}")
+
+    # Precompute the chatbot's and location lookups' answers for the new version
+    grids = RecommendationGrids(registry)
+    grids.build(registry.get('crop'))
+    print(f"Recommendation grid saved as {grids.path(version)}")
+    return version
+
+if __name__ == "__main__":
+    train_streaming_model(sys.argv[1] if len(sys.argv) > 1 else None)
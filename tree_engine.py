@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Rows x trees walked per step of FlatForest.apply: large enough to amortize
+# NumPy's per-call cost, small enough to stay in cache
+TRAVERSAL_BLOCK = 1 << 16
+
+# Levels walked between dropping the (row, tree) pairs that reached a leaf;
+# most paths end well above max_depth
+COMPACT_EVERY = 3
+
+# FlatForest.save writes each of these arrays to <name>.npy, plus FOREST_META
+FOREST_ARRAYS = ('roots', 'feature', 'threshold', 'children', 'leaf_proba', 'is_leaf')
+FOREST_META = 'forest.json'
+
+class FlatForest:
+    """A fitted RandomForestClassifier/DecisionTreeClassifier flattened into NumPy arrays
+
+    Every tree's nodes are concatenated into contiguous arrays (split
+    feature, threshold, children, per-class leaf probabilities) and a batch
+    is walked through all trees at once, one vectorized step per tree level,
+    instead of through sklearn's per-call validation and joblib dispatch.
+
+    predict_proba is bit-identical to the model's own with n_jobs=None:
+    inputs are float32 as in sklearn (each threshold is stored as the
+    largest float32 not above it, which splits float32 inputs the same
+    way), leaf values are normalized with the same NumPy operations and
+    trees are summed in estimator order. (With several jobs sklearn adds the
+    trees in whatever order its threads finish, so the last bits can differ
+    between its own calls.)
+    """
+
+    def __init__(self, classes: np.ndarray, n_features: int, feature_names, roots: np.ndarray,
+                 feature: np.ndarray, threshold: np.ndarray, children: np.ndarray, leaf_proba: np.ndarray,
+                 depth: int, n_trees: int, is_leaf: Optional[np.ndarray] = None):
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.feature_names_in_ = feature_names
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_proba = leaf_proba
+        self.depth = depth
+        self.n_trees = n_trees
+        self.is_leaf = children[:len(feature)] == np.arange(len(feature)) if is_leaf is None else is_leaf
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatForest':
+        """Flatten a fitted single-output RandomForestClassifier or DecisionTreeClassifier"""
+        trees = [estimator.tree_ for estimator in getattr(model, 'estimators_', [model])]
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("only single-output classifiers can be flattened")
+        n_classes = len(model.classes_)
+        total = sum(tree.node_count for tree in trees)
+        roots = np.zeros(len(trees), dtype=np.intp)
+        feature = np.zeros(total, dtype=np.intp)
+        threshold = np.zeros(total, dtype=np.float32)
+        # children[node] is the left child, children[total + node] the right one
+        children = np.zeros(2 * total, dtype=np.intp)
+        leaf_proba = np.zeros((total, n_classes), dtype=np.float64)
+
+        offset = 0
+        for i, tree in enumerate(trees):
+            nodes = slice(offset, offset + tree.node_count)
+            own = np.arange(offset, offset + tree.node_count)
+            leaf = tree.children_left == -1
+            roots[i] = offset
+            feature[nodes] = np.where(leaf, 0, tree.feature)
+            rounded = tree.threshold.astype(np.float32)
+            above = rounded.astype(np.float64) > tree.threshold
+            rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+            threshold[nodes] = rounded
+            # Leaves point at themselves, so walking past one stays there
+            children[nodes] = np.where(leaf, own, tree.children_left + offset)
+            children[total + offset:total + offset + tree.node_count] = np.where(leaf, own, tree.children_right + offset)
+            # Normalized exactly as DecisionTreeClassifier.predict_proba does
+            proba = tree.value[:, 0, :n_classes].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            leaf_proba[nodes] = proba
+            offset += tree.node_count
+
+        return cls(np.asarray(model.classes_), model.n_features_in_, getattr(model, 'feature_names_in_', None),
+                   roots, feature, threshold, children, leaf_proba, max(tree.max_depth for tree in trees), len(trees))
+
+    @classmethod
+    def combine(cls, forests: List['FlatForest']) -> 'FlatForest':
+        """One forest averaging every tree of several, e.g. forests fitted on different samples of a dataset
+
+        Its classes are the union of theirs; a class a forest never saw gets
+        zero probability from that forest's trees.
+        """
+        classes = np.unique(np.concatenate([forest.classes_ for forest in forests]))
+        total = sum(len(forest.feature) for forest in forests)
+        children = np.empty(2 * total, dtype=np.intp)
+        leaf_proba = np.zeros((total, len(classes)), dtype=np.float64)
+        offset = 0
+        for forest in forests:
+            count = len(forest.feature)
+            children[offset:offset + count] = forest.children[:count] + offset
+            children[total + offset:total + offset + count] = forest.children[count:] + offset
+            leaf_proba[offset:offset + count, np.searchsorted(classes, forest.classes_)] = forest.leaf_proba
+            offset += count
+
+        offsets = np.cumsum([0] + [len(forest.feature) for forest in forests[:-1]])
+        return cls(classes, forests[0].n_features_in_, forests[0].feature_names_in_,
+                   np.concatenate([forest.roots + start for forest, start in zip(forests, offsets)]),
+                   np.concatenate([forest.feature for forest in forests]),
+                   np.concatenate([forest.threshold for forest in forests]), children, leaf_proba,
+                   max(forest.depth for forest in forests), sum(forest.n_trees for forest in forests),
+                   is_leaf=np.concatenate([forest.is_leaf for forest in forests]))
+
+    def save(self, directory: str) -> List[str]:
+        """Write the arrays as raw .npy files (and the rest as JSON); returns the file names written"""
+        os.makedirs(directory, exist_ok=True)
+        filenames = []
+        for name in FOREST_ARRAYS:
+            filenames.append(f"{name}.npy")
+            np.save(os.path.join(directory, filenames[-1]), getattr(self, name))
+        meta = {
+            'classes': self.classes_.tolist(),
+            'n_features': int(self.n_features_in_),
+            'feature_names': None if self.feature_names_in_ is None else [str(name) for name in self.feature_names_in_],
+            'depth': int(self.depth),
+            'n_trees': int(self.n_trees),
+        }
+        with open(os.path.join(directory, FOREST_META), 'w') as f:
+            json.dump(meta, f)
+        return filenames + [FOREST_META]
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'FlatForest':
+        """Open a saved forest
+
+        With mmap_mode='r' the arrays are mapped rather than read: opening takes
+        about a millisecond and every process using the files shares one
+        page-cache copy of them instead of holding a private one.
+        """
+        with open(os.path.join(directory, FOREST_META)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode).view(np.ndarray)
+                  for name in FOREST_ARRAYS}
+        feature_names = meta['feature_names']
+        return cls(np.asarray(meta['classes']), meta['n_features'],
+                   None if feature_names is None else np.asarray(feature_names, dtype=object),
+                   arrays['roots'], arrays['feature'], arrays['threshold'], arrays['children'],
+                   arrays['leaf_proba'], meta['depth'], meta['n_trees'], is_leaf=arrays['is_leaf'])
+
+    def _inputs(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features per row, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("input contains NaN or infinity")
+        return X
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf reached in every tree by every row: (rows, trees) indices into the flat arrays"""
+        X = self._inputs(X)
+        leaves = np.empty((len(X), self.n_trees), dtype=np.intp)
+        found = leaves.ravel()
+        flat = X.ravel()
+        total = len(self.feature)
+        block = max(1, TRAVERSAL_BLOCK // self.n_trees)
+        for start in range(0, len(X), block):
+            stop = min(start + block, len(X))
+            # One entry per (row, tree) pair still walking: its node, its
+            # slot in ``found`` and the offset of its row in ``flat``
+            nodes = np.tile(self.roots, stop - start)
+            slots = np.arange(start * self.n_trees, stop * self.n_trees)
+            row_offsets = np.repeat(np.arange(start, stop) * self.n_features_in_, self.n_trees)
+            for level in range(1, self.depth + 1):
+                go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children[nodes + total * go_right]
+                if level % COMPACT_EVERY == 0 or level == self.depth:
+                    done = self.is_leaf[nodes]
+                    found[slots[done]] = nodes[done]
+                    walking = ~done
+                    nodes, slots, row_offsets = nodes[walking], slots[walking], row_offsets[walking]
+                    if not len(nodes):
+                        break
+            if self.depth == 0:
+                found[slots] = nodes
+        return leaves
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities per row, columns in classes_ order"""
+        leaves = self.apply(X).T.copy()
+        if self.n_trees == 1:
+            return self.leaf_proba[leaves[0]]
+        proba = np.zeros((leaves.shape[1], len(self.classes_)), dtype=np.float64)
+        tree_proba = np.empty_like(proba)
+        for tree_leaves in leaves:
+            np.take(self.leaf_proba, tree_leaves, axis=0, out=tree_proba)
+            proba += tree_proba
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+class HybridForest:
+    """A FlatForest for small batches and the sklearn model it was flattened from for large ones
+
+    FlatForest skips sklearn's per-call overhead, which dominates a single
+    farm's prediction, but walks the trees level by level in NumPy, which
+    loses to sklearn's compiled traversal above a few hundred rows. Batches
+    of more than ``max_flat_rows`` go to the sklearn model. It can be given
+    as ``load_estimator``, called the first time a large batch comes in, so
+    a process that only serves single farms never unpickles it.
+    """
+
+    def __init__(self, flat: FlatForest, estimator=None, load_estimator: Optional[Callable[[], Any]] = None,
+                 max_flat_rows: int = config.FLAT_FOREST_MAX_ROWS):
+        self.flat = flat
+        self.classes_ = flat.classes_
+        self.n_features_in_ = flat.n_features_in_
+        self.feature_names_in_ = flat.feature_names_in_
+        self.max_flat_rows = max_flat_rows
+        self._estimator = estimator
+        self._load_estimator = load_estimator
+        self._lock = threading.Lock()
+
+    @property
+    def estimator(self):
+        if self._estimator is None:
+            with self._lock:
+                if self._estimator is None:
+                    self._estimator = self._load_estimator()
+        return self._estimator
+
+    def predict_proba(self, X) -> np.ndarray:
+        if len(X) <= self.max_flat_rows or (self._estimator is None and self._load_estimator is None):
+            return self.flat.predict_proba(X)
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        return self.estimator.predict_proba(X)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def compile_model(model) -> Any:
+    """FlatForest for a fitted tree classifier, or the model unchanged if it can't be flattened"""
+    if isinstance(model, FlatForest):
+        return model
+    try:
+        return FlatForest.from_sklearn(model)
+    except (AttributeError, ValueError):
+        return model
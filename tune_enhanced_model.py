@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter search for the enhanced crop model, cross-validated on a process pool
+
+Usage:
+    python tune_enhanced_model.py              # random search over config.TUNING_PARAM_GRID
+    python tune_enhanced_model.py grid         # every combination in the grid
+    python tune_enhanced_model.py random 50    # 50 sampled combinations
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+
+import config
+from train_enhanced_model import create_enhanced_dataset, prepare_enhanced_data, save_enhanced_model
+
+SEARCHES = ('random', 'grid')
+
+def data_hash(X: pd.DataFrame, y: pd.Series) -> str:
+    """Fingerprint of the training data: any changed value, row or column gives a new one"""
+    digest = hashlib.sha256(json.dumps([str(name) for name in X.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+class FoldCache:
+    """Cross-validation results on disk, one JSON file per (data, params, fold).
+
+    Keys also cover the fold split and the sklearn version, so a result is
+    only reused for exactly the fit that produced it. Files are written
+    atomically as each fold finishes, so an interrupted search picks up
+    where it stopped.
+    """
+
+    def __init__(self, directory: str = config.TUNING_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data: str, params: Dict[str, Any], fold: int, folds: int, seed: int) -> str:
+        spec = {'data': data, 'params': params, 'fold': fold, 'folds': folds, 'seed': seed,
+                'sklearn': sklearn.__version__}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        try:
+            with open(os.path.join(self.directory, f"{key}.json")) as f:
+                result = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, float]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}.json")
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+def grid_candidates(grid: Dict[str, list], search: str = 'random',
+                    candidates: int = config.TUNING_RANDOM_CANDIDATES, seed: int = 42) -> List[Dict[str, Any]]:
+    """Every combination in the grid, or ``candidates`` of them at random
+
+    The random ones are the start of one fixed shuffle of the grid, so
+    asking for more keeps the earlier candidates and their cached folds.
+    """
+    if search not in SEARCHES:
+        raise ValueError(f"unknown search {search!r} (choose from {', '.join(SEARCHES)})")
+    combinations = list(ParameterGrid(grid))
+    if search == 'grid':
+        return combinations
+    return [combinations[i] for i in np.random.default_rng(seed).permutation(len(combinations))[:candidates]]
+
+# Training data of a pool process, sent once when it starts rather than with every fold
+_worker_data = {}
+
+def _init_worker(X, y, splits):
+    _worker_data.update(X=X, y=y, splits=splits)
+
+def fit_fold(params: Dict[str, Any], fold: int, seed: int) -> Dict[str, float]:
+    """Fit one candidate on a fold's training rows; its accuracy on the fold's held-out rows"""
+    X, y = _worker_data['X'], _worker_data['y']
+    train, test = _worker_data['splits'][fold]
+    start = time.perf_counter()
+    # One process per fold already uses every CPU
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params).fit(X.iloc[train], y.iloc[train])
+    return {'accuracy': float(accuracy_score(y.iloc[test], model.predict(X.iloc[test]))),
+            'fit_seconds': round(time.perf_counter() - start, 3)}
+
+def cross_validate(X: pd.DataFrame, y: pd.Series, candidates: List[Dict[str, Any]], folds: int = config.TUNING_FOLDS,
+                   workers: Optional[int] = config.TUNING_WORKERS, cache: Optional[FoldCache] = None,
+                   seed: int = 42) -> pd.DataFrame:
+    """Stratified k-fold accuracy of every candidate, fitting only the folds the cache doesn't have
+
+    Folds are fitted in parallel on ``workers`` processes (one process
+    fits in this one). Returns one row per candidate, best first: params,
+    mean_accuracy, std_accuracy and cached_folds.
+    """
+    cache = FoldCache() if cache is None else cache
+    data = data_hash(X, y)
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y))
+    scores = {}
+    cached = [0] * len(candidates)
+    pending = []
+    for i, params in enumerate(candidates):
+        for fold in range(folds):
+            key = cache.key(data, params, fold, folds, seed)
+            result = cache.get(key)
+            if result is None:
+                pending.append((i, fold, key))
+            else:
+                scores[i, fold] = result['accuracy']
+                cached[i] += 1
+
+    def record(task, result):
+        i, fold, key = task
+        cache.put(key, result)
+        scores[i, fold] = result['accuracy']
+
+    if pending and workers == 1:
+        _init_worker(X, y, splits)
+        for task in pending:
+            record(task, fit_fold(candidates[task[0]], task[1], seed))
+    elif pending:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, y, splits)) as pool:
+            futures = {pool.submit(fit_fold, candidates[task[0]], task[1], seed): task for task in pending}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    accuracy = pd.DataFrame([[scores[i, fold] for fold in range(folds)] for i in range(len(candidates))])
+    results = pd.DataFrame({'params': candidates, 'mean_accuracy': accuracy.mean(axis=1),
+                            'std_accuracy': accuracy.std(axis=1, ddof=0), 'cached_folds': cached})
+    # Ties keep the candidates' order
+    return results.sort_values('mean_accuracy', ascending=False, kind='mergesort').reset_index(drop=True)
+
+def tune_enhanced_model(search: str = 'random', candidates: int = config.TUNING_RANDOM_CANDIDATES,
+                        workers: Optional[int] = config.TUNING_WORKERS, grid: Optional[Dict[str, list]] = None,
+                        df: Optional[pd.DataFrame] = None, cache: Optional[FoldCache] = None,
+                        directory: str = '.', registry=None):
+    """Search the parameter grid, then train, save and publish the best forest like train_enhanced_model does
+
+    ``grid`` defaults to config.TUNING_PARAM_GRID; a random search samples
+    ``candidates`` of its combinations. Fold results come from and go to
+    ``cache`` (config.TUNING_CACHE_DIR). Returns the model, encoder and
+    every candidate's cross-validation results.
+    """
+    params = grid_candidates(config.TUNING_PARAM_GRID if grid is None else grid, search, candidates)
+    df = create_enhanced_dataset() if df is None else df
+    X, y, le = prepare_enhanced_data(df)
+    # The same held-out split train_enhanced_model scores on
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    cache = FoldCache() if cache is None else cache
+    print(f"Cross-validating {len(params)} candidates x {config.TUNING_FOLDS} folds "
+          f"(workers: {workers or os.cpu_count()})...")
+    start = time.perf_counter()
+    results = cross_validate(X_train, y_train, params, workers=workers, cache=cache)
+    print(f"Done in {time.perf_counter() - start:.1f} s ({cache.hits} folds cached, {cache.misses} fitted)")
+    for _, row in results.head(5).iterrows():
+        print(f"  {row['mean_accuracy']:.4f} ± {row['std_accuracy']:.4f}  {row['params']}")
+
+    best = results.iloc[0]
+    model = RandomForestClassifier(random_state=42, n_jobs=-1, **best['params']).fit(X_train, y_train)
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    print(f"Best candidate's held-out accuracy: {accuracy:.3f}")
+
+    metrics = {'accuracy': round(accuracy, 4), 'cv_accuracy': round(best['mean_accuracy'], 4),
+               'cv_std': round(best['std_accuracy'], 4), 'cv_folds': config.TUNING_FOLDS, 'candidates': len(params)}
+    metrics.update((f"param_{name}", value) for name, value in best['params'].items())
+    save_enhanced_model(model, le, metrics, directory, registry)
+    return model, le, results
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 or (len(sys.argv) > 1 and sys.argv[1] not in SEARCHES):
+        print(__doc__.strip())
+        sys.exit(1)
+    tune_enhanced_model(sys.argv[1] if len(sys.argv) > 1 else 'random',
+                        int(sys.argv[2]) if len(sys.argv) > 2 else config.TUNING_RANDOM_CANDIDATES)
@@ -3,7 +3,10 @@ from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client
 import os
 import pandas as pd
+import requests
 from datetime import datetime
+from model_registry import ModelRegistry
+from recommendation_grid import RecommendationGrids
 
 app = Flask(__name__)
 
@@ -15,11 +18,51 @@ TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER')
 
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
+# Current weather for model-backed recommendations (weatherapi.com)
+WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
+
+# The trained model's answers, precomputed per city soil profile: a reply is
+# an array lookup, not a model run (see recommendation_grid.py)
+recommendation_grids = RecommendationGrids(ModelRegistry())
+
 # Simple session storage (in production, use a database)
 user_sessions = {}
 
+# Current temperature and humidity at a location, or None if unavailable
+def get_current_weather(location):
+    if not WEATHER_API_KEY:
+        return None
+    try:
+        response = requests.get("http://api.weatherapi.com/v1/current.json",
+                                params={'key': WEATHER_API_KEY, 'q': location, 'aqi': 'no'}, timeout=5)
+        if response.status_code != 200:
+            return None
+        current = response.json()['current']
+        return current['temp_c'], current['humidity']
+    except Exception as e:
+        print(f"Error fetching weather for {location}: {e}")
+        return None
+
+# Model-backed crop recommendation for a location's soil and current weather
+def get_model_recommendation(location):
+    grid = recommendation_grids.get()
+    weather = get_current_weather(location) if grid is not None else None
+    if weather is None:
+        return None
+    temperature, humidity = weather
+    result = grid.lookup(location, temperature, humidity)
+    if result is None:
+        return None
+    return (f"{result['recommended_crop'].title()} - {result['confidence']:.0f}% confidence "
+            f"for {temperature:.0f}C and {humidity:.0f}% humidity")
+
 # Location-based crop recommendations
 def get_crop_recommendation(location):
+    recommendation = get_model_recommendation(location)
+    if recommendation is not None:
+        return recommendation
+
+    # No weather or model available: typical crop for the city
     location_lower = location.lower()
     location_crops = {
         'mumbai': 'Rice - Best for coastal climate and monsoon season',